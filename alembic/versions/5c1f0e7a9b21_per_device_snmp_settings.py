@@ -0,0 +1,52 @@
+"""Per-device SNMP settings
+
+Revision ID: 5c1f0e7a9b21
+Revises: 22baa9fc071e
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7a9b21'
+down_revision = '22baa9fc071e'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('snmp_enabled', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.Column('snmp_version', sa.String(), nullable=False, server_default='2c'),
+    sa.Column('snmp_v3_username', sa.String(), nullable=True),
+    sa.Column('snmp_v3_auth_protocol', sa.String(), nullable=True),
+    sa.Column('snmp_v3_auth_key', sa.String(), nullable=True),
+    sa.Column('snmp_v3_priv_protocol', sa.String(), nullable=True),
+    sa.Column('snmp_v3_priv_key', sa.String(), nullable=True),
+]
+
+
+def _existing_columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'devices' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return {column['name'] for column in inspector.get_columns('devices')}
+
+
+def upgrade():
+    existing = _existing_columns()
+    if existing is None:
+        return
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('devices', column)
+
+
+def downgrade():
+    existing = _existing_columns()
+    if existing is None:
+        return
+    for column in COLUMNS:
+        if column.name in existing:
+            op.drop_column('devices', column.name)
@@ -0,0 +1,55 @@
+"""64-bit interface counters and rates
+
+Revision ID: 8d3a6b2f4c17
+Revises: 5c1f0e7a9b21
+Create Date: 2026-10-19 14:05:22.613950
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3a6b2f4c17'
+down_revision = '5c1f0e7a9b21'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ['bytes_in', 'bytes_out', 'errors_in', 'errors_out', 'discards_in', 'discards_out']
+
+RATES = [
+    sa.Column('in_bps', sa.Float(), nullable=True),
+    sa.Column('out_bps', sa.Float(), nullable=True),
+]
+
+
+def _existing_columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'interface_metrics' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return {column['name'] for column in inspector.get_columns('interface_metrics')}
+
+
+def upgrade():
+    existing = _existing_columns()
+    if existing is None:
+        return
+    with op.batch_alter_table('interface_metrics') as batch:
+        for name in COUNTERS:
+            batch.alter_column(name, type_=sa.BigInteger(), existing_type=sa.Integer())
+        for column in RATES:
+            if column.name not in existing:
+                batch.add_column(column)
+
+
+def downgrade():
+    existing = _existing_columns()
+    if existing is None:
+        return
+    with op.batch_alter_table('interface_metrics') as batch:
+        for column in RATES:
+            if column.name in existing:
+                batch.drop_column(column.name)
+        for name in COUNTERS:
+            batch.alter_column(name, type_=sa.Integer(), existing_type=sa.BigInteger())
@@ -0,0 +1,71 @@
+"""Notification channels and outbox
+
+Revision ID: a9c4e1f7b352
+Revises: f3b8d5e2a614
+Create Date: 2026-10-19 22:26:51.903118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e1f7b352'
+down_revision = 'f3b8d5e2a614'
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if 'alert_events' not in tables:
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return tables
+
+
+def upgrade():
+    tables = _tables()
+    if tables is None:
+        return
+    if 'notification_channels' not in tables:
+        op.create_table(
+            'notification_channels',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('type', sa.String(), nullable=False),
+            sa.Column('target', sa.String(), nullable=False),
+            sa.Column('min_severity', sa.String(), nullable=False),
+            sa.Column('batch_window', sa.Integer(), nullable=False),
+            sa.Column('batch_size', sa.Integer(), nullable=False),
+            sa.Column('enabled', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_notification_channels_id', 'notification_channels', ['id'])
+    if 'notification_outbox' not in tables:
+        op.create_table(
+            'notification_outbox',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('channel_id', sa.Integer(), sa.ForeignKey('notification_channels.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('event_id', sa.Integer(), sa.ForeignKey('alert_events.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('sent_at', sa.DateTime(), nullable=True),
+            sa.Column('last_error', sa.String(), nullable=True),
+        )
+        op.create_index('ix_notification_outbox_id', 'notification_outbox', ['id'])
+        op.create_index('ix_notification_outbox_status_next_attempt_at', 'notification_outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    tables = _tables()
+    if tables is None:
+        return
+    if 'notification_outbox' in tables:
+        op.drop_table('notification_outbox')
+    if 'notification_channels' in tables:
+        op.drop_table('notification_channels')
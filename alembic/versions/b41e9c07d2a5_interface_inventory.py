@@ -0,0 +1,52 @@
+"""Interface inventory: 64-bit speed, removal time, (device, ifIndex) index
+
+Revision ID: b41e9c07d2a5
+Revises: 8d3a6b2f4c17
+Create Date: 2026-10-19 16:42:08.271403
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41e9c07d2a5'
+down_revision = '8d3a6b2f4c17'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_interfaces_device_id_if_index'
+
+
+def _existing():
+    inspector = sa.inspect(op.get_bind())
+    if 'interfaces' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None, None
+    columns = {column['name'] for column in inspector.get_columns('interfaces')}
+    indexes = {index['name'] for index in inspector.get_indexes('interfaces')}
+    return columns, indexes
+
+
+def upgrade():
+    columns, indexes = _existing()
+    if columns is None:
+        return
+    with op.batch_alter_table('interfaces') as batch:
+        batch.alter_column('speed', type_=sa.BigInteger(), existing_type=sa.Integer())
+        if 'removed_at' not in columns:
+            batch.add_column(sa.Column('removed_at', sa.DateTime(timezone=True), nullable=True))
+    if INDEX not in indexes:
+        op.create_index(INDEX, 'interfaces', ['device_id', 'if_index'])
+
+
+def downgrade():
+    columns, indexes = _existing()
+    if columns is None:
+        return
+    if INDEX in indexes:
+        op.drop_index(INDEX, table_name='interfaces')
+    with op.batch_alter_table('interfaces') as batch:
+        if 'removed_at' in columns:
+            batch.drop_column('removed_at')
+        batch.alter_column('speed', type_=sa.Integer(), existing_type=sa.BigInteger())
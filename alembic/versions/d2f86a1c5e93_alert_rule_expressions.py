@@ -0,0 +1,56 @@
+"""Alert rule expressions; threshold fields optional
+
+Revision ID: d2f86a1c5e93
+Revises: b41e9c07d2a5
+Create Date: 2026-10-19 18:05:37.614290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f86a1c5e93'
+down_revision = 'b41e9c07d2a5'
+branch_labels = None
+depends_on = None
+
+THRESHOLD_COLUMNS = (
+    ('oid', sa.String()),
+    ('operator', sa.String()),
+    ('threshold', sa.Float()),
+)
+
+
+def _columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'alert_rules' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return {column['name'] for column in inspector.get_columns('alert_rules')}
+
+
+def upgrade():
+    columns = _columns()
+    if columns is None:
+        return
+    with op.batch_alter_table('alert_rules') as batch:
+        if 'expression' not in columns:
+            batch.add_column(sa.Column('expression', sa.String(), nullable=True))
+        for name, type_ in THRESHOLD_COLUMNS:
+            batch.alter_column(name, existing_type=type_, nullable=True)
+
+
+def downgrade():
+    columns = _columns()
+    if columns is None:
+        return
+    # Expression rules have no threshold form to go back to; their events are kept
+    expression_rules = 'SELECT id FROM alert_rules WHERE oid IS NULL OR operator IS NULL OR threshold IS NULL'
+    op.execute(sa.text(f'UPDATE alert_events SET rule_id = NULL WHERE rule_id IN ({expression_rules})'))
+    op.execute(sa.text(f'DELETE FROM alert_rules WHERE id IN ({expression_rules})'))
+    with op.batch_alter_table('alert_rules') as batch:
+        for name, type_ in THRESHOLD_COLUMNS:
+            batch.alter_column(name, existing_type=type_, nullable=False)
+        if 'expression' in columns:
+            batch.drop_column('expression')
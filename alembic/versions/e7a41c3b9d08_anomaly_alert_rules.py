@@ -0,0 +1,44 @@
+"""Anomaly alert rules
+
+Revision ID: e7a41c3b9d08
+Revises: d2f86a1c5e93
+Create Date: 2026-10-19 20:12:44.108532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a41c3b9d08'
+down_revision = 'd2f86a1c5e93'
+branch_labels = None
+depends_on = None
+
+
+def _columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'alert_rules' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return {column['name'] for column in inspector.get_columns('alert_rules')}
+
+
+def upgrade():
+    columns = _columns()
+    if columns is None or 'rule_type' in columns:
+        return
+    with op.batch_alter_table('alert_rules') as batch:
+        batch.add_column(sa.Column('rule_type', sa.String(), nullable=False, server_default='threshold'))
+
+
+def downgrade():
+    columns = _columns()
+    if columns is None or 'rule_type' not in columns:
+        return
+    # Anomaly rules have no threshold form to go back to; their events are kept
+    anomaly_rules = "SELECT id FROM alert_rules WHERE rule_type = 'anomaly'"
+    op.execute(sa.text(f'UPDATE alert_events SET rule_id = NULL WHERE rule_id IN ({anomaly_rules})'))
+    op.execute(sa.text("DELETE FROM alert_rules WHERE rule_type = 'anomaly'"))
+    with op.batch_alter_table('alert_rules') as batch:
+        batch.drop_column('rule_type')
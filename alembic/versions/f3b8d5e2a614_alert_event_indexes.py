@@ -0,0 +1,50 @@
+"""Alert event indexes for listing, dedup, acknowledgement and retention
+
+Revision ID: f3b8d5e2a614
+Revises: e7a41c3b9d08
+Create Date: 2026-10-19 21:03:12.540917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d5e2a614'
+down_revision = 'e7a41c3b9d08'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_alert_events_timestamp', ['timestamp', 'id']),
+    ('ix_alert_events_rule_id_device_id_timestamp', ['rule_id', 'device_id', 'timestamp']),
+    ('ix_alert_events_device_id_timestamp', ['device_id', 'timestamp']),
+    ('ix_alert_events_severity_timestamp', ['severity', 'timestamp']),
+    ('ix_alert_events_acknowledged_timestamp', ['acknowledged', 'timestamp']),
+)
+
+
+def _existing():
+    inspector = sa.inspect(op.get_bind())
+    if 'alert_events' not in inspector.get_table_names():
+        # Fresh database: the tables are created from the models on startup
+        return None
+    return {index['name'] for index in inspector.get_indexes('alert_events')}
+
+
+def upgrade():
+    existing = _existing()
+    if existing is None:
+        return
+    for name, columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'alert_events', columns)
+
+
+def downgrade():
+    existing = _existing()
+    if existing is None:
+        return
+    for name, _ in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='alert_events')
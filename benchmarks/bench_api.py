@@ -0,0 +1,361 @@
+"""
+API load test against the "p95 < 200ms with 50+ concurrent users" target.
+
+Seeds a database with a realistic fleet, starts the API under uvicorn
+(or targets an already running one with ``--url``) and drives the read
+endpoints with concurrent async clients for a fixed duration, while a
+set of WebSocket clients stay connected to the alert feed.
+
+Seeded volumes (all configurable):
+
+- 1,000 devices with 48 interfaces each
+- device metrics every 5 minutes for 2 weeks
+- hourly interface metrics for the last 24 hours
+- 10,000 alert events over 50 rules
+
+Every endpoint gets one JSON line with requests, errors, throughput and
+p50/p95/p99/max latency in milliseconds, followed by a summary line.
+
+Usage:
+    python benchmarks/bench_api.py [--database-url sqlite:///bench_api.db] \\
+        [--devices 1000] [--interfaces 48] [--weeks 2] [--users 50] \\
+        [--ws-clients 20] [--duration 30] [--workers 1] [--url http://host:8000]
+
+Requires ``httpx`` and ``websockets`` (benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+CHUNK = 10_000
+P95_TARGET_MS = 200
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def insert_chunked(connection, table, rows):
+    """executemany in fixed-size chunks; ``rows`` may be a generator."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def seed(options: argparse.Namespace):
+    """Create the schema and fill it, unless the fleet is already there."""
+    from sqlalchemy import func, select
+
+    from app import models
+    from app.database import Base, engine
+    from app.models.device import DeviceStatus, DeviceVendor
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        existing = connection.execute(select(func.count()).select_from(models.Device.__table__)).scalar()
+        if existing and not options.reseed:
+            print(f"Reusing {existing} seeded devices", file=sys.stderr)
+            return
+        for model in (models.AlertEvent, models.AlertRule, models.InterfaceMetric,
+                      models.DeviceMetric, models.Interface, models.Device):
+            connection.execute(model.__table__.delete())
+
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    n, per_device = options.devices, options.interfaces
+    started = time.perf_counter()
+
+    with engine.begin() as connection:
+        insert_chunked(connection, models.Device.__table__, (
+            {
+                "id": i,
+                "hostname": f"sw-{i:05d}",
+                "ip_address": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+                "vendor": DeviceVendor.CISCO if i % 2 else DeviceVendor.HUAWEI,
+                "model": "C3750E" if i % 2 else "S5700",
+                "snmp_enabled": True,
+                "snmp_version": "2c",
+                "snmp_community": "public",
+                "snmp_port": 161,
+                "status": DeviceStatus.UP if i % 20 else DeviceStatus.DOWN,
+                "last_seen": now,
+            }
+            for i in range(1, n + 1)
+        ))
+        insert_chunked(connection, models.Interface.__table__, (
+            {
+                "id": (d - 1) * per_device + i,
+                "device_id": d,
+                "name": f"GigabitEthernet1/0/{i}",
+                "if_index": i,
+                "mtu": 1500,
+                "speed": 1_000_000_000,
+                "admin_status": True,
+                "oper_status": bool(i % 10),
+            }
+            for d in range(1, n + 1) for i in range(1, per_device + 1)
+        ))
+
+        samples = int(options.weeks * 7 * 24 * 3600 // options.metric_interval)
+        insert_chunked(connection, models.DeviceMetric.__table__, (
+            {
+                "device_id": d,
+                "timestamp": now - timedelta(seconds=s * options.metric_interval),
+                "cpu_usage": rng.randint(1, 95),
+                "memory_usage": rng.randint(20, 90),
+                "temperature": rng.randint(30, 60),
+                "uptime": 3_000_000 - s * options.metric_interval,
+            }
+            for d in range(1, n + 1) for s in range(samples)
+        ))
+        insert_chunked(connection, models.InterfaceMetric.__table__, (
+            {
+                "interface_id": interface,
+                "timestamp": now - timedelta(hours=h),
+                "bytes_in": rng.randint(0, 2 ** 31 - 1),
+                "bytes_out": rng.randint(0, 2 ** 31 - 1),
+                "errors_in": rng.randint(0, 5),
+                "errors_out": rng.randint(0, 5),
+                "discards_in": 0,
+                "discards_out": 0,
+            }
+            for interface in range(1, n * per_device + 1) for h in range(options.interface_hours)
+        ))
+
+        insert_chunked(connection, models.AlertRule.__table__, (
+            {
+                "id": r,
+                "name": f"rule-{r}",
+                "oid": "1.3.6.1.2.1.25.3.3.1.2",
+                "operator": ">",
+                "threshold": 90.0,
+                "severity": "critical" if r % 5 == 0 else "warning",
+                "enabled": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for r in range(1, options.rules + 1)
+        ))
+        insert_chunked(connection, models.AlertEvent.__table__, (
+            {
+                "rule_id": rng.randint(1, options.rules),
+                "device_id": rng.randint(1, n),
+                "timestamp": (now - timedelta(seconds=rng.randint(0, int(options.weeks * 604800)))).replace(tzinfo=None),
+                "value": 95.0,
+                "message": "CPU above threshold",
+                "severity": "warning",
+                "acknowledged": rng.random() < 0.7,
+            }
+            for _ in range(options.events)
+        ))
+
+    print(
+        f"Seeded {n} devices, {n * per_device} interfaces, {n * samples} device metrics, "
+        f"{n * per_device * options.interface_hours} interface metrics, {options.events} events "
+        f"in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr
+    )
+
+
+def scenarios(options: argparse.Namespace) -> Dict[str, Callable[[random.Random], str]]:
+    """Endpoint name -> function building a request path for one call."""
+    api = "/api/v1"
+    devices = options.devices
+
+    def since(hours: int) -> str:
+        start = datetime.now(timezone.utc) - timedelta(hours=hours)
+        return start.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return {
+        "device_list": lambda r: f"{api}/devices/?skip={r.randrange(0, max(1, devices - 100))}&limit=100",
+        "device_detail": lambda r: f"{api}/devices/{r.randint(1, devices)}",
+        "device_interfaces": lambda r: f"{api}/devices/{r.randint(1, devices)}/interfaces/",
+        "device_metrics_24h": lambda r: (
+            f"{api}/devices/{r.randint(1, devices)}/metrics/?start_time={since(24)}&limit=1000"
+        ),
+        "interface_metrics": lambda r: (
+            f"{api}/devices/{r.randint(1, devices)}/interfaces/"
+            f"GigabitEthernet1/0/{r.randint(1, options.interfaces)}/metrics/?limit=100"
+        ),
+        "alert_events": lambda r: f"{api}/alerts/alerts/events/",
+    }
+
+
+async def http_user(client, paths, rng, deadline, latencies, errors):
+    names = list(paths)
+    while time.perf_counter() < deadline:
+        name = rng.choice(names)
+        start = time.perf_counter()
+        try:
+            response = await client.get(paths[name](rng))
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        if ok:
+            latencies[name].append(elapsed)
+        else:
+            errors[name] += 1
+
+
+async def ws_client(url, deadline, latencies, errors):
+    import websockets
+
+    start = time.perf_counter()
+    try:
+        async with websockets.connect(url, open_timeout=10, close_timeout=1):
+            latencies["ws_connect"].append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+    except Exception:
+        errors["ws_connect"] += 1
+
+
+async def load(options: argparse.Namespace, base_url: str) -> List[dict]:
+    import httpx
+
+    paths = scenarios(options)
+    names = list(paths) + ["ws_connect"]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    limits = httpx.Limits(max_connections=options.users, max_keepalive_connections=options.users)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        # Warm-up: imports, connection pools, DB caches
+        for name in paths:
+            await client.get(paths[name](random.Random(0)))
+        started = time.perf_counter()
+        deadline = started + options.duration
+        ws_url = base_url.replace("http", "ws", 1) + "/api/v1/ws/alerts"
+        await asyncio.gather(
+            *(http_user(client, paths, random.Random(u), deadline, latencies, errors)
+              for u in range(options.users)),
+            *(ws_client(ws_url, deadline, latencies, errors) for _ in range(options.ws_clients))
+        )
+        wall = time.perf_counter() - started
+
+    results = []
+    for name in names:
+        ordered = sorted(latencies[name])
+        if not ordered and not errors[name]:
+            continue
+        results.append({
+            "endpoint": name,
+            "requests": len(ordered),
+            "errors": errors[name],
+            "rps": round(len(ordered) / wall, 1),
+            "p50_ms": round(percentile(ordered, 50), 1),
+            "p95_ms": round(percentile(ordered, 95), 1),
+            "p99_ms": round(percentile(ordered, 99), 1),
+            "max_ms": round(ordered[-1], 1) if ordered else None,
+        })
+    return results
+
+
+def start_server(options: argparse.Namespace, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(options.port),
+            "--workers", str(options.workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=SRC_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    import httpx
+
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{options.port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("API server did not become healthy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--url", help="benchmark a running API instead of starting one (no seeding)")
+    parser.add_argument("--reseed", action="store_true", help="wipe and reseed an already seeded database")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interfaces", type=int, default=48)
+    parser.add_argument("--weeks", type=float, default=2)
+    parser.add_argument("--metric-interval", type=int, default=300, help="seconds between device metrics")
+    parser.add_argument("--interface-hours", type=int, default=24, help="hourly interface metrics to seed")
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--ws-clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    options = parser.parse_args()
+
+    server = None
+    if options.url:
+        base_url = options.url.rstrip("/")
+    else:
+        database_url = options.database_url or (
+            f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_api_'), 'bench.db')}"
+        )
+        os.environ["SQLALCHEMY_DATABASE_URI"] = database_url
+        seed(options)
+        server = start_server(options, dict(os.environ, PYTHONPATH=SRC_DIR))
+        base_url = f"http://127.0.0.1:{options.port}"
+
+    try:
+        results = asyncio.run(load(options, base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # Graceful shutdown can hang on the alert WebSocket handler
+                server.kill()
+
+    for result in results:
+        print(json.dumps(result))
+    http = [r for r in results if r["endpoint"] != "ws_connect"]
+    worst = max(http, key=lambda r: r["p95_ms"]) if http else None
+    print(json.dumps({
+        "summary": True,
+        "users": options.users,
+        "ws_clients": options.ws_clients,
+        "duration_s": options.duration,
+        "total_rps": round(sum(r["rps"] for r in http), 1),
+        "errors": sum(r["errors"] for r in results),
+        "worst_p95_endpoint": worst and worst["endpoint"],
+        "worst_p95_ms": worst and worst["p95_ms"],
+        "p95_target_ms": P95_TARGET_MS,
+        "p95_target_met": bool(worst) and all(r["p95_ms"] < P95_TARGET_MS for r in http),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Fleet-scale benchmark: ``SNMPCollector`` against simulated SNMP agents.
+
+For each fleet size a fresh process seeds a throw-away SQLite database
+with that many devices, starts the agent simulator (see
+``snmp_simulator.py``) with one loopback address per device, and runs
+full ``collect_all_devices`` cycles. Per cycle it reports:
+
+- cycle_s:      wall-clock time of the cycle
+- pdus_per_s:   SNMP responses served by the simulator / cycle time
+- cpu_s:        user + system CPU of the collector process
+- max_rss_mb:   peak resident memory of the collector process
+- up/down:      devices marked up/down at the end of the cycle
+
+Results are printed as one JSON object per line, so runs can be stored
+and compared between collector changes.
+
+Usage:
+    python benchmarks/bench_collector.py [--sizes 100,1000,10000] [--cycles 2] \\
+        [--latency-ms 1] [--jitter-ms 0.5] [--loss 0.0] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+import snmp_simulator  # noqa: E402
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def seed_devices(db, options: argparse.Namespace, n: int):
+    from app import models
+    from app.models.device import DeviceVendor
+
+    db.bulk_insert_mappings(models.Device, [
+        {
+            "hostname": f"sim-{i}",
+            "ip_address": snmp_simulator.agent_address(options, i)[0],
+            "snmp_port": snmp_simulator.agent_address(options, i)[1],
+            "vendor": DeviceVendor.CISCO if i % 2 == 0 else DeviceVendor.HUAWEI,
+            "snmp_enabled": True,
+            "snmp_version": "2c",
+            "snmp_community": "public",
+        }
+        for i in range(n)
+    ])
+    db.commit()
+
+
+def run_one(options: argparse.Namespace):
+    """Benchmark one fleet size; runs in its own process so settings and memory start clean."""
+    n = options.run_one
+    workdir = tempfile.mkdtemp(prefix="bench_collector_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    options.agents = n
+    options.spread = True
+    options.host = "127.0.0.1"
+    options.counter_speedup = options.counter_speedup or 1.0
+    snmp_simulator.raise_file_limit(n + 1024)
+
+    from app.database import Base, SessionLocal, engine
+    from app.models.device import DeviceStatus
+    from app import models
+    from app.tasks.collector import SNMPCollector
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed_devices(db, options, n)
+
+    served = multiprocessing.Value("q", 0)
+    processes = snmp_simulator.spawn(options, served)
+
+    async def cycles():
+        # One event loop for all cycles, as in the API process: the probe
+        # engine's transports are bound to the loop they were opened on
+        collector = SNMPCollector()
+        for cycle in range(1, options.cycles + 1):
+            pdus, cpu, start = served.value, cpu_seconds(), time.perf_counter()
+            await collector.collect_all_devices()
+            elapsed = time.perf_counter() - start
+            pdus = served.value - pdus
+            db.expire_all()
+            up = db.query(models.Device).filter(models.Device.status == DeviceStatus.UP).count()
+            print(json.dumps({
+                "devices": n,
+                "cycle": cycle,
+                "cycle_s": round(elapsed, 3),
+                "pdus": pdus,
+                "pdus_per_s": round(pdus / elapsed, 1),
+                "cpu_s": round(cpu_seconds() - cpu, 3),
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "up": up,
+                "down": n - up,
+                "latency_ms": options.latency_ms,
+                "loss": options.loss,
+            }), flush=True)
+
+    try:
+        asyncio.run(cycles())
+    finally:
+        db.close()
+        for process in processes:
+            process.terminate()
+
+
+def main():
+    parser = snmp_simulator.build_parser()
+    parser.description = "Collector benchmark against simulated SNMP agents"
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_one:
+        options.workers = max(1, min(options.workers, options.run_one))
+        run_one(options)
+        return
+
+    args = []
+    skip = False
+    for arg in sys.argv[1:]:
+        if skip or arg.startswith("--sizes"):
+            skip = arg == "--sizes"
+            continue
+        args.append(arg)
+
+    for size in (int(s) for s in options.sizes.split(",")):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *args, "--run-one", str(size)],
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        )
+        # Only the JSON lines; importing the app may print to stdout too
+        for line in result.stdout.splitlines():
+            if line.startswith("{"):
+                print(line, flush=True)
+        if result.returncode:
+            print(json.dumps({"devices": size, "error": f"exit status {result.returncode}"}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
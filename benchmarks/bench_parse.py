@@ -0,0 +1,162 @@
+"""
+Micro-benchmark: cost of turning response varbinds into interface fields.
+
+Builds the varbinds of an ifTable walk (``--ports`` rows x 9 columns) as
+pysnmp returns them and times, per varbind:
+
+- mib_lookup:   resolving the response against the MIBs, which the
+                collector did for every response before lookupMib=False
+- string_chain: prettyPrint() of OID and value, ``split``/``join`` of the
+                OID and an if/elif chain over column OID strings, then
+                ``int()`` of the printed value (the old collector parser)
+- trie:         ``asTuple()`` of the OID, one ``OidTrie`` match to the
+                field setter and the value decoded from its ASN.1 type
+                (the ``RequestPlan`` path)
+
+Prints one JSON line per approach with nanoseconds per varbind (best of
+``--repeat`` runs).
+
+Usage:
+    python benchmarks/bench_parse.py [--ports 48] [--repeat 5] [--number 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from pysnmp.proto import rfc1902  # noqa: E402
+
+from app.utils.oid import OidTrie, parse_oid  # noqa: E402
+from app.utils.snmp import python_value  # noqa: E402
+
+IF_ENTRY = (1, 3, 6, 1, 2, 1, 2, 2, 1)
+COLUMNS = {
+    2: ("name", rfc1902.OctetString),
+    7: ("admin_status", rfc1902.Integer32),
+    8: ("oper_status", rfc1902.Integer32),
+    10: ("bytes_in", rfc1902.Counter32),
+    13: ("discards_in", rfc1902.Counter32),
+    14: ("errors_in", rfc1902.Counter32),
+    16: ("bytes_out", rfc1902.Counter32),
+    19: ("discards_out", rfc1902.Counter32),
+    20: ("errors_out", rfc1902.Counter32),
+}
+
+
+def build_varbinds(ports: int):
+    var_binds = []
+    for column, (_, syntax) in COLUMNS.items():
+        for port in range(1, ports + 1):
+            value = f"GigabitEthernet1/0/{port}" if syntax is rfc1902.OctetString else port * 1_000_003 % 2 ** 31
+            var_binds.append((rfc1902.ObjectName(IF_ENTRY + (column, port)), syntax(value)))
+    return var_binds
+
+
+def parse_mib_lookup(var_binds, engine):
+    from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
+
+    return CommandGeneratorVarBinds().unmakeVarBinds(engine, var_binds, lookupMib=True)
+
+
+def parse_string_chain(var_binds):
+    interfaces = {}
+    results = {name.prettyPrint(): value.prettyPrint() for name, value in var_binds}
+    for oid, value in results.items():
+        if oid.startswith("1.3.6.1.2.1.2.2.1.2"):
+            if_index = oid.split(".")[-1]
+            interfaces.setdefault(if_index, {})["name"] = value
+    for oid, value in results.items():
+        parts = oid.split(".")
+        base_oid = ".".join(parts[:-1])
+        if_index = parts[-1]
+        row = interfaces.get(if_index)
+        if row is None:
+            continue
+        if base_oid == "1.3.6.1.2.1.2.2.1.7":
+            row["admin_status"] = value
+        elif base_oid == "1.3.6.1.2.1.2.2.1.8":
+            row["oper_status"] = value
+        elif base_oid == "1.3.6.1.2.1.2.2.1.10":
+            row["bytes_in"] = int(value)
+        elif base_oid == "1.3.6.1.2.1.2.2.1.16":
+            row["bytes_out"] = int(value)
+        elif base_oid == "1.3.6.1.2.1.2.2.1.14":
+            row["errors_in"] = int(value)
+        elif base_oid == "1.3.6.1.2.1.2.2.1.20":
+            row["errors_out"] = int(value)
+        elif base_oid == "1.3.6.1.2.1.2.2.1.13":
+            row["discards_in"] = int(value)
+        elif base_oid == "1.3.6.1.2.1.2.2.1.19":
+            row["discards_out"] = int(value)
+    return interfaces
+
+
+def setter(field):
+    def set_interface(interfaces, index, value):
+        row = interfaces.get(index)
+        if row is None:
+            row = interfaces[index] = {}
+        row[field] = value
+    return set_interface
+
+
+TRIE = OidTrie((parse_oid(IF_ENTRY + (column,)), setter(field)) for column, (field, _) in COLUMNS.items())
+
+
+def parse_trie(var_binds):
+    interfaces = {}
+    match = TRIE.match
+    for name, value in var_binds:
+        hit = match(name.asTuple())
+        if hit is not None:
+            set_field, index = hit
+            set_field(interfaces, index, python_value(value))
+    return interfaces
+
+
+def best_ns_per_varbind(function, var_binds, repeat: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function(var_binds)
+        best = min(best, time.perf_counter() - start)
+    return best / number / len(var_binds) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response parsing micro-benchmark")
+    parser.add_argument("--ports", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20, help="parses per timed run")
+    options = parser.parse_args()
+
+    from pysnmp.hlapi import SnmpEngine
+
+    var_binds = build_varbinds(options.ports)
+    engine = SnmpEngine()
+    approaches = {
+        "mib_lookup": lambda vbs: parse_mib_lookup(vbs, engine),
+        "string_chain": parse_string_chain,
+        "trie": parse_trie,
+    }
+    # Both parsers must agree on the fields (the old one keeps statuses as text)
+    assert len(parse_trie(var_binds)) == len(parse_string_chain(var_binds)) == options.ports
+
+    for name, function in approaches.items():
+        function(var_binds)  # warm-up: MIB loading, decoder table
+        # MIB resolution is orders of magnitude slower; fewer runs suffice
+        number = max(1, options.number // 10) if name == "mib_lookup" else options.number
+        print(json.dumps({
+            "approach": name,
+            "varbinds": len(var_binds),
+            "ns_per_varbind": round(best_ns_per_varbind(function, var_binds, options.repeat, number)),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: response_model serialization vs the row-based fast path.
+
+Compares, for N metric rows:
+
+- orm:  ORM objects validated through ``List[schemas.DeviceMetric]``
+        (pydantic orm_mode), ``jsonable_encoder`` and the stdlib encoder,
+        which is what FastAPI does for ``response_model`` endpoints.
+- rows: plain row tuples turned into dicts and encoded with orjson,
+        which is what ``FAST_JSON_RESPONSES`` does.
+
+Only serialization is measured; no database is involved.
+
+Usage:
+    python benchmarks/bench_serialization.py [--rows 1000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app import schemas  # noqa: E402
+from app.crud import crud_device as crud  # noqa: E402
+from app.models import DeviceMetric  # noqa: E402
+from app.utils.serialization import rows_response  # noqa: E402
+
+
+def make_rows(n: int) -> List[tuple]:
+    now = datetime.now(timezone.utc)
+    samples = (
+        {
+            "id": i,
+            "device_id": 1,
+            "timestamp": now - timedelta(minutes=5 * i),
+            "cpu_usage": i % 100,
+            "memory_usage": (i * 7) % 100,
+            "temperature": 40 + i % 10,
+            "uptime": 86400 + i,
+        }
+        for i in range(n)
+    )
+    return [tuple(s[f] for f in crud.DEVICE_METRIC_FIELDS) for s in samples]
+
+
+def orm_path(field, objects) -> bytes:
+    content = asyncio.get_event_loop().run_until_complete(
+        serialize_response(field=field, response_content=objects)
+    )
+    return JSONResponse(content).body
+
+
+def rows_path(rows) -> bytes:
+    return rows_response(crud.DEVICE_METRIC_FIELDS, rows).body
+
+
+def bench(label: str, fn, repeat: int, n: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - start) / repeat
+    print(f"{label:>5}: {per_call * 1000:8.3f} ms/response  {per_call / n * 1e6:7.2f} us/row")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    objects = [DeviceMetric(**dict(zip(crud.DEVICE_METRIC_FIELDS, row))) for row in rows]
+    field = create_response_field(name="response", type_=List[schemas.DeviceMetric])
+
+    print(f"{args.rows} DeviceMetric rows, {args.repeat} repetitions")
+    slow = bench("orm", lambda: orm_path(field, objects), args.repeat, args.rows)
+    fast = bench("rows", lambda: rows_path(rows), args.repeat, args.rows)
+    print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
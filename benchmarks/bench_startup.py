@@ -0,0 +1,153 @@
+"""
+Startup-time benchmark for the API process.
+
+Measures, each in fresh interpreter processes:
+
+- ``import app.main``: wall time to import the application module
+- the slowest imports, from ``python -X importtime``, summed per
+  top-level package
+- API boot: from launching uvicorn to the first 200 from ``/health``
+
+Prints one JSON line per measurement (medians over ``--repeat`` runs).
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 15] \\
+        [--database-url sqlite:///startup.db] [--with-workers] [--port 8766]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=SRC_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def import_breakdown(env: dict) -> Dict[str, float]:
+    """Self time of every imported module, summed per top-level package (seconds)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SRC_DIR, env=env, check=True, capture_output=True, text=True
+    ).stderr
+    packages: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # Break the application down per module, dependencies per package
+        key = ".".join(name.split(".")[:2]) if name.startswith("app.") else name.split(".")[0]
+        packages[key] += int(self_us) / 1e6
+    return packages
+
+
+def wait_healthy(server: subprocess.Popen, port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("API server did not become healthy")
+
+
+def boot_time(env: dict, port: int) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(server, port)
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def summary(samples: List[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+        "runs": len(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API startup-time benchmark")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the import breakdown")
+    parser.add_argument("--with-workers", action="store_true",
+                        help="keep the in-process collector and evaluator enabled")
+    parser.add_argument("--port", type=int, default=8766)
+    options = parser.parse_args()
+
+    database_url = options.database_url or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_startup_'), 'startup.db')}"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC_DIR,
+        SQLALCHEMY_DATABASE_URI=database_url,
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+    )
+    if not options.with_workers:
+        env.update(RUN_COLLECTOR_IN_API="false", RUN_EVALUATOR_IN_API="false")
+
+    # One untimed run warms the bytecode cache and creates the schema
+    import_time(env)
+
+    imports = [import_time(env) for _ in range(options.repeat)]
+    print(json.dumps({"measurement": "import_app_main", **summary(imports)}))
+
+    packages = import_breakdown(env)
+    top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options.top]
+    print(json.dumps({
+        "measurement": "import_breakdown",
+        "total_ms": round(sum(packages.values()) * 1000, 1),
+        "top_ms": {name: round(seconds * 1000, 1) for name, seconds in top},
+    }))
+
+    boots = [boot_time(env, options.port) for _ in range(options.repeat)]
+    print(json.dumps({"measurement": "api_boot_to_healthy", **summary(boots)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Local HTTP endpoint for notification channels.
+
+Accepts the POSTs of "webhook" and "slack" channels (tasks/notifier.py)
+on any path and prints one JSON line per request with the number of
+alerts it carried (chat messages count as one, their first line is
+shown), so delivery, batching and retries can be checked without a real
+chat service. Latency and failures can be injected:
+``--fail-rate`` answers that share of requests with 503, which the
+notifier retries with backoff; ``--status`` answers every request with a
+fixed code (e.g. 400, which is not retried).
+
+Point a channel at it::
+
+    curl -X POST localhost:8000/api/v1/notifications/channels/ \\
+        -H 'Content-Type: application/json' \\
+        -d '{"name": "stub", "type": "webhook", "target": "http://127.0.0.1:9900/hook"}'
+
+Usage:
+    python benchmarks/notify_stub.py [--host 127.0.0.1] [--port 9900] \\
+        [--latency-ms 0] [--fail-rate 0.0] [--status 200] [--quiet]
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+import time
+from collections import Counter
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class Stub:
+    def __init__(self, options: argparse.Namespace):
+        self.options = options
+        self.requests = Counter()  # status -> requests
+        self.alerts = 0  # alerts in successful requests
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status = self.respond_with()
+                if self.options.latency_ms:
+                    await asyncio.sleep(self.options.latency_ms / 1000)
+                self.record(method, path, body, status)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Status')}\r\n"
+                    f"Content-Length: 0\r\nConnection: keep-alive\r\n\r\n".encode()
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def respond_with(self) -> int:
+        if self.options.status != 200:
+            return self.options.status
+        return 503 if random.random() < self.options.fail_rate else 200
+
+    def record(self, method: str, path: str, body: bytes, status: int):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        alerts = payload.get("count", 1 if "text" in payload else 0)
+        self.requests[status] += 1
+        if status < 300:
+            self.alerts += alerts
+        if not self.options.quiet:
+            line = {"at": round(time.time(), 3), "method": method, "path": path, "status": status, "alerts": alerts}
+            if "text" in payload:
+                line["text"] = payload["text"].split("\n", 1)[0]
+            print(json.dumps(line), flush=True)
+
+    def summary(self) -> str:
+        return json.dumps({"requests": dict(self.requests), "alerts_delivered": self.alerts})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local HTTP endpoint for notification channels")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--status", type=int, default=200, help="answer every request with this status")
+    parser.add_argument("--quiet", action="store_true", help="print the summary only")
+    return parser
+
+
+def main():
+    options = build_parser().parse_args()
+    stub = Stub(options)
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = await asyncio.start_server(stub.handle, options.host, options.port)
+        print(f"Listening on http://{options.host}:{options.port}, Ctrl+C to stop", flush=True)
+        async with server:
+            await stop.wait()
+
+    asyncio.run(serve())
+    print(stub.summary(), flush=True)
+
+
+if __name__ == "__main__":
+    main()
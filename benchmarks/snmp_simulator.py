@@ -0,0 +1,367 @@
+"""
+Local SNMP agent simulator.
+
+Runs many virtual SNMPv2c agents on consecutive localhost UDP ports. Each
+agent serves a synthetic Cisco or Huawei MIB view: the system group,
+ifTable/ifXTable with moving (and wrapping) octet/error counters,
+hrProcessorLoad and the vendor CPU, memory and temperature tables.
+Latency, jitter and packet loss can be injected to model WAN links and
+flaky devices.
+
+GET, GETNEXT and GETBULK are supported; any community is accepted.
+Agent ``i`` listens on ``host:base_port + i``, or with ``--spread`` on its
+own loopback address ``127.x.y.z:base_port`` (Linux routes all of
+127.0.0.0/8 to lo), which lets every agent have a distinct IP as devices
+do. Even agents serve the Cisco view, odd agents the Huawei view.
+
+Usage:
+    python benchmarks/snmp_simulator.py --agents 1000 --base-port 20000 \\
+        [--interfaces 48] [--latency-ms 2] [--jitter-ms 1] [--loss 0.0] \\
+        [--counter-speedup 1] [--workers 4] [--spread]
+"""
+import argparse
+import asyncio
+import bisect
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1902, rfc1905
+
+v2c = api.protoModules[api.protoVersion2c]
+
+OID = Tuple[int, ...]
+Getter = Callable[["Agent", float], object]
+
+SYSTEM = (1, 3, 6, 1, 2, 1, 1)
+IF_TABLE_ENTRY = (1, 3, 6, 1, 2, 1, 2, 2, 1)
+IF_X_TABLE_ENTRY = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1)
+IF_TABLE_LAST_CHANGE = (1, 3, 6, 1, 2, 1, 31, 1, 5, 0)
+HR_PROCESSOR_LOAD = (1, 3, 6, 1, 2, 1, 25, 3, 3, 1, 2)
+CISCO_CPU_5MIN = (1, 3, 6, 1, 4, 1, 9, 9, 109, 1, 1, 1, 1, 8)
+CISCO_MEM_USED = (1, 3, 6, 1, 4, 1, 9, 9, 48, 1, 1, 1, 5)
+CISCO_MEM_FREE = (1, 3, 6, 1, 4, 1, 9, 9, 48, 1, 1, 1, 6)
+CISCO_TEMPERATURE = (1, 3, 6, 1, 4, 1, 9, 9, 13, 1, 3, 1, 3)
+HUAWEI_ENTITY_CPU = (1, 3, 6, 1, 4, 1, 2011, 5, 25, 31, 1, 1, 1, 1, 5)
+HUAWEI_ENTITY_MEM = (1, 3, 6, 1, 4, 1, 2011, 5, 25, 31, 1, 1, 1, 1, 7)
+HUAWEI_ENTITY_TEMP = (1, 3, 6, 1, 4, 1, 2011, 5, 25, 31, 1, 1, 1, 1, 11)
+
+VENDORS = ("cisco", "huawei")
+SYS_DESCR = {
+    "cisco": "Cisco IOS Software, C3750E Software (C3750E-UNIVERSALK9-M), Version 15.2(4)E10",
+    "huawei": "Huawei Versatile Routing Platform Software VRP (R) software, Version 5.170 (S5700 V200R011C10SPC500)",
+}
+SYS_OBJECT_ID = {
+    "cisco": (1, 3, 6, 1, 4, 1, 9, 1, 516),
+    "huawei": (1, 3, 6, 1, 4, 1, 2011, 2, 23, 102),
+}
+
+
+class Agent:
+    """Per-agent state; the MIB layout itself is shared by all agents of a view."""
+
+    __slots__ = ("index", "vendor", "start", "speedup", "served")
+
+    def __init__(self, index: int, vendor: str, speedup: float):
+        self.index = index
+        self.vendor = vendor
+        self.start = time.time()
+        self.speedup = speedup
+        self.served = 0
+
+    def elapsed(self, now: float) -> float:
+        return (now - self.start) * self.speedup
+
+    def rate(self, if_index: int, salt: int) -> int:
+        """Deterministic per-interface rate so every agent looks different."""
+        return 1 + (self.index * 7919 + if_index * 104729 + salt) % 1000
+
+
+def _counter32(value: float) -> rfc1902.Counter32:
+    return rfc1902.Counter32(int(value) % 2 ** 32)
+
+
+def _counter64(value: float) -> rfc1902.Counter64:
+    return rfc1902.Counter64(int(value) % 2 ** 64)
+
+
+def _octets(agent: Agent, now: float, if_index: int, salt: int) -> float:
+    # 10 kB/s .. 10 MB/s per direction, plus a per-interface starting offset
+    offset = agent.rate(if_index, salt * 31) * 4_000_000
+    return offset + agent.rate(if_index, salt) * 10_000 * agent.elapsed(now)
+
+
+def _errors(agent: Agent, now: float, if_index: int, salt: int) -> float:
+    return agent.rate(if_index, salt) * agent.elapsed(now) / 5000
+
+
+def _wave(agent: Agent, now: float, low: int, high: int, period: float = 900) -> int:
+    """Slowly oscillating gauge between ``low`` and ``high``."""
+    phase = (agent.index * 37 + now / period) % 2
+    return int(low + (high - low) * (phase if phase < 1 else 2 - phase))
+
+
+class MibView:
+    """Sorted OID space and value getters shared by agents of the same vendor."""
+
+    def __init__(self, vendor: str, interfaces: int):
+        self.vendor = vendor
+        self.getters: Dict[OID, Getter] = {}
+        self._build(vendor, interfaces)
+        self.oids: List[OID] = sorted(self.getters)
+
+    def _add(self, oid: OID, getter: Getter):
+        self.getters[oid] = getter
+
+    def _build(self, vendor: str, interfaces: int):
+        add = self._add
+        add(SYSTEM + (1, 0), lambda a, t: rfc1902.OctetString(SYS_DESCR[a.vendor]))
+        add(SYSTEM + (2, 0), lambda a, t: rfc1902.ObjectIdentifier(SYS_OBJECT_ID[a.vendor]))
+        add(SYSTEM + (3, 0), lambda a, t: rfc1902.TimeTicks(int((t - a.start) * 100) % 2 ** 32))
+        add(SYSTEM + (4, 0), lambda a, t: rfc1902.OctetString("noc@example.com"))
+        add(SYSTEM + (5, 0), lambda a, t: rfc1902.OctetString(f"sim-{a.vendor}-{a.index}"))
+        add(SYSTEM + (6, 0), lambda a, t: rfc1902.OctetString(f"rack-{a.index // 40}"))
+        add((1, 3, 6, 1, 2, 1, 2, 1, 0), lambda a, t: rfc1902.Integer32(interfaces))
+        add(IF_TABLE_LAST_CHANGE, lambda a, t: rfc1902.TimeTicks(0))
+
+        prefix = "GigabitEthernet1/0/" if vendor == "cisco" else "GigabitEthernet0/0/"
+        for i in range(1, interfaces + 1):
+            name = f"{prefix}{i}"
+            columns = {
+                1: lambda a, t, i=i: rfc1902.Integer32(i),
+                2: lambda a, t, n=name: rfc1902.OctetString(n),
+                3: lambda a, t: rfc1902.Integer32(6),  # ethernetCsmacd
+                4: lambda a, t: rfc1902.Integer32(1500),
+                5: lambda a, t: rfc1902.Gauge32(1_000_000_000),
+                6: lambda a, t, i=i: rfc1902.OctetString(bytes([0, 0x1b, 0x54, a.index >> 8 & 0xff, a.index & 0xff, i])),
+                7: lambda a, t: rfc1902.Integer32(1),
+                8: lambda a, t, i=i: rfc1902.Integer32(1 if (a.index + i) % 10 else 2),
+                10: lambda a, t, i=i: _counter32(_octets(a, t, i, 1)),
+                13: lambda a, t, i=i: _counter32(_errors(a, t, i, 3) / 2),
+                14: lambda a, t, i=i: _counter32(_errors(a, t, i, 4)),
+                16: lambda a, t, i=i: _counter32(_octets(a, t, i, 2)),
+                19: lambda a, t, i=i: _counter32(_errors(a, t, i, 5) / 2),
+                20: lambda a, t, i=i: _counter32(_errors(a, t, i, 6)),
+            }
+            for column, getter in columns.items():
+                add(IF_TABLE_ENTRY + (column, i), getter)
+            x_columns = {
+                1: lambda a, t, n=name: rfc1902.OctetString(n),
+                6: lambda a, t, i=i: _counter64(_octets(a, t, i, 1)),
+                10: lambda a, t, i=i: _counter64(_octets(a, t, i, 2)),
+                15: lambda a, t: rfc1902.Gauge32(1000),
+                18: lambda a, t, i=i: rfc1902.OctetString(f"uplink-{i}" if i <= 2 else ""),
+            }
+            for column, getter in x_columns.items():
+                add(IF_X_TABLE_ENTRY + (column, i), getter)
+
+        add(HR_PROCESSOR_LOAD + (1,), lambda a, t: rfc1902.Integer32(_wave(a, t, 5, 60)))
+        if vendor == "cisco":
+            add(CISCO_CPU_5MIN + (1,), lambda a, t: rfc1902.Gauge32(_wave(a, t, 5, 60)))
+            add(CISCO_MEM_USED + (1,), lambda a, t: rfc1902.Gauge32(_wave(a, t, 100, 400) * 2 ** 20))
+            add(CISCO_MEM_FREE + (1,), lambda a, t: rfc1902.Gauge32(_wave(a, t, 100, 400, 1300) * 2 ** 20))
+            add(CISCO_TEMPERATURE + (1,), lambda a, t: rfc1902.Gauge32(_wave(a, t, 30, 55)))
+        else:
+            # Entity table: chassis (no sensors) plus one board with real values
+            for entity, scale in ((16842753, 0), (16842754, 1)):
+                add(HUAWEI_ENTITY_CPU + (entity,), lambda a, t, s=scale: rfc1902.Integer32(s * _wave(a, t, 5, 60)))
+                add(HUAWEI_ENTITY_MEM + (entity,), lambda a, t, s=scale: rfc1902.Integer32(s * _wave(a, t, 20, 80)))
+                add(HUAWEI_ENTITY_TEMP + (entity,), lambda a, t, s=scale: rfc1902.Integer32(s * _wave(a, t, 30, 55)))
+
+    def get(self, agent: Agent, oid: OID, now: float):
+        getter = self.getters.get(oid)
+        if getter is None:
+            return rfc1905.noSuchObject
+        return getter(agent, now)
+
+    def next(self, agent: Agent, oid: OID, now: float) -> Tuple[OID, object]:
+        position = bisect.bisect_right(self.oids, oid)
+        if position >= len(self.oids):
+            return oid, rfc1905.endOfMibView
+        next_oid = self.oids[position]
+        return next_oid, self.getters[next_oid](agent, now)
+
+
+class AgentProtocol(asyncio.DatagramProtocol):
+    def __init__(self, agent: Agent, view: MibView, options: argparse.Namespace, counter=None):
+        self.agent = agent
+        self.view = view
+        self.options = options
+        self.counter = counter
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if self.options.loss and random.random() < self.options.loss:
+            return
+        try:
+            response = self.respond(data)
+        except Exception:
+            return
+        if response is None:
+            return
+        self.agent.served += 1
+        if self.counter is not None:
+            with self.counter.get_lock():
+                self.counter.value += 1
+        delay = (self.options.latency_ms + random.uniform(-1, 1) * self.options.jitter_ms) / 1000
+        if delay > 0:
+            asyncio.get_event_loop().call_later(delay, self.transport.sendto, response, addr)
+        else:
+            self.transport.sendto(response, addr)
+
+    def respond(self, data: bytes) -> Optional[bytes]:
+        if int(api.decodeMessageVersion(data)) != api.protoVersion2c:
+            return None
+        request, _ = decoder.decode(data, asn1Spec=v2c.Message())
+        response = v2c.apiMessage.getResponse(request)
+        request_pdu = v2c.apiMessage.getPDU(request)
+        response_pdu = v2c.apiMessage.getPDU(response)
+        now = time.time()
+        agent, view = self.agent, self.view
+        var_binds = []
+
+        if request_pdu.isSameTypeWith(v2c.GetRequestPDU()):
+            for oid, _ in v2c.apiPDU.getVarBinds(request_pdu):
+                var_binds.append((oid, view.get(agent, tuple(oid), now)))
+        elif request_pdu.isSameTypeWith(v2c.GetNextRequestPDU()):
+            for oid, _ in v2c.apiPDU.getVarBinds(request_pdu):
+                var_binds.append(view.next(agent, tuple(oid), now))
+        elif request_pdu.isSameTypeWith(v2c.GetBulkRequestPDU()):
+            requested = [tuple(oid) for oid, _ in v2c.apiBulkPDU.getVarBinds(request_pdu)]
+            non_repeaters = int(v2c.apiBulkPDU.getNonRepeaters(request_pdu))
+            repetitions = min(int(v2c.apiBulkPDU.getMaxRepetitions(request_pdu)), 64)
+            for oid in requested[:non_repeaters]:
+                var_binds.append(view.next(agent, oid, now))
+            cursors = requested[non_repeaters:]
+            for _ in range(repetitions):
+                if not cursors:
+                    break
+                row = [view.next(agent, oid, now) for oid in cursors]
+                var_binds.extend(row)
+                cursors = [oid for oid, _ in row]
+                if all(value is rfc1905.endOfMibView for _, value in row):
+                    break
+        else:
+            return None
+
+        v2c.apiPDU.setVarBinds(response_pdu, var_binds)
+        return encoder.encode(response)
+
+
+def agent_address(options: argparse.Namespace, index: int) -> Tuple[str, int]:
+    """UDP address of agent ``index``."""
+    if options.spread:
+        return f"127.{1 + index // 64516}.{1 + index // 254 % 254}.{1 + index % 254}", options.base_port
+    return options.host, options.base_port + index
+
+
+def raise_file_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(needed, soft)), hard))
+
+
+async def start_agents(
+    options: argparse.Namespace,
+    first: int,
+    count: int,
+    counter=None
+) -> List[asyncio.DatagramTransport]:
+    """Bind agents ``first .. first + count - 1`` (see ``agent_address``)."""
+    loop = asyncio.get_running_loop()
+    views = {vendor: MibView(vendor, options.interfaces) for vendor in VENDORS}
+    transports = []
+    for index in range(first, first + count):
+        vendor = VENDORS[index % 2]
+        agent = Agent(index, vendor, options.counter_speedup)
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda agent=agent, vendor=vendor: AgentProtocol(agent, views[vendor], options, counter),
+            local_addr=agent_address(options, index)
+        )
+        transports.append(transport)
+    return transports
+
+
+def serve(options: argparse.Namespace, first: int, count: int, counter=None, ready=None):
+    """Run a block of agents until interrupted (one simulator worker)."""
+    raise_file_limit(count + 64)
+
+    async def main():
+        transports = await start_agents(options, first, count, counter)
+        if ready is not None:
+            ready.set()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+        for transport in transports:
+            transport.close()
+
+    asyncio.run(main())
+
+
+def spawn(options: argparse.Namespace, counter=None) -> List[multiprocessing.Process]:
+    """Start ``options.workers`` simulator processes and wait until all agents are bound."""
+    per_worker = -(-options.agents // options.workers)
+    processes = []
+    events = []
+    for first in range(0, options.agents, per_worker):
+        ready = multiprocessing.Event()
+        count = min(per_worker, options.agents - first)
+        process = multiprocessing.Process(
+            target=serve, args=(options, first, count, counter, ready), daemon=True
+        )
+        process.start()
+        processes.append(process)
+        events.append(ready)
+    for ready in events:
+        ready.wait()
+    return processes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local SNMPv2c agent simulator")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=20000)
+    parser.add_argument("--interfaces", type=int, default=48)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of dropping a request")
+    parser.add_argument("--counter-speedup", type=float, default=1.0,
+                        help="advance counters this many times faster than real time (forces wraps)")
+    parser.add_argument("--spread", action="store_true",
+                        help="one loopback address per agent on a shared port (Linux)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    return parser
+
+
+def main():
+    options = build_parser().parse_args()
+    options.workers = max(1, min(options.workers, options.agents))
+    first, last = agent_address(options, 0), agent_address(options, options.agents - 1)
+    print(
+        f"Starting {options.agents} agents on {first[0]}:{first[1]} .. "
+        f"{last[0]}:{last[1]} ({options.workers} workers)"
+    )
+    processes = spawn(options)
+    print("Agents ready, Ctrl+C to stop")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
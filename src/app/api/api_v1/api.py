@@ -1,9 +1,13 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import devices, alerts, alerts_ws
+from app.api.endpoints import devices, polling, alerts, alerts_ws, admin, notifications, summary
 
 api_router = APIRouter()
 # Include the devices router with the /devices prefix
 api_router.include_router(devices.router, prefix="/devices", tags=["devices"])
+api_router.include_router(polling.router, prefix="/devices", tags=["devices"])
 api_router.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
 api_router.include_router(alerts_ws.router)
+api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
+api_router.include_router(summary.router, prefix="/summary", tags=["summary"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
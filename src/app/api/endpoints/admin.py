@@ -0,0 +1,52 @@
+import asyncio
+import cProfile
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.core import profiling
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10, gt=0, le=300, description="How long to profile"),
+    format: str = Query(
+        "collapsed",
+        regex="^(collapsed|pstats)$",
+        description="collapsed: sampled stacks of all threads (flamegraph input); "
+                    "pstats: deterministic profile of the event loop thread"
+    )
+):
+    """
+    Profile the running process for a number of seconds
+
+    The artifact is also saved to PROFILE_DIR; its path is returned in the
+    X-Profile-Path header. Only available with PROFILING_ENABLED.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profiling is disabled"
+        )
+
+    base = profiling.artifact_base("manual")
+    if format == "pstats":
+        # Runs on the event loop thread: sees every coroutine and handler
+        # scheduled there while we sleep
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        profile.dump_stats(f"{base}.prof")
+        path, content = f"{base}.prof", profiling.pstats_report(profile)
+    else:
+        loop = asyncio.get_running_loop()
+        profiler = await loop.run_in_executor(None, profiling.sample_for, seconds)
+        content = profiler.collapsed()
+        path = profiling.save_artifact(base, "collapsed", content)
+
+    return PlainTextResponse(content, headers={"X-Profile-Path": path})
@@ -1,23 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.schemas import alert as schemas
 from app.models import alert as models
+from app.crud import crud_alert as crud
+from app.core import http_cache
 from app.database import get_db
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
 @router.post("/rules/", response_model=schemas.AlertRule)
 def create_alert_rule(rule: schemas.AlertRuleCreate, db: Session = Depends(get_db)):
+    """
+    Create an alert rule from an expression such as
+    `in_bps > 0.9 * speed for 5m` or `avg(cpu_usage, 10m) > 80`, or from
+    `oid` (a metric name), `operator` and `threshold`. Rules that don't
+    compile are rejected with 422.
+    """
     db_rule = models.AlertRule(**rule.dict())
     db.add(db_rule)
     db.commit()
     db.refresh(db_rule)
+    http_cache.invalidate(http_cache.ALERT_RULES)
     return db_rule
 
 @router.get("/rules/", response_model=List[schemas.AlertRule])
-def list_alert_rules(db: Session = Depends(get_db)):
-    return db.query(models.AlertRule).all()
+async def list_alert_rules(request: Request, db: Session = Depends(get_db)):
+    """List alert rules; supports ETag/If-None-Match and Last-Modified/If-Modified-Since"""
+    def build():
+        return [schemas.AlertRule.from_orm(rule).dict() for rule in db.query(models.AlertRule).all()]
+
+    return await http_cache.cached_response(request, (http_cache.ALERT_RULES,), build)
+
+@router.put("/rules/{rule_id}", response_model=schemas.AlertRule)
+def update_alert_rule(rule_id: int, rule: schemas.AlertRuleCreate, db: Session = Depends(get_db)):
+    """Replace an alert rule; the evaluator picks up the new condition on its next pass"""
+    db_rule = db.query(models.AlertRule).get(rule_id)
+    if not db_rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    for field, value in rule.dict().items():
+        setattr(db_rule, field, value)
+    db.commit()
+    db.refresh(db_rule)
+    http_cache.invalidate(http_cache.ALERT_RULES)
+    return db_rule
 
 @router.delete("/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_alert_rule(rule_id: int, db: Session = Depends(get_db)):
@@ -26,18 +53,54 @@ def delete_alert_rule(rule_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Rule not found")
     db.delete(rule)
     db.commit()
+    http_cache.invalidate(http_cache.ALERT_RULES)
     return None
 
 @router.get("/events/", response_model=List[schemas.AlertEvent])
-def list_alert_events(db: Session = Depends(get_db)):
-    return db.query(models.AlertEvent).order_by(models.AlertEvent.timestamp.desc()).all()
+def list_alert_events(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of events to return"),
+    severity: Optional[str] = None,
+    device_id: Optional[int] = None,
+    rule_id: Optional[int] = None,
+    acknowledged: Optional[bool] = Query(None, description="false for unacknowledged events only"),
+    start_time: Optional[datetime] = Query(None, description="Start time for filtering events"),
+    end_time: Optional[datetime] = Query(None, description="End time for filtering events"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get alert events, newest first
+
+    - **severity**, **device_id**, **rule_id**, **acknowledged**: Optional filters
+    - **start_time**, **end_time**: Optional time range
+    - **skip**, **limit**: Paging (limit 1-1000, default: 100)
+    """
+    return crud.get_alert_events(
+        db,
+        skip=skip,
+        limit=limit,
+        severity=severity,
+        device_id=device_id,
+        rule_id=rule_id,
+        acknowledged=acknowledged,
+        start_time=start_time,
+        end_time=end_time
+    )
+
+@router.post("/events/ack")
+def acknowledge_alert_events(selection: schemas.AlertEventFilter, db: Session = Depends(get_db)):
+    """
+    Acknowledge every unacknowledged event matching the filter in one
+    UPDATE, e.g. `{"device_id": 3}` after an outage or
+    `{"event_ids": [...]}`. Acknowledging every event takes
+    `{"all": true}`; an empty filter is rejected.
+    """
+    count = crud.acknowledge_alert_events(db, **selection.dict(exclude={"all"}))
+    return {"ok": True, "acknowledged": count}
 
 @router.post("/events/ack/{event_id}")
 def acknowledge_alert_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.AlertEvent).get(event_id)
+    event = crud.acknowledge_alert_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    event.acknowledged = True
-    db.commit()
-    db.refresh(event)
     return {"ok": True, "event_id": event_id}
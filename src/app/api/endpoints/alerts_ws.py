@@ -2,6 +2,8 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import List
 import asyncio
 
+from app.core import events, metrics
+
 router = APIRouter()
 
 class ConnectionManager:
@@ -13,19 +15,40 @@ class ConnectionManager:
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_json(message) for connection in connections),
+            return_exceptions=True
+        )
+        # A client that went away must not hold up or break the others
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
 manager = ConnectionManager()
+metrics.WEBSOCKET_CLIENTS.set_function(lambda: len(manager.active_connections))
+
+def push_alert(alert: dict):
+    """Send a new alert to every connected client (``alert.created`` handler)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if manager.active_connections:
+        loop.create_task(manager.broadcast({"type": "alert", "alert": alert}))
+
+events.subscribe(events.ALERT_CREATED, push_alert)
 
 @router.websocket("/ws/alerts")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            await asyncio.sleep(60)  # keep connection alive
+            # Clients don't send anything; this returns when they disconnect
+            await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket)
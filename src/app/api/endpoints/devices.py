@@ -1,13 +1,17 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Body, Request
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 from app import schemas
 from app.crud import crud_device as crud
+from app.tasks import polling
+from app.core import http_cache
+from app.core.config import settings
 from app.database import get_db
 from app.models import Device, DeviceMetric, Interface, InterfaceMetric
+from app.utils.serialization import rows_content, rows_response
 
 router = APIRouter(prefix="", tags=["devices"])
 
@@ -21,8 +25,11 @@ async def create_device(device: schemas.DeviceCreate, db: Session = Depends(get_
     - **vendor**: Device vendor (cisco, huawei, etc.)
     - **model**: Device model
     - **os_version**: Operating system version
+    - **snmp_version**: SNMP version: 1, 2c or 3 (default: 2c)
     - **snmp_community**: SNMP community string (if using SNMP v1/v2c)
     - **snmp_port**: SNMP port (default: 161)
+    - **snmp_v3_username**, **snmp_v3_auth_protocol**, **snmp_v3_auth_key**,
+      **snmp_v3_priv_protocol**, **snmp_v3_priv_key**: USM credentials (if using SNMP v3)
     - **ssh_username**: SSH username (if using SSH)
     - **ssh_password**: SSH password (if using SSH)
     """
@@ -45,6 +52,7 @@ async def create_device(device: schemas.DeviceCreate, db: Session = Depends(get_
 
 @router.get("/", response_model=List[schemas.Device])
 async def read_devices(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
     vendor: Optional[str] = None,
@@ -53,17 +61,32 @@ async def read_devices(
 ):
     """
     Retrieve a list of network devices with optional filtering
+    
+    Supports ETag/If-None-Match and Last-Modified/If-Modified-Since; the
+    list changes whenever a device is written, including the status and
+    last_seen updates of every collection cycle.
     """
-    return crud.get_devices(
-        db, 
-        skip=skip, 
-        limit=limit,
-        vendor=vendor,
-        status=status
-    )
+    def build():
+        if settings.FAST_JSON_RESPONSES:
+            rows = crud.get_device_rows(
+                db, skip=skip, limit=limit, vendor=vendor, status=status
+            )
+            return rows_content(crud.DEVICE_FIELDS, rows)
+
+        devices = crud.get_devices(
+            db, 
+            skip=skip, 
+            limit=limit,
+            vendor=vendor,
+            status=status
+        )
+        return [schemas.Device.from_orm(device).dict() for device in devices]
+
+    return await http_cache.cached_response(request, (http_cache.DEVICES,), build)
 
 @router.get("/{device_id}", response_model=schemas.Device)
 async def read_device(
+    request: Request,
     device_id: int = Path(..., title="The ID of the device to get"),
     db: Session = Depends(get_db)
 ):
@@ -72,13 +95,16 @@ async def read_device(
     
     - **device_id**: The ID of the device to retrieve
     """
-    db_device = crud.get_device(db, device_id=device_id)
-    if db_device is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
-        )
-    return db_device
+    def build():
+        db_device = crud.get_device(db, device_id=device_id)
+        if db_device is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Device not found"
+            )
+        return schemas.Device.from_orm(db_device).dict()
+
+    return await http_cache.cached_response(request, (http_cache.device(device_id),), build)
 
 @router.put("/{device_id}", response_model=schemas.Device)
 async def update_device(
@@ -115,8 +141,20 @@ async def update_device(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Another device with this hostname already exists"
             )
-    
-    return crud.update_device(db=db, db_device=db_device, device_update=device)
+
+    # The DeviceCreate rule, against the stored values the update keeps
+    changes = device.dict(exclude_unset=True)
+    snmp_version = changes.get("snmp_version", db_device.snmp_version)
+    username = changes.get("snmp_v3_username", db_device.snmp_v3_username)
+    if snmp_version == schemas.SNMPVersion.v3 and not username:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="snmp_v3_username is required for SNMP v3"
+        )
+
+    db_device = crud.update_device(db=db, db_device=db_device, device_update=device)
+    polling.forget_device(device_id)
+    return db_device
 
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_device(
@@ -135,6 +173,7 @@ async def delete_device(
             detail="Device not found"
         )
     crud.delete_device(db=db, device_id=device_id)
+    polling.forget_device(device_id)
     return None
 
 @router.post(
@@ -210,6 +249,16 @@ async def get_device_metrics(
             detail="Device not found"
         )
     
+    if settings.FAST_JSON_RESPONSES:
+        rows = crud.get_device_metric_rows(
+            db=db,
+            device_id=device_id,
+            start_time=start_time,
+            end_time=end_time,
+            limit=limit
+        )
+        return rows_response(crud.DEVICE_METRIC_FIELDS, rows)
+
     return crud.get_device_metrics(
         db=db,
         device_id=device_id,
@@ -258,6 +307,7 @@ async def create_interface(
     db.add(db_interface)
     db.commit()
     db.refresh(db_interface)
+    http_cache.invalidate(http_cache.interfaces(device_id))
     
     # Return the created interface
     return db_interface
@@ -267,6 +317,7 @@ async def create_interface(
     response_model=List[schemas.Interface]
 )
 async def get_device_interfaces(
+    request: Request,
     device_id: int = Path(..., title="The ID of the device"),
     db: Session = Depends(get_db)
 ):
@@ -275,15 +326,25 @@ async def get_device_interfaces(
     
     - **device_id**: The ID of the device
     """
-    # Check if device exists
-    if not crud.get_device(db, device_id=device_id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail="Device not found"
-        )
-    
-    # Get all interfaces for the device
-    return crud.get_interfaces(db=db, device_id=device_id)
+    def build():
+        # Check if device exists
+        if not crud.get_device(db, device_id=device_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, 
+                detail="Device not found"
+            )
+        
+        # Get all interfaces for the device
+        if settings.FAST_JSON_RESPONSES:
+            rows = crud.get_interface_rows(db=db, device_id=device_id)
+            return rows_content(crud.INTERFACE_FIELDS, rows)
+
+        interfaces = crud.get_interfaces(db=db, device_id=device_id)
+        return [schemas.Interface.from_orm(interface).dict() for interface in interfaces]
+
+    # The device's own version covers its deletion
+    keys = (http_cache.device(device_id), http_cache.interfaces(device_id))
+    return await http_cache.cached_response(request, keys, build)
 
 @router.post(
     "/{device_id}/interfaces/{interface_name:path}/metrics/", 
@@ -321,7 +382,7 @@ async def create_interface_metric(
             interface=schemas.InterfaceCreate(
                 name=interface_name,
                 description=f"Auto-created interface {interface_name}",
-                if_index=0,  # Will be updated by SNMP poller
+                if_index=0,  # Adopted by interface discovery, matched by name
                 device_id=device_id
             )
         )
@@ -379,12 +440,23 @@ async def get_interface_metrics(
         )
     
     # Check if interface exists
-    if not crud.get_interface_by_name(db, device_id=device_id, interface_name=interface_name):
+    db_interface = crud.get_interface_by_name(db, device_id=device_id, interface_name=interface_name)
+    if not db_interface:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Interface not found"
         )
     
+    if settings.FAST_JSON_RESPONSES:
+        rows = crud.get_interface_metric_rows(
+            db=db,
+            interface_id=db_interface.id,
+            start_time=start_time,
+            end_time=end_time,
+            limit=limit
+        )
+        return rows_response(crud.INTERFACE_METRIC_FIELDS, rows)
+
     return crud.get_interface_metrics(
         db=db,
         device_id=device_id,
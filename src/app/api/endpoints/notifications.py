@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.schemas import notification as schemas
+from app.models import notification as models
+from app.crud import crud_notification as crud
+from app.database import get_db
+
+router = APIRouter()
+
+@router.post("/channels/", response_model=schemas.NotificationChannel)
+def create_channel(channel: schemas.NotificationChannelCreate, db: Session = Depends(get_db)):
+    """
+    Create a notification channel
+
+    - **type**: `webhook` (JSON POST of the alerts), `slack` (`{"text": ...}`
+      to an incoming webhook) or `email` (SMTP_* settings)
+    - **target**: URL, or comma-separated addresses for email
+    - **min_severity**: Least severe alerts sent (info, warning, critical)
+    - **batch_window**, **batch_size**: Alerts raised within `batch_window`
+      seconds go out together, `batch_size` per message
+    """
+    db_channel = models.NotificationChannel(**channel.dict())
+    db.add(db_channel)
+    db.commit()
+    db.refresh(db_channel)
+    return db_channel
+
+@router.get("/channels/", response_model=List[schemas.NotificationChannel])
+def list_channels(db: Session = Depends(get_db)):
+    return db.query(models.NotificationChannel).all()
+
+@router.put("/channels/{channel_id}", response_model=schemas.NotificationChannel)
+def update_channel(channel_id: int, channel: schemas.NotificationChannelCreate, db: Session = Depends(get_db)):
+    """Replace a channel; alerts already queued for it keep their due time"""
+    db_channel = db.query(models.NotificationChannel).get(channel_id)
+    if not db_channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    for field, value in channel.dict().items():
+        setattr(db_channel, field, value)
+    db.commit()
+    db.refresh(db_channel)
+    return db_channel
+
+@router.delete("/channels/{channel_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_channel(channel_id: int, db: Session = Depends(get_db)):
+    """Delete a channel and its outbox rows, sent or not"""
+    channel = db.query(models.NotificationChannel).get(channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    db.query(models.NotificationOutbox).filter(models.NotificationOutbox.channel_id == channel_id)\
+        .delete(synchronize_session=False)
+    db.delete(channel)
+    db.commit()
+    return None
+
+@router.get("/outbox/", response_model=List[schemas.NotificationOutbox])
+def list_outbox(
+    status: Optional[str] = Query(None, regex="^(pending|sent|failed)$"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get notification outbox rows, newest first, e.g. `?status=failed` with their last error"""
+    return crud.get_outbox(db, status=status, skip=skip, limit=limit)
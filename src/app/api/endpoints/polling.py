@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.core.config import settings
+from app.crud import crud_device as crud
+from app.database import get_db
+from app.tasks.polling import PollResult, RateLimited, get_coordinator
+from app.utils.snmp import SNMPTimeout
+
+router = APIRouter(prefix="", tags=["devices"])
+
+def _interface_rows(columns: Dict[str, list]) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+def _result_document(result: PollResult, shared: bool) -> Dict[str, Any]:
+    data = result.data
+    return schemas.PollResult(
+        device_id=result.device_id,
+        polled_at=result.polled_at,
+        shared=shared,
+        groups=sorted(result.groups),
+        info=data["info"],
+        metrics=data["metrics"],
+        interfaces=_interface_rows(data["interfaces"]),
+    ).dict()
+
+async def _poll(device_id: int, groups) -> Tuple[int, str, Optional[str], Any]:
+    """Poll one device through the coordinator as (status code, status, detail, document)"""
+    try:
+        result, shared = await get_coordinator().poll(device_id, frozenset(group.value for group in groups))
+    except RateLimited as e:
+        return status.HTTP_429_TOO_MANY_REQUESTS, "rate_limited", str(e), e.retry_after
+    if isinstance(result.error, SNMPTimeout):
+        return status.HTTP_504_GATEWAY_TIMEOUT, "timeout", str(result.error), None
+    if result.error is not None:
+        return status.HTTP_502_BAD_GATEWAY, "error", str(result.error), None
+    if result.data is None:
+        return status.HTTP_404_NOT_FOUND, "not_found", "Device not found or SNMP disabled", None
+    return status.HTTP_200_OK, "ok", None, _result_document(result, shared)
+
+@router.post(
+    "/{device_id}/poll",
+    response_model=schemas.PollResult,
+    summary="Poll a device now"
+)
+async def poll_device(
+    device_id: int = Path(..., title="The ID of the device to poll"),
+    request: schemas.PollRequest = Body(schemas.PollRequest()),
+    db: Session = Depends(get_db)
+):
+    """
+    Collect fresh data from a device immediately instead of waiting for the
+    next collection cycle; the samples are stored like collected ones
+
+    - **groups**: Metric groups to collect: `device` and/or `interfaces`
+      (the system group is always included)
+
+    Concurrent requests for the same device share one poll, and a poll is
+    reused for POLL_MIN_INTERVAL seconds (`shared` is true then). Requests
+    for other groups within that interval get 429 with Retry-After.
+    """
+    if not crud.get_device(db, device_id=device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found"
+        )
+    code, _, detail, document = await _poll(device_id, request.groups)
+    if code == status.HTTP_429_TOO_MANY_REQUESTS:
+        raise HTTPException(
+            status_code=code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, round(document)))}
+        )
+    if code != status.HTTP_200_OK:
+        raise HTTPException(status_code=code, detail=detail)
+    return document
+
+@router.post(
+    "/poll",
+    response_model=List[schemas.BatchPollItem],
+    summary="Poll several devices now"
+)
+async def poll_devices(
+    request: schemas.BatchPollRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as each device completes")
+):
+    """
+    Poll several devices concurrently, with the same coalescing and rate
+    limit per device as the single-device endpoint
+
+    - **device_ids**: Devices to poll
+    - **groups**: Metric groups to collect: `device` and/or `interfaces`
+    - **stream**: Return `application/x-ndjson`, one line per device in
+      completion order, instead of a JSON array in request order
+    """
+    semaphore = asyncio.Semaphore(settings.POLL_BATCH_CONCURRENCY)
+    device_ids = list(dict.fromkeys(request.device_ids))
+
+    async def poll(device_id: int) -> Dict[str, Any]:
+        async with semaphore:
+            code, state, detail, document = await _poll(device_id, request.groups)
+        return schemas.BatchPollItem(
+            device_id=device_id,
+            status=state,
+            detail=detail,
+            result=document if code == status.HTTP_200_OK else None,
+        ).dict()
+
+    if not stream:
+        return await asyncio.gather(*(poll(device_id) for device_id in device_ids))
+
+    async def lines():
+        for item in asyncio.as_completed([poll(device_id) for device_id in device_ids]):
+            yield orjson.dumps(await item) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Response
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.tasks.fleet_summary import fleet_summary
+
+router = APIRouter()
+
+@router.get("")
+async def get_summary(
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Fleet summary for dashboards
+
+    - **devices**: Totals by status and by vendor
+    - **interfaces**: The SUMMARY_TOP_N interfaces with the highest
+      utilisation (busier direction, percent of speed) in the latest samples
+    - **alerts**: Unacknowledged events by severity
+
+    Served from memory and kept current by the collector and evaluator
+    events. Send the returned ETag as `If-None-Match` to get a 304 while
+    nothing has changed.
+    """
+    if not fleet_summary.loaded:
+        await asyncio.get_running_loop().run_in_executor(None, fleet_summary.load, db)
+    body, etag = fleet_summary.encoded()
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
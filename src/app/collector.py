@@ -0,0 +1,48 @@
+"""
+Run the SNMP collector, interface discovery and the trap receiver as
+their own process::
+
+    python -m app.collector
+
+Set ``RUN_COLLECTOR_IN_API=false`` for the API so that only this process
+polls devices, however many API workers are running. New alerts are
+relayed to the API's WebSocket feed through Redis.
+"""
+import asyncio
+import logging
+
+from .core import http_cache
+from .core.config import settings
+from .core.event_relay import EventPublisher
+from .core.logging_config import setup_logging
+from .core.loop_monitor import LoopLagMonitor
+from .database import init_db
+from .tasks.collector import SNMPCollector
+from .tasks.discovery import InterfaceDiscovery
+from .tasks.trap_receiver import TrapReceiver
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    if settings.LOOP_MONITOR_ENABLED:
+        LoopLagMonitor().start()
+    init_db()
+    EventPublisher().start()
+    # Device writes here bump the versions the API serves
+    http_cache.share_versions()
+    collector = SNMPCollector()
+    workers = [collector.start(interval=settings.COLLECTOR_INTERVAL)]
+    if settings.DISCOVERY_ENABLED:
+        workers.append(InterfaceDiscovery().start(interval=settings.DISCOVERY_INTERVAL))
+    if settings.TRAP_RECEIVER_ENABLED:
+        workers.append(TrapReceiver(repoll=collector.poll_device).start())
+    await asyncio.gather(*workers)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("SNMP collector stopped")
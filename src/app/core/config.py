@@ -1,4 +1,4 @@
-from pydantic import BaseSettings, AnyHttpUrl, PostgresDsn, validator
+from pydantic import BaseSettings, AnyHttpUrl, Field, PostgresDsn, validator
 from typing import List, Optional, Dict, Any, Union
 from functools import lru_cache
 import secrets
@@ -7,6 +7,19 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+
+    # Serve read-heavy list endpoints straight from DB rows via orjson,
+    # skipping per-row Pydantic validation
+    FAST_JSON_RESPONSES: bool = False
+    
+    # Conditional requests and response caching for device and alert rule
+    # reads (core/http_cache.py)
+    RESPONSE_CACHE_SIZE: int = 1024  # responses kept in memory per process; 0 disables
+    RESPONSE_CACHE_REDIS: bool = False  # also share responses between API workers through fastapi_cache
+    RESPONSE_CACHE_TTL: int = 300  # seconds a shared response is kept
+    # API worker processes, as given to uvicorn; with more than one, cache
+    # versions are kept in Redis so a write on one worker reaches the others
+    WORKERS: int = Field(1, env=["WORKERS", "WEB_CONCURRENCY"])
     
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -24,7 +37,7 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "devops"
     POSTGRES_PASSWORD: str = "devops"
     POSTGRES_DB: str = "network_monitoring"
-    SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    SQLALCHEMY_DATABASE_URI: Optional[str] = None  # any SQLAlchemy URL; built from POSTGRES_* when unset
     
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
@@ -46,8 +59,113 @@ class Settings(BaseSettings):
     
     # SNMP
     SNMP_COMMUNITY: str = "public"
-    SNMP_TIMEOUT: int = 5
-    SNMP_RETRIES: int = 3
+    SNMP_TIMEOUT: int = 5  # upper bound for one request, retries included
+    SNMP_RETRIES: int = 3  # upper bound; actual retries follow the device RTT
+    SNMP_INITIAL_TIMEOUT: float = 1.0  # per-attempt timeout before any RTT sample
+    SNMP_MIN_TIMEOUT: float = 0.05
+    SNMP_RETRY_BUDGET: int = 2000  # retransmissions allowed per collection cycle
+    SNMP_BREAKER_THRESHOLD: int = 3  # failed cycles before a device is only probed
+    SNMP_MAX_VARBINDS: int = 20  # OIDs per GET PDU in collection plans
+    SNMP_BULK_VARBINDS: int = 60  # varbinds per GETBULK response (columns x repetitions)
+    
+    # Reachability sweep run before each collection cycle
+    PROBE_ENABLED: bool = True
+    PROBE_BACKEND: str = "snmp"  # "snmp" (sysUpTime GET) or "ping" (ICMP echo)
+    PROBE_TIMEOUT: float = 1.0
+    PROBE_RETRIES: int = 1
+    PROBE_CONCURRENCY: int = 1000
+    
+    # Background workers; disable in the API when they run as their own
+    # processes (python -m app.collector / python -m app.evaluator)
+    RUN_COLLECTOR_IN_API: bool = True
+    RUN_EVALUATOR_IN_API: bool = True
+    COLLECTOR_INTERVAL: int = 300  # seconds between collection cycles
+    EVALUATOR_INTERVAL: int = 60  # seconds between alert evaluation passes
+    
+    # Alert rule expressions (utils/rule_expr.py)
+    ALERT_STALE_AFTER: int = 900  # seconds; an older latest sample counts as missing
+    ALERT_MAX_WINDOW: int = 86400  # longest time window a rule may aggregate over
+    ALERT_WINDOW_SAMPLES: int = 600  # ring buffer slots per series (tasks/windows.py); bounds memory
+    ALERT_REFIRE_AFTER: int = 86400  # seconds unacknowledged events suppress re-firing after a restart
+    ALERT_EVENT_RETENTION_DAYS: int = 30  # acknowledged events older than this are deleted; 0 keeps them
+    ALERT_EVENT_RETENTION_INTERVAL: int = 3600  # seconds between retention runs
+    ALERT_EVENT_DELETE_BATCH: int = 5000  # events deleted per transaction
+    
+    # Alert notifications, delivered from an outbox table (tasks/notifier.py);
+    # channels are managed under /api/v1/notifications/channels/
+    NOTIFICATIONS_ENABLED: bool = True
+    NOTIFICATION_WORKERS: int = 4  # concurrent deliveries per channel
+    NOTIFICATION_POLL_INTERVAL: float = 5.0  # longest wait between outbox checks
+    NOTIFICATION_FETCH_LIMIT: int = 1000  # due outbox rows read per check
+    NOTIFICATION_TIMEOUT: float = 10.0  # seconds per delivery attempt
+    NOTIFICATION_MAX_ATTEMPTS: int = 8
+    NOTIFICATION_RETRY_BASE: float = 10.0  # seconds before the first retry, doubled per attempt
+    NOTIFICATION_RETRY_MAX: float = 900.0
+    NOTIFICATION_DIGEST_LINES: int = 20  # alerts listed in a chat or email digest
+    SMTP_HOST: Optional[str] = None  # required by email channels
+    SMTP_PORT: int = 25
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_STARTTLS: bool = False
+    SMTP_FROM: str = "netmon@localhost"
+    
+    # Anomaly rules: online baselines per series (tasks/anomaly.py)
+    ANOMALY_THRESHOLD: float = 3.0  # default z-score threshold
+    ANOMALY_ALPHA: float = 0.05  # EWMA weight of a new sample in the global baseline
+    ANOMALY_SEASONAL: str = "hour_of_week"  # "hour_of_week", "hour_of_day" or "none"
+    ANOMALY_SEASONAL_ALPHA: float = 0.2  # weight in the baseline of the sample's hour
+    ANOMALY_MIN_SAMPLES: int = 12  # samples a baseline needs before series are scored against it
+    ANOMALY_STATE_FILE: Optional[str] = None  # absolute path, e.g. /var/lib/netmon/anomaly_baselines.npz; None keeps baselines in memory only
+    ANOMALY_SAVE_INTERVAL: int = 900  # seconds between saves of the baselines
+    
+    # Fleet summary served by /api/v1/summary, kept up to date from events (tasks/fleet_summary.py)
+    SUMMARY_TOP_N: int = 10  # most utilised interfaces listed
+    SUMMARY_RECONCILE_INTERVAL: int = 600  # seconds between reloads from the database
+    
+    # Interface inventory discovery, run next to the collector
+    DISCOVERY_ENABLED: bool = True
+    DISCOVERY_INTERVAL: int = 3600  # seconds between runs; unchanged devices cost one GET
+    DISCOVERY_CONCURRENCY: int = 50
+    
+    # On-demand poll API
+    POLL_MIN_INTERVAL: float = 10.0  # seconds a poll result is reused for the same device
+    POLL_BATCH_CONCURRENCY: int = 50
+    
+    # SNMPv2c trap/inform receiver, run next to the collector
+    TRAP_RECEIVER_ENABLED: bool = True
+    TRAP_HOST: str = "0.0.0.0"
+    TRAP_PORT: int = 162  # privileged; use a high port (e.g. 10162) when not root
+    TRAP_DEVICE_REFRESH: int = 60  # seconds between reloads of the source address index
+    TRAP_REPOLL: bool = True  # poll a device as soon as it sends a trap
+    
+    # Redis pub/sub channel relaying events (new alerts) from the collector
+    # and evaluator processes to the API's WebSocket feed
+    EVENT_CHANNEL: str = "netmon:events"
+    RESOURCE_VERSIONS_KEY: str = "netmon:resource_versions"  # Redis hash of the response cache versions
+    
+    # Logging (see core/logging_config.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Dict[str, str] = {  # per-module overrides, e.g. {"app.tasks.collector": "DEBUG"}
+        "sqlalchemy.engine": "WARNING",
+        "pysnmp": "WARNING",
+        "asyncio": "WARNING",
+    }
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_FILE: Optional[str] = "app.log"  # None logs to the console only
+    LOG_RATE_LIMIT_SECONDS: float = 600  # window for repeated warnings/errors about a device, 0 disables
+    
+    # Event loop lag monitor; block debug logs the stack of stalls
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.05  # seconds between lag samples
+    LOOP_BLOCK_DEBUG: bool = False
+    LOOP_BLOCK_THRESHOLD_MS: int = 100
+    
+    # Profiling: admin profile endpoint and sampled profiles of slow cycles
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_INTERVAL: float = 0.01  # seconds between stack samples
+    SLOW_COLLECTION_THRESHOLD: float = 120.0  # seconds; breakdown saved when exceeded
+    SLOW_EVALUATION_THRESHOLD: float = 10.0
     
     class Config:
         case_sensitive = True
@@ -59,4 +177,3 @@ def get_settings():
     return Settings()
 
 settings = get_settings()
-print(f"[DEBUG] SQLALCHEMY_DATABASE_URI in use: {settings.SQLALCHEMY_DATABASE_URI}")
@@ -0,0 +1,112 @@
+"""
+Relay of in-process events between processes over Redis pub/sub.
+
+The collector and evaluator can run as their own processes while the
+WebSocket feed lives in the API. Worker processes run an
+``EventPublisher``, which forwards the relayed events they emit to
+``EVENT_CHANNEL``; the API (and the evaluator, for new samples) runs
+``listen``, which re-emits them on its own event bus. Messages carry
+the sending process's id: a process skips its own, and events received
+from Redis are never published again. Payloads must be JSON-ready.
+"""
+import asyncio
+import logging
+import threading
+import uuid
+from functools import partial
+from typing import Optional, Sequence
+
+import orjson
+
+from . import events
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+RELAYED_EVENTS = (
+    events.ALERT_CREATED, events.ALERTS_ACKNOWLEDGED, events.SAMPLES_INGESTED,
+    events.DEVICE_STATUS_CHANGED, events.DEVICE_CHANGED, events.RESOURCES_CHANGED,
+)
+
+_ORIGIN = uuid.uuid4().hex
+# relaying: set while re-emitting an event received from Redis; per
+# thread, so events emitted meanwhile by other threads are still published
+_local = threading.local()
+
+
+def _redis():
+    from redis import asyncio as aioredis
+    return aioredis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}")
+
+
+class EventPublisher:
+    """Forward local events to Redis; publishing never blocks the emitter."""
+
+    def __init__(self, names: Sequence[str] = RELAYED_EVENTS, queue_size: int = 10000):
+        self.names = names
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.task = None
+
+    def start(self):
+        """Subscribe and start publishing; call from the running event loop."""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.loop = asyncio.get_running_loop()
+        for name in self.names:
+            events.subscribe(name, partial(self._enqueue, name))
+        self.task = asyncio.create_task(self._run())
+
+    def _enqueue(self, name: str, **payload):
+        if getattr(_local, "relaying", False):
+            return
+        message = orjson.dumps({"event": name, "origin": _ORIGIN, "payload": payload})
+        try:
+            in_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._put(name, message)
+        else:
+            # Emitted from a worker thread, e.g. by a sync endpoint
+            self.loop.call_soon_threadsafe(self._put, name, message)
+
+    def _put(self, name: str, message: bytes):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Event relay queue full, dropping %s", name)
+
+    async def _run(self):
+        redis = _redis()
+        while True:
+            message = await self.queue.get()
+            try:
+                await redis.publish(settings.EVENT_CHANNEL, message)
+            except Exception as e:
+                logger.warning("Could not relay event to Redis: %s", e)
+
+
+async def listen(names: Sequence[str] = RELAYED_EVENTS, retry_delay: float = 5.0):
+    """Re-emit events published by other processes, reconnecting as needed."""
+    redis = _redis()
+    while True:
+        try:
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(settings.EVENT_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = orjson.loads(message["data"])
+                if data["event"] not in names or data.get("origin") == _ORIGIN:
+                    continue
+                _local.relaying = True
+                try:
+                    events.emit(data["event"], **data["payload"])
+                finally:
+                    _local.relaying = False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Event relay subscription lost: %s", e)
+            await asyncio.sleep(retry_delay)
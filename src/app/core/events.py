@@ -0,0 +1,50 @@
+"""
+In-process event bus.
+
+Background tasks publish state changes here (device status transitions,
+new samples, alerts) and other components subscribe to them instead of
+re-querying the database. Handlers run synchronously in the publisher's
+thread, so they must be cheap; anything slow should schedule its own task.
+Events are relayed between processes by ``core.event_relay``.
+"""
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# payload: device_id, old, new (status values, old None when unknown),
+# timestamp (ISO 8601)
+DEVICE_STATUS_CHANGED = "device.status_changed"
+# payload: device_id, status, vendor (values, both None when deleted)
+DEVICE_CHANGED = "device.changed"
+ALERT_CREATED = "alert.created"  # payload: alert, a JSON-ready dict
+ALERTS_ACKNOWLEDGED = "alerts.acknowledged"  # payload: counts, {severity: events}
+# payload: keys (resource names, see core.http_cache), version
+RESOURCES_CHANGED = "resources.changed"
+# payload: scope ("device" or "interface"), columns: {"id", "timestamp"
+# (epoch seconds), metric name: [...]}, JSON-ready lists with None for NULL
+SAMPLES_INGESTED = "samples.ingested"
+
+_subscribers: Dict[str, List[Callable[..., None]]] = defaultdict(list)
+
+
+def subscribe(event: str, handler: Callable[..., None]):
+    """Call ``handler(**payload)`` every time ``event`` is emitted."""
+    _subscribers[event].append(handler)
+
+
+def unsubscribe(event: str, handler: Callable[..., None]):
+    """Remove a handler registered with ``subscribe``."""
+    handlers = _subscribers.get(event)
+    if handlers and handler in handlers:
+        handlers.remove(handler)
+
+
+def emit(event: str, **payload):
+    """Deliver an event to its subscribers; a failing handler never breaks the publisher."""
+    for handler in list(_subscribers.get(event, ())):
+        try:
+            handler(**payload)
+        except Exception:
+            logger.exception("Error in handler %r for event %s", handler, event)
@@ -0,0 +1,271 @@
+"""
+Conditional requests and response caching for read endpoints.
+
+Cached responses depend on named resources: ``"devices"`` (the device
+table), ``"device:<id>"``, ``"interfaces:<device id>"`` and
+``"alert_rules"``. Every write bumps the versions of the resources it
+touched through ``invalidate``; a version is the write time in
+microseconds, raised past the previous version if the clock hasn't
+moved, and ``resources.changed`` relays it to the other processes,
+which keep the highest version they have seen. Resources not written
+since the process started have the start time as their version.
+
+Processes that call ``share_versions`` (the API workers when
+``versions_shared`` says other processes write or serve the same
+resources, and the standalone collector) also raise
+the versions in a Redis hash, ``RESOURCE_VERSIONS_KEY``, and the API
+reads versions from it. All workers then serve the same ETags and
+shared cache keys, and a bump whose relayed event a worker missed still
+reaches it. The hash's ``started`` field is the version of resources
+not written since the first process shared versions.
+
+``cached_response`` serves an endpoint from the versions of its
+resources:
+
+- the ETag is the version, so a matching ``If-None-Match`` (or an
+  ``If-Modified-Since`` at or after the version, for clients without
+  ETags) gets a 304 without touching the database;
+- otherwise the body comes from an in-process LRU of the last body of
+  each URL (``RESPONSE_CACHE_SIZE`` entries) if it was built at the
+  current version, then, with ``RESPONSE_CACHE_REDIS``, from the
+  fastapi_cache backend shared by the API workers (keyed by URL and
+  version, expiring after ``RESPONSE_CACHE_TTL``), and only then from the
+  database.
+
+A bump therefore invalidates exactly the responses of the resources
+written. Versions are read before the body is built, so a write racing
+a request can only leave a newer body under an older version, which the
+next request replaces. Last-Modified has a resolution of one second, so
+clients relying on If-Modified-Since alone can miss a second write
+within the same second; ETags don't.
+"""
+import asyncio
+import email.utils
+import logging
+import time
+from collections import OrderedDict
+from datetime import timezone
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from . import events, metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DEVICES = "devices"
+ALERT_RULES = "alert_rules"
+
+
+def device(device_id: int) -> str:
+    return f"device:{device_id}"
+
+
+def interfaces(device_id: int) -> str:
+    return f"interfaces:{device_id}"
+
+
+# Raises the fields ARGV[2..] of hash KEYS[1] to version ARGV[1], never lowering them
+_RAISE_VERSIONS = """
+local version = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    if tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0') < version then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[1])
+    end
+end
+"""
+_STARTED = "started"
+
+
+class ResourceVersions:
+    """Latest version of each resource, as known to this process and, once shared, to Redis"""
+
+    def __init__(self):
+        self.started = time.time_ns() // 1000
+        self.versions: Dict[str, int] = {}
+        self.redis = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, keys: Sequence[str]) -> int:
+        return max(self.versions.get(key, self.started) for key in keys)
+
+    def next(self, keys: Sequence[str]) -> int:
+        return max(time.time_ns() // 1000, self.get(keys) + 1)
+
+    def apply(self, keys: Sequence[str], version: int):
+        for key in keys:
+            if version > self.versions.get(key, self.started):
+                self.versions[key] = version
+        if self.redis is not None:
+            # Called in the emitter's thread, e.g. by a sync endpoint
+            asyncio.run_coroutine_threadsafe(self._raise(keys, version), self.loop)
+
+    def share(self, redis):
+        """Keep versions in Redis from now on; call from the running event loop."""
+        self.redis = redis
+        self.loop = asyncio.get_running_loop()
+
+    async def _raise(self, keys: Sequence[str], version: int):
+        try:
+            await self.redis.eval(_RAISE_VERSIONS, 1, settings.RESOURCE_VERSIONS_KEY, version, *keys)
+        except Exception as e:
+            logger.warning("Could not share resource versions: %s", e)
+
+    async def current(self, keys: Sequence[str]) -> int:
+        """Version of the resources: from Redis once shared (this process's if unreachable), else ``get``."""
+        if self.redis is None:
+            return self.get(keys)
+        try:
+            started, *values = await self.redis.hmget(settings.RESOURCE_VERSIONS_KEY, _STARTED, *keys)
+            if started is None:
+                await self.redis.hsetnx(settings.RESOURCE_VERSIONS_KEY, _STARTED, self.started)
+                started = await self.redis.hget(settings.RESOURCE_VERSIONS_KEY, _STARTED)
+        except Exception as e:
+            logger.debug("Shared resource versions unavailable: %s", e)
+            return self.get(keys)
+        shared = max(int(value or started) for value in values)
+        # Local bumps count before their write to Redis lands
+        return max(shared, max(self.versions.get(key, 0) for key in keys))
+
+
+class ResponseCache:
+    """LRU of encoded responses by URL, each with the version it was built at"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, version: int, body: bytes):
+        if self.size <= 0:
+            return
+        self.entries[key] = (version, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+resource_versions = ResourceVersions()
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE)
+
+
+def _on_resources_changed(keys: Sequence[str], version: int):
+    resource_versions.apply(keys, version)
+
+
+# Registered on import: every process that writes or serves cached
+# resources imports this module, and bumps must apply even where no
+# background task runs
+events.subscribe(events.RESOURCES_CHANGED, _on_resources_changed)
+
+
+def versions_shared() -> bool:
+    """Whether other processes write or serve cached resources: several workers, the relay or shared responses."""
+    return (
+        settings.WORKERS > 1 or settings.RESPONSE_CACHE_REDIS
+        or not (settings.RUN_COLLECTOR_IN_API and settings.RUN_EVALUATOR_IN_API)
+    )
+
+
+def share_versions():
+    """Raise and read resource versions in Redis; call from the running event loop."""
+    from redis import asyncio as aioredis
+    resource_versions.share(aioredis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"))
+
+
+def invalidate(*keys: str):
+    """Bump the versions of resources after a committed write."""
+    if keys:
+        events.emit(events.RESOURCES_CHANGED, keys=list(keys), version=resource_versions.next(keys))
+
+
+def _not_modified(request: Request, etag: str, version: int) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Takes precedence over If-Modified-Since
+        return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return version // 1_000_000 <= since.timestamp()
+
+
+async def _shared_get(key: str) -> Optional[bytes]:
+    from fastapi_cache import FastAPICache
+    try:
+        value = await FastAPICache.get_backend().get(f"{FastAPICache.get_prefix()}:response:{key}")
+    except Exception as e:
+        logger.debug("Shared response cache unavailable: %s", e)
+        return None
+    if value is None:
+        return None
+    return value.encode() if isinstance(value, str) else value
+
+
+async def _shared_set(key: str, body: bytes):
+    from fastapi_cache import FastAPICache
+    try:
+        await FastAPICache.get_backend().set(
+            f"{FastAPICache.get_prefix()}:response:{key}", body.decode(), expire=settings.RESPONSE_CACHE_TTL
+        )
+    except Exception as e:
+        logger.debug("Shared response cache unavailable: %s", e)
+
+
+async def cached_response(request: Request, keys: Sequence[str], build: Callable[[], Any]) -> Response:
+    """
+    Serve a JSON endpoint from the versions of the resources it reads
+
+    Args:
+        request: The request, for its URL and conditional headers
+        keys: Resources the response depends on
+        build: Returns the JSON-ready content; only called on a cache
+            miss, in the threadpool as it queries the database, and may
+            raise HTTPException (errors are not cached)
+
+    Returns:
+        A 304, or the JSON body with ETag and Last-Modified headers
+    """
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", request.url.path)
+    version = await resource_versions.current(keys)
+    etag = f'"{version:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": email.utils.formatdate(version / 1_000_000, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, version):
+        metrics.RESPONSE_CACHE_REQUESTS.labels(endpoint, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    url = f"{request.url.path}?{request.url.query}"
+    body = response_cache.get(url, version)
+    result = "hit"
+    if body is None and settings.RESPONSE_CACHE_REDIS:
+        body = await _shared_get(f"{url}@{version:x}")
+        result = "shared_hit"
+        if body is not None:
+            response_cache.set(url, version, body)
+    if body is None:
+        body = await run_in_threadpool(lambda: orjson.dumps(build()))
+        result = "miss"
+        response_cache.set(url, version, body)
+        if settings.RESPONSE_CACHE_REDIS:
+            await _shared_set(f"{url}@{version:x}", body)
+    metrics.RESPONSE_CACHE_REQUESTS.labels(endpoint, result).inc()
+    return Response(body, media_type="application/json", headers=headers)
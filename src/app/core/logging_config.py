@@ -0,0 +1,141 @@
+"""
+Process-wide logging setup.
+
+Every logger writes into an in-memory queue through a ``QueueHandler``;
+a ``QueueListener`` thread does the formatting and the console/file I/O.
+Logging from the event loop therefore never blocks on disk or a slow
+terminal. Output is one JSON object per line by default, levels can be
+set per module, and repeated errors about the same device are
+rate-limited.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .config import settings
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through one of a run of identical warnings/errors about a device per time window.
+
+    Only records with a ``device_id`` extra are limited. They are
+    identical when they come from the same logger with the same message
+    template and device, so a device that fails every cycle is reported
+    once per window instead of once per cycle. The first record after a
+    window notes how many were dropped. Everything else always passes.
+    """
+
+    def __init__(self, window: float):
+        super().__init__()
+        self.window = window
+        self._seen: Dict[Tuple, Tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.window <= 0:
+            return True
+        device_id = getattr(record, "device_id", None)
+        if device_id is None:
+            return True
+        key = (record.name, record.msg, device_id)
+        now = time.monotonic()
+        first, suppressed = self._seen.get(key, (None, 0))
+        if first is not None and now - first < self.window:
+            self._seen[key] = (first, suppressed + 1)
+            return False
+        self._seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        if len(self._seen) > 10_000:
+            self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merge message arguments in the caller; leave tracebacks to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after the call returns, so render them now;
+        # formatting the traceback (which reads source files) can wait
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+def setup_logging():
+    """Route all logging through a queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = _formatter()
+    handlers = [logging.StreamHandler()]
+    if settings.LOG_FILE:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            settings.LOG_FILE, maxBytes=50 * 2 ** 20, backupCount=5
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    # Filters run in the caller's thread, before the record is formatted
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT_SECONDS))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
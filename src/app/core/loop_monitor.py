@@ -0,0 +1,108 @@
+"""
+Event loop lag monitoring and blocking-call detection.
+
+``LoopLagMonitor`` is a coroutine that sleeps for a fixed interval and
+measures how late it wakes up. That delay is the time other callbacks
+held the loop, and it is exported as ``event_loop_lag_seconds``.
+
+With ``LOOP_BLOCK_DEBUG`` a watchdog thread also watches the monitor's
+heartbeat. When the loop has not ticked for ``LOOP_BLOCK_THRESHOLD_MS``
+it logs the stack of the loop thread and the name of the task that is
+running, i.e. the code that is blocking the loop, while it is still
+blocking.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Measure scheduling delay of one event loop and optionally watch for stalls."""
+
+    def __init__(
+        self,
+        interval: float = None,
+        threshold: float = None,
+        debug: bool = None
+    ):
+        self.interval = interval or settings.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold or settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        self.debug = settings.LOOP_BLOCK_DEBUG if debug is None else debug
+        self.heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start monitoring the running loop (call from inside it)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self._task = self._loop.create_task(self._run(), name="loop-lag-monitor")
+        if self.debug:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        logger.info(
+            "Event loop monitor started (interval %.0fms, block debug %s)",
+            self.interval * 1000, "on" if self.debug else "off"
+        )
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.heartbeat = time.monotonic()
+            metrics.EVENT_LOOP_LAG.observe(lag)
+            metrics.EVENT_LOOP_LAG_LAST.set(lag)
+            if lag >= self.threshold:
+                metrics.EVENT_LOOP_BLOCKS.inc()
+
+    def _watch(self):
+        """Watchdog thread: report the loop thread's stack while it is blocked."""
+        # A healthy loop ticks every ``interval``; anything beyond that is blocking
+        limit = self.interval + self.threshold
+        reported_heartbeat = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled < limit or heartbeat == reported_heartbeat:
+                continue
+            # Once per stall: the heartbeat only moves when the loop runs again
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                "Event loop blocked for %.0fms in task %s:\n%s",
+                stalled * 1000, self._current_task_name(), stack
+            )
+
+    def _current_task_name(self) -> str:
+        # Read from another thread: only used for a log line, so a stale
+        # answer is harmless
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        return task.get_name() if task is not None else "<callback>"
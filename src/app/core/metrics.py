@@ -0,0 +1,322 @@
+"""
+Internal metrics in the Prometheus text exposition format.
+
+A deliberately small implementation instead of a client library: counters,
+gauges and histograms keep plain floats and are updated without locks.
+Almost every update happens on the event loop thread; the few updates
+from worker threads rely on the GIL and may, very rarely, lose an
+increment, which is an acceptable trade for keeping the hot paths (every
+SNMP request, every HTTP request) down to a dict lookup and an add.
+"""
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200)
+BATCH_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+_registry: List["Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: a named family of children, one per label value tuple."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Get the child for a label value tuple (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[Tuple[str, str, float]]:
+        for values, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames, values), child.get()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` at scrape time instead."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Counter(Metric):
+    """Monotonically increasing count; exposed with the ``_total`` suffix."""
+
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield "_total", _format_labels(self.labelnames, values), child.get()
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is computed at scrape time."""
+
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._children[()].set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; made cumulative only at scrape time
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("target", "start")
+
+    def __init__(self, target: _HistogramValue):
+        self.target = target
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+    """Distribution of observations in fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            counts = list(child.counts)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield "_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, cumulative
+
+
+def render() -> str:
+    """All registered metrics in the text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording HTTP request latency per route template.
+
+    Requests are labelled with the matched route path (``/devices/{device_id}``)
+    rather than the raw URL, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, routes: Callable[[], Sequence] = None):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope) -> str:
+        for route in self.routes():
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "<unmatched>")
+        return "<unmatched>"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], self._route(scope), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+# Event loop
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay between a timer's due time and its callback",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+EVENT_LOOP_BLOCKS = Counter("event_loop_blocks", "Lag samples above LOOP_BLOCK_THRESHOLD_MS")
+
+# SNMP
+SNMP_REQUESTS = Counter("snmp_requests", "SNMP requests sent (excluding retransmissions)", ["vendor"])
+SNMP_TIMEOUTS = Counter("snmp_timeouts", "SNMP requests that got no response", ["vendor"])
+SNMP_ERRORS = Counter("snmp_errors", "SNMP requests answered with an error", ["vendor"])
+SNMP_RTT = Histogram("snmp_rtt_seconds", "SNMP request round-trip time", ["vendor"], RTT_BUCKETS)
+SNMP_IN_FLIGHT = Gauge("snmp_requests_in_flight", "SNMP requests queued for or running in worker threads")
+
+# Collector
+COLLECTOR_CYCLE_DURATION = Histogram(
+    "collector_cycle_duration_seconds", "Duration of a full collection cycle", buckets=CYCLE_BUCKETS
+)
+COLLECTOR_DEVICES = Gauge("collector_devices", "Devices in the last collection cycle", ["state"])
+COLLECTOR_BEHIND_SCHEDULE = Gauge(
+    "collector_devices_behind_schedule",
+    "Devices whose collection started after the cycle interval had elapsed"
+)
+
+# Interface discovery
+DISCOVERY_DEVICES = Gauge("discovery_devices", "Devices in the last discovery run", ["state"])
+DISCOVERY_CHANGES = Counter("discovery_interface_changes", "Interfaces added, updated or removed", ["change"])
+
+# SNMP trap receiver
+SNMP_TRAPS = Counter("snmp_traps_received", "SNMP notifications received", ["result"])
+
+# Database ingest
+INGEST_BATCH_SIZE = Histogram("ingest_batch_size", "Rows per ingest batch", ["kind"], BATCH_BUCKETS)
+INGEST_DURATION = Histogram("ingest_duration_seconds", "Time to write one ingest batch", ["kind"])
+
+# Alert evaluation
+ALERT_RULES_EVALUATED = Counter("alert_rules_evaluated", "Alert rules evaluated")
+ALERT_EVENTS_CREATED = Counter("alert_events_created", "Alert events created", ["severity"])
+ALERT_EVALUATION_DURATION = Histogram(
+    "alert_evaluation_duration_seconds", "Duration of a full alert evaluation pass"
+)
+
+# Notifications
+NOTIFICATIONS_SENT = Counter(
+    "notifications", "Alerts delivered, retried or given up on, by channel type", ["channel_type", "result"]
+)
+NOTIFICATION_DELIVERY_DURATION = Histogram(
+    "notification_delivery_duration_seconds", "Time to deliver one notification message", ["channel_type"]
+)
+
+# API
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+WEBSOCKET_CLIENTS = Gauge("websocket_clients", "Connected alert WebSocket clients")
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests", "Cached read endpoint requests by outcome", ["endpoint", "result"]
+)
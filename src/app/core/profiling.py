@@ -0,0 +1,169 @@
+"""
+Opt-in profiling of the running process.
+
+``SamplingProfiler`` is a statistical profiler: a background thread
+samples the stacks of all other threads with ``sys._current_frames`` and
+counts identical stacks. The result is written in the "collapsed stack"
+format understood by flamegraph.pl, speedscope and inferno.
+
+``CycleProfile`` wraps one collection cycle or alert evaluation pass. It
+always records a per-stage timing breakdown; when the pass exceeds its
+threshold the breakdown (and, with ``PROFILING_ENABLED``, the sampled
+profile of the pass) is saved to ``PROFILE_DIR``.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Sample every thread's stack at a fixed interval from a daemon thread."""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format: ``thread;outer;...;inner count`` per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def artifact_base(kind: str) -> str:
+    """Timestamped path prefix for a new set of artifacts in PROFILE_DIR."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return os.path.join(settings.PROFILE_DIR, f"{kind}-{stamp}")
+
+
+def save_artifact(base: str, suffix: str, content: str) -> str:
+    """Write one artifact next to ``base`` and return its path."""
+    path = f"{base}.{suffix}"
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def sample_for(seconds: float) -> SamplingProfiler:
+    """Blocking helper: sample the process for ``seconds`` (run it in a thread)."""
+    profiler = SamplingProfiler().start()
+    time.sleep(seconds)
+    profiler.stop()
+    return profiler
+
+
+def pstats_report(profile: cProfile.Profile, limit: int = 60) -> str:
+    """Text report of the most expensive functions by cumulative time."""
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class CycleProfile:
+    """
+    Stage timings of one cycle, saved with a profile when the cycle is slow.
+
+    Usage::
+
+        with CycleProfile("collection", settings.SLOW_COLLECTION_THRESHOLD) as profile:
+            with profile.stage("probe"):
+                ...
+    """
+
+    def __init__(self, kind: str, threshold: float):
+        self.kind = kind
+        self.threshold = threshold
+        self.stages: Dict[str, float] = {}
+        self.duration = 0.0
+        self._profiler: Optional[SamplingProfiler] = None
+        self._start = 0.0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def __enter__(self) -> "CycleProfile":
+        if settings.PROFILING_ENABLED:
+            self._profiler = SamplingProfiler().start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.stop()
+        if self.duration > self.threshold:
+            self._save()
+
+    def _save(self):
+        breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.stages.items())
+        logger.warning(
+            f"Slow {self.kind}: {self.duration:.2f}s (threshold {self.threshold}s); {breakdown}"
+        )
+        try:
+            base = artifact_base(self.kind)
+            path = save_artifact(base, "json", json.dumps({
+                "kind": self.kind,
+                "duration": self.duration,
+                "threshold": self.threshold,
+                "stages": self.stages,
+                "samples": self._profiler.samples if self._profiler else 0,
+            }, indent=2))
+            if self._profiler is not None:
+                save_artifact(base, "collapsed", self._profiler.collapsed())
+            logger.warning(f"Saved {self.kind} profile to {path}")
+        except OSError as e:
+            logger.error(f"Could not save {self.kind} profile: {e}")
@@ -0,0 +1,219 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core import events, metrics
+from ..models import AlertEvent
+from ..schemas import alert as schemas
+from .crud_notification import queue_notifications
+
+
+def alert_payload(event: AlertEvent) -> Dict[str, Any]:
+    """An alert event as a JSON-ready dict shaped like the AlertEvent schema"""
+    payload = schemas.AlertEvent.from_orm(event).dict()
+    payload["timestamp"] = payload["timestamp"].isoformat()
+    return payload
+
+def create_alert_events(db: Session, rows: List[Dict[str, Any]]) -> List[AlertEvent]:
+    """
+    Insert alert events with one commit and announce them
+
+    Every created event is emitted as ``alert.created``, which feeds the
+    WebSocket stream (relayed from other processes over Redis). Outbox
+    entries for the notification channels are written in the same
+    transaction; delivery is up to tasks/notifier.py.
+
+    Args:
+        db: Database session
+        rows: Column values per event (rule_id, device_id, value, message, severity, ...)
+
+    Returns:
+        Created AlertEvent instances
+    """
+    if not rows:
+        return []
+    created = [AlertEvent(**row) for row in rows]
+    db.add_all(created)
+    db.flush()
+    queue_notifications(db, created)
+    db.commit()
+    for event in created:
+        metrics.ALERT_EVENTS_CREATED.labels(event.severity).inc()
+        events.emit(events.ALERT_CREATED, alert=alert_payload(event))
+    return created
+
+def get_firing_series(db: Session, rule_ids: List[int], since: datetime) -> List[Tuple[int, int, Any]]:
+    """
+    Get the series of unacknowledged rule events since a time
+
+    Args:
+        db: Database session
+        rule_ids: IDs of the rules
+        since: Oldest event time
+
+    Returns:
+        (rule_id, device_id, extra) row tuples
+    """
+    if not rule_ids:
+        return []
+    return db.query(AlertEvent.rule_id, AlertEvent.device_id, AlertEvent.extra).filter(
+        AlertEvent.rule_id.in_(rule_ids),
+        AlertEvent.acknowledged == False,
+        AlertEvent.timestamp >= since
+    ).all()
+
+def get_alert_events(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    severity: Optional[str] = None,
+    device_id: Optional[int] = None,
+    rule_id: Optional[int] = None,
+    acknowledged: Optional[bool] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> List[AlertEvent]:
+    """
+    Get alert events, newest first, with optional filtering
+
+    Each filter combination is served by one of the alert_events indexes,
+    so a page costs an index range scan, not a sort of the whole table.
+
+    Args:
+        db: Database session
+        skip: Number of events to skip
+        limit: Maximum number of events to return
+        severity, device_id, rule_id, acknowledged: Equality filters
+        start_time, end_time: Time range (inclusive)
+
+    Returns:
+        AlertEvent instances
+    """
+    query = _events_query(
+        db.query(AlertEvent), severity=severity, device_id=device_id, rule_id=rule_id,
+        acknowledged=acknowledged, start_time=start_time, end_time=end_time
+    )
+    return query.order_by(AlertEvent.timestamp.desc(), AlertEvent.id.desc())\
+        .offset(skip).limit(limit).all()
+
+def acknowledge_alert_events(
+    db: Session,
+    event_ids: Optional[Sequence[int]] = None,
+    severity: Optional[str] = None,
+    device_id: Optional[int] = None,
+    rule_id: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> int:
+    """
+    Acknowledge the unacknowledged events matching a filter with one UPDATE
+
+    Args:
+        db: Database session
+        event_ids: IDs of the events (all events when None)
+        severity, device_id, rule_id: Equality filters
+        start_time, end_time: Time range (inclusive)
+
+    Returns:
+        Number of events acknowledged
+    """
+    query = _events_query(
+        db.query(AlertEvent), severity=severity, device_id=device_id, rule_id=rule_id,
+        acknowledged=False, start_time=start_time, end_time=end_time
+    )
+    if event_ids is not None:
+        query = query.filter(AlertEvent.id.in_(event_ids))
+    counts = dict(
+        query.with_entities(AlertEvent.severity, func.count(AlertEvent.id)).group_by(AlertEvent.severity).all()
+    )
+    count = query.update({AlertEvent.acknowledged: True}, synchronize_session=False)
+    db.commit()
+    if count:
+        events.emit(events.ALERTS_ACKNOWLEDGED, counts=counts)
+    return count
+
+def acknowledge_alert_event(db: Session, event_id: int) -> Optional[AlertEvent]:
+    """
+    Acknowledge one event
+
+    Args:
+        db: Database session
+        event_id: ID of the event
+
+    Returns:
+        The event, or None if it doesn't exist
+    """
+    event = db.query(AlertEvent).get(event_id)
+    if event is None:
+        return None
+    if not event.acknowledged:
+        event.acknowledged = True
+        db.commit()
+        events.emit(events.ALERTS_ACKNOWLEDGED, counts={event.severity: 1})
+    return event
+
+def count_unacknowledged_events(db: Session) -> Dict[str, int]:
+    """
+    Count the unacknowledged events by severity
+
+    Args:
+        db: Database session
+
+    Returns:
+        {severity: events}
+    """
+    return dict(
+        db.query(AlertEvent.severity, func.count(AlertEvent.id))
+        .filter(AlertEvent.acknowledged == False)
+        .group_by(AlertEvent.severity).all()
+    )
+
+def delete_acknowledged_events(db: Session, before: datetime, batch_size: int = 5000) -> int:
+    """
+    Delete one batch of acknowledged events older than a time
+
+    Batches keep each transaction (and its locks) short; call until it
+    returns less than ``batch_size``.
+
+    Args:
+        db: Database session
+        before: Events older than this are deleted
+        batch_size: Maximum number of events to delete
+
+    Returns:
+        Number of events deleted
+    """
+    ids = db.query(AlertEvent.id).filter(
+        AlertEvent.acknowledged == True,
+        AlertEvent.timestamp < before
+    ).order_by(AlertEvent.timestamp).limit(batch_size).subquery()
+    count = db.query(AlertEvent).filter(AlertEvent.id.in_(db.query(ids.c.id)))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return count
+
+def _events_query(
+    query,
+    severity: Optional[str],
+    device_id: Optional[int],
+    rule_id: Optional[int],
+    acknowledged: Optional[bool],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime]
+):
+    """Apply the event list filters to a query"""
+    if severity:
+        query = query.filter(AlertEvent.severity == severity)
+    if device_id is not None:
+        query = query.filter(AlertEvent.device_id == device_id)
+    if rule_id is not None:
+        query = query.filter(AlertEvent.rule_id == rule_id)
+    if acknowledged is not None:
+        query = query.filter(AlertEvent.acknowledged == acknowledged)
+    if start_time:
+        query = query.filter(AlertEvent.timestamp >= start_time)
+    if end_time:
+        query = query.filter(AlertEvent.timestamp <= end_time)
+    return query
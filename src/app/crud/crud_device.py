@@ -1,17 +1,49 @@
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import (
+    and_, bindparam, cast, column, func, update, values, DateTime, Integer, String
+)
 from datetime import datetime
 
 from .. import schemas
 from ..models import Device, Interface, DeviceMetric, InterfaceMetric
+from ..models.device import DeviceStatus
 from ..database import SessionLocal
+from ..core import events, http_cache
+from ..utils.rule_expr import DEVICE_METRICS, INTERFACE_ATTRIBUTES, INTERFACE_METRICS
+from ..utils.snmp import snmp_targets
 from fastapi import HTTPException, status
 
+# Output fields for the row-based (fast JSON) read paths. They follow the
+# response schemas so both paths return the same document shape.
+DEVICE_FIELDS = tuple(schemas.Device.__fields__)
+INTERFACE_FIELDS = tuple(schemas.Interface.__fields__)
+DEVICE_METRIC_FIELDS = tuple(schemas.DeviceMetric.__fields__)
+INTERFACE_METRIC_FIELDS = tuple(schemas.InterfaceMetric.__fields__)
+# Interface columns read and written by inventory discovery
+INTERFACE_INVENTORY_FIELDS = (
+    "id", "device_id", "if_index", "name", "description", "mac_address",
+    "mtu", "speed", "admin_status", "oper_status", "removed_at"
+)
+
 def get_device(db: Session, device_id: int) -> Optional[Device]:
     """Get a device by ID"""
     return db.query(Device).filter(Device.id == device_id).first()
 
+def get_trap_sources(db: Session) -> List[Tuple[int, str, str, Optional[str]]]:
+    """
+    Get (id, ip_address, snmp_version, snmp_community) of every SNMP device
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Row tuples, used to match trap sources to devices
+    """
+    return db.query(Device.id, Device.ip_address, Device.snmp_version, Device.snmp_community)\
+        .filter(Device.snmp_enabled == True)\
+        .all()
+
 def get_device_by_hostname(db: Session, hostname: str) -> Optional[Device]:
     """Get a device by hostname"""
     return db.query(Device).filter(Device.hostname == hostname).first()
@@ -28,14 +60,31 @@ def get_devices(
     status: Optional[str] = None
 ) -> List[Device]:
     """Get a list of devices with optional filtering"""
-    query = db.query(Device)
-    
+    return _devices_query(db.query(Device), vendor, status)\
+        .offset(skip).limit(limit).all()
+
+def get_device_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    vendor: Optional[str] = None,
+    status: Optional[str] = None
+) -> List[Tuple]:
+    """Get devices as plain row tuples ordered like DEVICE_FIELDS"""
+    query = db.query(*[getattr(Device, field) for field in DEVICE_FIELDS])
+    return _devices_query(query, vendor, status).offset(skip).limit(limit).all()
+
+def get_snmp_devices(db: Session) -> List[Device]:
+    """Get every device that has SNMP collection enabled"""
+    return db.query(Device).filter(Device.snmp_enabled == True).order_by(Device.id).all()
+
+def _devices_query(query, vendor: Optional[str], status: Optional[str]):
+    """Apply the device list filters to a query"""
     if vendor:
         query = query.filter(Device.vendor == vendor)
     if status:
         query = query.filter(Device.status == status)
-        
-    return query.offset(skip).limit(limit).all()
+    return query
 
 def create_device(db: Session, device: schemas.DeviceCreate) -> Device:
     """Create a new device"""
@@ -47,6 +96,8 @@ def create_device(db: Session, device: schemas.DeviceCreate) -> Device:
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
+    http_cache.invalidate(http_cache.DEVICES, http_cache.device(db_device.id))
+    _device_changed(db_device)
     return db_device
 
 def update_device(
@@ -76,6 +127,9 @@ def update_device(
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
+    snmp_targets.invalidate(db_device.id)
+    http_cache.invalidate(http_cache.DEVICES, http_cache.device(db_device.id))
+    _device_changed(db_device)
     return db_device
 
 def delete_device(db: Session, device_id: int) -> Optional[Device]:
@@ -84,6 +138,9 @@ def delete_device(db: Session, device_id: int) -> Optional[Device]:
     if db_device:
         db.delete(db_device)
         db.commit()
+        snmp_targets.invalidate(device_id)
+        http_cache.invalidate(http_cache.DEVICES, http_cache.device(device_id), http_cache.interfaces(device_id))
+        events.emit(events.DEVICE_CHANGED, device_id=device_id, status=None, vendor=None)
         return db_device
     return None
 
@@ -107,8 +164,74 @@ def update_device_status(
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
+    http_cache.invalidate(http_cache.DEVICES, http_cache.device(db_device.id))
+    _device_changed(db_device)
     return db_device
 
+def _device_changed(db_device: Device):
+    """Announce a device created or edited through the API"""
+    events.emit(
+        events.DEVICE_CHANGED,
+        device_id=db_device.id,
+        status=getattr(db_device.status, "value", db_device.status),
+        vendor=getattr(db_device.vendor, "value", db_device.vendor)
+    )
+
+def bulk_set_device_status(
+    db: Session,
+    rows: List[Tuple[int, DeviceStatus, Optional[datetime]]],
+    chunk_size: int = 5000
+) -> None:
+    """
+    Set status and last_seen on many devices with one statement per chunk
+    
+    On PostgreSQL this is a single ``UPDATE devices ... FROM (VALUES ...)``;
+    other databases get an executemany of the same UPDATE.
+    
+    Args:
+        db: Database session
+        rows: (device_id, status, last_seen) tuples; a None last_seen keeps the stored value
+        chunk_size: Maximum rows per statement
+    """
+    table = Device.__table__
+    if db.bind.dialect.name == "postgresql":
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            new = values(
+                column("id", Integer),
+                column("status", String),
+                column("last_seen", DateTime(timezone=True)),
+                name="new"
+            ).data([
+                (device_id, DeviceStatus(status).name, last_seen)
+                for device_id, status, last_seen in chunk
+            ])
+            db.execute(
+                update(table)
+                .where(table.c.id == new.c.id)
+                .values(
+                    status=cast(new.c.status, table.c.status.type),
+                    last_seen=func.coalesce(
+                        cast(new.c.last_seen, DateTime(timezone=True)), table.c.last_seen
+                    )
+                )
+            )
+    else:
+        stmt = update(table)\
+            .where(table.c.id == bindparam("_id"))\
+            .values(
+                status=bindparam("_status", type_=table.c.status.type),
+                last_seen=func.coalesce(
+                    bindparam("_last_seen", type_=table.c.last_seen.type), table.c.last_seen
+                )
+            )
+        db.execute(stmt, [
+            {"_id": device_id, "_status": DeviceStatus(status), "_last_seen": last_seen}
+            for device_id, status, last_seen in rows
+        ])
+    db.commit()
+    http_cache.invalidate(http_cache.DEVICES, *[http_cache.device(device_id) for device_id, _, _ in rows])
+
 def add_device_metrics(
     db: Session, 
     device_id: int, 
@@ -136,6 +259,150 @@ def add_device_metrics(
     db.refresh(db_metric)
     return db_metric
 
+def bulk_add_device_metrics(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert many device metric samples with one executemany
+    
+    Args:
+        db: Database session
+        rows: Column values per sample (device_id, timestamp, cpu_usage, ...)
+    """
+    if rows:
+        db.execute(DeviceMetric.__table__.insert(), rows)
+        db.commit()
+
+def bulk_add_interface_metrics(db: Session, columns: Dict[str, list], chunk_size: int = 10000) -> None:
+    """
+    Insert many interface metric samples given as columns
+    
+    Args:
+        db: Database session
+        columns: Equal-length lists per InterfaceMetric column (interface_id, timestamp, ...)
+        chunk_size: Maximum rows per executemany
+    """
+    names = list(columns)
+    rows = [dict(zip(names, row)) for row in zip(*columns.values())]
+    for i in range(0, len(rows), chunk_size):
+        db.execute(InterfaceMetric.__table__.insert(), rows[i:i + chunk_size])
+    if rows:
+        db.commit()
+
+def get_interface_keys(db: Session) -> List[Tuple[int, int, int]]:
+    """
+    Get (interface id, device id, ifIndex) of every interface
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Row tuples, used to map polled ifIndexes to interface records
+    """
+    return db.query(Interface.id, Interface.device_id, Interface.if_index).all()
+
+def get_interface_inventory(db: Session, device_ids: List[int]) -> List[Tuple]:
+    """
+    Get the stored interfaces of devices, removed ones included
+    
+    Args:
+        db: Database session
+        device_ids: IDs of the devices
+        
+    Returns:
+        Row tuples ordered like INTERFACE_INVENTORY_FIELDS
+    """
+    if not device_ids:
+        return []
+    return db.query(*[getattr(Interface, field) for field in INTERFACE_INVENTORY_FIELDS])\
+        .filter(Interface.device_id.in_(device_ids))\
+        .all()
+
+def apply_interface_changes(
+    db: Session,
+    new: List[Dict[str, Any]],
+    changed: List[Dict[str, Any]],
+    removed: List[int],
+    removed_at: datetime,
+    chunk_size: int = 5000
+) -> None:
+    """
+    Write an inventory diff: one executemany per kind of change, one commit
+    
+    Args:
+        db: Database session
+        new: Column values of interfaces to insert (device_id, if_index, name, ...)
+        changed: Column values of interfaces to update, keyed by "id"; every
+            row carries the same columns
+        removed: IDs of interfaces to mark as removed
+        removed_at: Time recorded on the removed interfaces
+        chunk_size: Maximum rows per statement
+    """
+    table = Interface.__table__
+    for i in range(0, len(new), chunk_size):
+        db.execute(table.insert(), new[i:i + chunk_size])
+    if changed:
+        # Bind names must differ from the column names in UPDATE ... SET
+        names = [name for name in changed[0] if name != "id"]
+        stmt = update(table)\
+            .where(table.c.id == bindparam("_id"))\
+            .values({name: bindparam(f"_{name}", type_=table.c[name].type) for name in names})
+        params = [{f"_{name}": value for name, value in row.items()} for row in changed]
+        for i in range(0, len(params), chunk_size):
+            db.execute(stmt, params[i:i + chunk_size])
+    for i in range(0, len(removed), chunk_size):
+        db.execute(
+            update(table)
+            .where(table.c.id.in_(removed[i:i + chunk_size]))
+            .values(removed_at=removed_at)
+        )
+    device_ids = {row["device_id"] for row in new}
+    ids = [row["id"] for row in changed] + list(removed)
+    for i in range(0, len(ids), chunk_size):
+        device_ids.update(
+            device_id for device_id, in
+            db.query(Interface.device_id).filter(Interface.id.in_(ids[i:i + chunk_size])).distinct()
+        )
+    db.commit()
+    http_cache.invalidate(*[http_cache.interfaces(device_id) for device_id in device_ids])
+
+def get_interface_names(db: Session, device_ids: List[int]) -> Dict[Tuple[int, int], str]:
+    """
+    Get interface names of devices by (device id, ifIndex)
+    
+    Args:
+        db: Database session
+        device_ids: IDs of the devices
+        
+    Returns:
+        {(device_id, if_index): name} for interfaces not marked removed
+    """
+    if not device_ids:
+        return {}
+    rows = db.query(Interface.device_id, Interface.if_index, Interface.name)\
+        .filter(Interface.device_id.in_(device_ids), Interface.removed_at.is_(None))\
+        .all()
+    return {(device_id, if_index): name for device_id, if_index, name in rows}
+
+def set_interface_oper_status(db: Session, rows: List[Tuple[int, int, bool]]) -> None:
+    """
+    Set the operational status of interfaces with one executemany
+    
+    Args:
+        db: Database session
+        rows: (device_id, if_index, oper_status) tuples
+    """
+    if not rows:
+        return
+    table = Interface.__table__
+    stmt = update(table)\
+        .where(and_(table.c.device_id == bindparam("_device_id"), table.c.if_index == bindparam("_if_index")))\
+        .values(oper_status=bindparam("_oper_status"))
+    db.execute(stmt, [
+        {"_device_id": device_id, "_if_index": if_index, "_oper_status": up}
+        for device_id, if_index, up in rows
+    ])
+    db.commit()
+    http_cache.invalidate(*{http_cache.interfaces(device_id) for device_id, _, _ in rows})
+
 def add_interface_metrics(
     db: Session,
     device_id: int,
@@ -199,6 +466,19 @@ def get_interfaces(
         .limit(limit)\
         .all()
 
+def get_interface_rows(
+    db: Session,
+    device_id: int,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Tuple]:
+    """Get the interfaces of a device as row tuples ordered like INTERFACE_FIELDS"""
+    return db.query(*[getattr(Interface, field) for field in INTERFACE_FIELDS])\
+        .filter(Interface.device_id == device_id)\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
+
 def get_interface_by_name(
     db: Session,
     device_id: int,
@@ -244,6 +524,7 @@ def create_interface(
     # Add to the database
     db.add(db_interface)
     db.commit()
+    http_cache.invalidate(http_cache.interfaces(db_interface.device_id))
     
     # Refresh to get all fields including auto-generated ones
     db.refresh(db_interface)
@@ -282,13 +563,20 @@ def get_interface_metrics(
     query = db.query(InterfaceMetric).filter(
         InterfaceMetric.interface_id == db_interface.id
     )
-    
-    if start_time:
-        query = query.filter(InterfaceMetric.timestamp >= start_time)
-    if end_time:
-        query = query.filter(InterfaceMetric.timestamp <= end_time)
-        
-    return query.order_by(InterfaceMetric.timestamp.desc()).limit(limit).all()
+    return _time_range(query, InterfaceMetric.timestamp, start_time, end_time, limit).all()
+
+def get_interface_metric_rows(
+    db: Session,
+    interface_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: int = 100
+) -> List[Tuple]:
+    """Get interface metrics as row tuples ordered like INTERFACE_METRIC_FIELDS"""
+    query = db.query(
+        *[getattr(InterfaceMetric, field) for field in INTERFACE_METRIC_FIELDS]
+    ).filter(InterfaceMetric.interface_id == interface_id)
+    return _time_range(query, InterfaceMetric.timestamp, start_time, end_time, limit).all()
 
 def get_device_metrics(
     db: Session,
@@ -313,10 +601,93 @@ def get_device_metrics(
     query = db.query(DeviceMetric).filter(
         DeviceMetric.device_id == device_id
     )
+    return _time_range(query, DeviceMetric.timestamp, start_time, end_time, limit).all()
+
+def get_device_metric_rows(
+    db: Session,
+    device_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: int = 100
+) -> List[Tuple]:
+    """Get device metrics as row tuples ordered like DEVICE_METRIC_FIELDS"""
+    query = db.query(
+        *[getattr(DeviceMetric, field) for field in DEVICE_METRIC_FIELDS]
+    ).filter(DeviceMetric.device_id == device_id)
+    return _time_range(query, DeviceMetric.timestamp, start_time, end_time, limit).all()
+
+def get_device_metric_samples(db: Session, since: datetime) -> List[Tuple]:
+    """
+    Get device metric samples of all devices since a time, for alert rules
     
+    Args:
+        db: Database session
+        since: Oldest sample time
+        
+    Returns:
+        (device_id, timestamp, *DEVICE_METRICS) row tuples, unordered
+    """
+    return db.query(
+        DeviceMetric.device_id, DeviceMetric.timestamp,
+        *[getattr(DeviceMetric, name) for name in DEVICE_METRICS]
+    ).filter(DeviceMetric.timestamp >= since).all()
+
+def get_interface_metric_samples(db: Session, since: datetime) -> List[Tuple]:
+    """
+    Get interface metric samples of all interfaces since a time, for alert rules
+    
+    Args:
+        db: Database session
+        since: Oldest sample time
+        
+    Returns:
+        (interface_id, timestamp, *INTERFACE_METRICS) row tuples, unordered
+    """
+    return db.query(
+        InterfaceMetric.interface_id, InterfaceMetric.timestamp,
+        *[getattr(InterfaceMetric, name) for name in INTERFACE_METRICS]
+    ).filter(InterfaceMetric.timestamp >= since).all()
+
+def get_interface_rates(db: Session, since: datetime) -> List[Tuple]:
+    """
+    Get the traffic rates of all interface samples since a time, for the fleet summary
+    
+    Args:
+        db: Database session
+        since: Oldest sample time
+        
+    Returns:
+        (interface_id, timestamp, in_bps, out_bps) row tuples, unordered
+    """
+    return db.query(
+        InterfaceMetric.interface_id, InterfaceMetric.timestamp, InterfaceMetric.in_bps, InterfaceMetric.out_bps
+    ).filter(InterfaceMetric.timestamp >= since).all()
+
+def get_interface_attributes(db: Session) -> List[Tuple]:
+    """
+    Get the attributes alert rules can refer to, for every interface not marked removed
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        (id, device_id, if_index, name, *INTERFACE_ATTRIBUTES) row tuples
+    """
+    return db.query(
+        Interface.id, Interface.device_id, Interface.if_index, Interface.name,
+        *[getattr(Interface, name) for name in INTERFACE_ATTRIBUTES]
+    ).filter(Interface.removed_at.is_(None)).all()
+
+def _time_range(
+    query,
+    column,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    limit: int
+):
+    """Restrict a metrics query to a time range, newest first"""
     if start_time:
-        query = query.filter(DeviceMetric.timestamp >= start_time)
+        query = query.filter(column >= start_time)
     if end_time:
-        query = query.filter(DeviceMetric.timestamp <= end_time)
-        
-    return query.order_by(DeviceMetric.timestamp.desc()).limit(limit).all()
+        query = query.filter(column <= end_time)
+    return query.order_by(column.desc()).limit(limit)
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from ..models import AlertEvent, NotificationChannel, NotificationOutbox
+
+SEVERITIES = ("info", "warning", "critical")  # ascending
+EPOCH = datetime(1970, 1, 1)
+
+
+def severity_rank(severity: str) -> int:
+    """Position of a severity in SEVERITIES; unknown severities rank as warning"""
+    return SEVERITIES.index(severity) if severity in SEVERITIES else 1
+
+def queue_notifications(db: Session, alerts: Sequence[AlertEvent]) -> int:
+    """
+    Add an outbox entry per alert event and enabled channel it is severe enough for
+
+    The entries are added to the session, not committed, so that they are
+    written in the same transaction as the events. They become due at the
+    end of the channel's current batch window (windows are aligned to the
+    epoch), so the alerts of a burst go out together.
+
+    Args:
+        db: Database session
+        alerts: Flushed AlertEvent instances (with ids)
+
+    Returns:
+        Number of entries added
+    """
+    channels = db.query(NotificationChannel).filter(NotificationChannel.enabled == True).all()
+    if not channels or not alerts:
+        return 0
+    now = datetime.utcnow()
+    elapsed = (now - EPOCH).total_seconds()
+    entries = []
+    for channel in channels:
+        window = channel.batch_window
+        due = EPOCH + timedelta(seconds=(elapsed // window + 1) * window) if window > 0 else now
+        entries.extend(
+            NotificationOutbox(
+                channel_id=channel.id,
+                event_id=event.id,
+                status="pending",
+                attempts=0,
+                next_attempt_at=due,
+                created_at=now,
+            )
+            for event in alerts
+            if severity_rank(event.severity) >= severity_rank(channel.min_severity)
+        )
+    db.add_all(entries)
+    return len(entries)
+
+def get_due_notifications(db: Session, now: datetime, limit: int = 1000, exclude: Sequence[int] = ()) -> List[NotificationOutbox]:
+    """
+    Get pending outbox entries that are due, oldest first, with their event and channel
+
+    Args:
+        db: Database session
+        now: Current time
+        limit: Maximum number of entries
+        exclude: IDs of entries being delivered already
+
+    Returns:
+        NotificationOutbox instances
+    """
+    query = db.query(NotificationOutbox).options(
+        joinedload(NotificationOutbox.event), joinedload(NotificationOutbox.channel)
+    ).filter(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+    if exclude:
+        query = query.filter(NotificationOutbox.id.notin_(list(exclude)))
+    return query.order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id).limit(limit).all()
+
+def get_next_due_time(db: Session, exclude: Sequence[int] = ()) -> Optional[datetime]:
+    """Time the next pending outbox entry (other than ``exclude``) becomes due, None when there is none"""
+    query = db.query(func.min(NotificationOutbox.next_attempt_at)).filter(NotificationOutbox.status == "pending")
+    if exclude:
+        query = query.filter(NotificationOutbox.id.notin_(list(exclude)))
+    return query.scalar()
+
+def mark_notifications_sent(db: Session, entry_ids: Sequence[int], sent_at: datetime) -> int:
+    """Mark outbox entries as delivered; returns the number updated"""
+    count = db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(list(entry_ids))).update(
+        {NotificationOutbox.status: "sent", NotificationOutbox.sent_at: sent_at, NotificationOutbox.last_error: None},
+        synchronize_session=False
+    )
+    db.commit()
+    return count
+
+def reschedule_notifications(
+    db: Session,
+    entry_ids: Sequence[int],
+    attempts: int,
+    next_attempt_at: Optional[datetime],
+    error: str
+) -> int:
+    """
+    Record a failed delivery attempt of outbox entries
+
+    Args:
+        db: Database session
+        entry_ids: IDs of the entries
+        attempts: Attempts made so far
+        next_attempt_at: Time of the next attempt; None gives up ("failed")
+        error: Reason of the failure
+
+    Returns:
+        Number of entries updated
+    """
+    values = {NotificationOutbox.attempts: attempts, NotificationOutbox.last_error: error[:500]}
+    if next_attempt_at is None:
+        values[NotificationOutbox.status] = "failed"
+    else:
+        values[NotificationOutbox.next_attempt_at] = next_attempt_at
+    count = db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(list(entry_ids)))\
+        .update(values, synchronize_session=False)
+    db.commit()
+    return count
+
+def delete_finished_notifications(db: Session, before: datetime, batch_size: int = 5000) -> int:
+    """
+    Delete one batch of sent or failed outbox entries created before a time
+
+    Args:
+        db: Database session
+        before: Entries older than this are deleted
+        batch_size: Maximum number of entries to delete
+
+    Returns:
+        Number of entries deleted
+    """
+    ids = db.query(NotificationOutbox.id).filter(
+        NotificationOutbox.status.in_(("sent", "failed")),
+        NotificationOutbox.created_at < before
+    ).limit(batch_size).subquery()
+    count = db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(db.query(ids.c.id)))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return count
+
+def get_outbox(db: Session, status: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[NotificationOutbox]:
+    """Get outbox entries, newest first, optionally with one status"""
+    query = db.query(NotificationOutbox)
+    if status:
+        query = query.filter(NotificationOutbox.status == status)
+    return query.order_by(NotificationOutbox.id.desc()).offset(skip).limit(limit).all()
@@ -2,23 +2,34 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session, Session
 from contextlib import contextmanager
+import logging
+import os
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Alembic scripts live at the project root, next to src/
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "alembic")
+
 # Always use the unified settings config for DB URL
 SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# SQLite (local runs, benchmarks) is used from FastAPI's worker threads
+connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+
+SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create a scoped session factory
-SessionLocal = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=engine)
-)
+SessionLocal = scoped_session(SessionFactory)
 
 # Create the declarative base
 Base = declarative_base()
 
 def get_db() -> Session:
     """Dependency for getting a database session"""
-    db = SessionLocal()
+    # A session of its own per request: a thread-scoped session would be
+    # shared (and closed) by concurrent requests served by the same thread
+    db = SessionFactory()
     try:
         yield db
     finally:
@@ -36,7 +47,29 @@ def get_db_session():
     finally:
         db.close()
 
+def schema_current() -> bool:
+    """True when every model table exists and the database is at the latest Alembic revision"""
+    if not os.path.isdir(ALEMBIC_DIR):
+        return False
+    # Alembic is only needed for this check, so keep it out of the import graph
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import inspect
+    from . import models  # noqa: registers the tables on Base.metadata
+
+    heads = set(ScriptDirectory(ALEMBIC_DIR).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+        # The migrations only alter tables; the tables themselves come from create_all
+        tables = set(inspect(connection).get_table_names())
+    return bool(heads) and current == heads and set(Base.metadata.tables) <= tables
+
 def init_db():
     """Initialize the database by creating all tables"""
+    # A migrated database already has the schema; create_all would only
+    # spend a round trip per table checking that
+    if schema_current():
+        logger.info("Database schema is at the latest migration; skipping create_all")
+        return
     from . import models  # Import models here to avoid circular imports
     Base.metadata.create_all(bind=engine)
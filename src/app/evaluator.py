@@ -0,0 +1,51 @@
+"""
+Run the alert evaluator as its own process::
+
+    python -m app.evaluator
+
+Set ``RUN_EVALUATOR_IN_API=false`` for the API so that rules are evaluated
+once per interval, however many API workers are running. New alerts are
+relayed to the API's WebSocket feed through Redis, and the samples the
+collector writes are relayed here to keep the alert windows current.
+Acknowledged events past their retention are deleted from here as well,
+and alert notifications are delivered from here.
+"""
+import asyncio
+import logging
+
+from .core import events
+from .core.config import settings
+from .core.event_relay import EventPublisher, listen
+from .core.logging_config import setup_logging
+from .core.loop_monitor import LoopLagMonitor
+from .database import init_db
+from .tasks.alert_evaluator import AlertEvaluator
+from .tasks.event_retention import EventRetention
+from .tasks.notifier import Notifier
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    if settings.LOOP_MONITOR_ENABLED:
+        LoopLagMonitor().start()
+    init_db()
+    EventPublisher((events.ALERT_CREATED,)).start()
+    tasks = [asyncio.create_task(listen((events.SAMPLES_INGESTED,)))]
+    if settings.ALERT_EVENT_RETENTION_DAYS > 0:
+        tasks.append(asyncio.create_task(EventRetention().start(interval=settings.ALERT_EVENT_RETENTION_INTERVAL)))
+    if settings.NOTIFICATIONS_ENABLED:
+        tasks.append(asyncio.create_task(Notifier().start()))
+    try:
+        await AlertEvaluator(interval=settings.EVALUATOR_INTERVAL).start()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Alert evaluator stopped")
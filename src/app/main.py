@@ -1,101 +1,39 @@
+import asyncio
 import os
 import logging
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
-import os
+from fastapi.responses import JSONResponse, Response
 from dotenv import load_dotenv
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Callable
 import traceback
 
-from .database import engine, SessionLocal, init_db
+from .database import SessionLocal, init_db
 from .models import init_models
 from .api.api_v1.api import api_router
-from .core.redis import init_redis
 from .core.config import settings
-from .tasks.collector import SNMPCollector
-from .tasks.alert_evaluator import AlertEvaluator
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log')
-    ]
-)
+from .core import http_cache, metrics
+from .core.logging_config import setup_logging
+from .core.loop_monitor import LoopLagMonitor
+
+# Queue-based logging: formatting and I/O happen off the event loop
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    """Handle application startup and shutdown events"""
-    # Initialize database and models
-    init_models()
-    init_db()
-    logger.info("Initialized database and models")
-    
-    # Initialize Redis
-    await init_redis()
-    logger.info("Initialized Redis")
-    
-    # Start SNMP collector
-    collector = SNMPCollector()
-    asyncio.create_task(collector.start(interval=300))  # 5-minute interval
-    logger.info("Started SNMP collector")
-
-    # Start AlertEvaluator
-    alert_evaluator = AlertEvaluator(interval=60)  # check every 60 seconds
-    asyncio.create_task(alert_evaluator.start())
-    logger.info("Started AlertEvaluator")
-    
-    yield  # The application runs here
-    
-    # Clean up resources on shutdown
-    logger.info("Shutting down...")
-
 # Create FastAPI app
 app = FastAPI(
     title="Network Switch Monitoring API",
     description="API for monitoring Cisco and Huawei network devices",
     version="1.0.0",
-    lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/api/v1/openapi.json"
 )
 
-# CORS: permitir frontend local e outros ambientes
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"]
-)
-
-# Trusted hosts middleware
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=os.getenv("ALLOWED_HOSTS", "*").split(",")
-)
-
-# Include API router
-app.include_router(api_router, prefix="/api/v1")
-
-# Create static files directory if it doesn't exist
-static_dir = os.path.join(os.path.dirname(__file__), "static")
-os.makedirs(static_dir, exist_ok=True)
-
-# Mount static files
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
-
 # Add global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -139,6 +77,91 @@ os.makedirs(static_dir, exist_ok=True)
 # Mount static files
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+loop_monitor = LoopLagMonitor()
+background_tasks = []
+
+@app.on_event("startup")
+async def startup():
+    """Initialize the database and start the in-process background workers"""
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    init_models()
+    init_db()
+    logger.info("Initialized database and models")
+
+    # Heavy optional dependencies are imported on first use only
+    from .core.redis import init_redis
+    await init_redis()
+    logger.info("Initialized Redis")
+
+    # With several API workers, run the collector and evaluator as their
+    # own processes instead (python -m app.collector / app.evaluator)
+    if settings.RUN_COLLECTOR_IN_API:
+        from .tasks.collector import SNMPCollector
+        collector = SNMPCollector()
+        # On-demand polls (POST /devices/{id}/poll) go through this collector
+        from .tasks.polling import use_collector
+        use_collector(collector)
+        background_tasks.append(asyncio.create_task(collector.start(interval=settings.COLLECTOR_INTERVAL)))
+        logger.info("Started SNMP collector")
+        if settings.DISCOVERY_ENABLED:
+            from .tasks.discovery import InterfaceDiscovery
+            discovery = InterfaceDiscovery()
+            background_tasks.append(asyncio.create_task(discovery.start(interval=settings.DISCOVERY_INTERVAL)))
+            logger.info("Started interface discovery")
+        if settings.TRAP_RECEIVER_ENABLED:
+            from .tasks.trap_receiver import TrapReceiver
+            receiver = TrapReceiver(repoll=collector.poll_device)
+            background_tasks.append(asyncio.create_task(receiver.start()))
+
+    if settings.RUN_EVALUATOR_IN_API:
+        from .tasks.alert_evaluator import AlertEvaluator
+        alert_evaluator = AlertEvaluator(interval=settings.EVALUATOR_INTERVAL)
+        background_tasks.append(asyncio.create_task(alert_evaluator.start()))
+        logger.info("Started AlertEvaluator")
+        if settings.ALERT_EVENT_RETENTION_DAYS > 0:
+            from .tasks.event_retention import EventRetention
+            retention = EventRetention()
+            background_tasks.append(asyncio.create_task(retention.start(interval=settings.ALERT_EVENT_RETENTION_INTERVAL)))
+        if settings.NOTIFICATIONS_ENABLED:
+            from .tasks.notifier import Notifier
+            notifier = Notifier()
+            background_tasks.append(asyncio.create_task(notifier.start()))
+
+    from .tasks.fleet_summary import fleet_summary
+    background_tasks.append(asyncio.create_task(fleet_summary.start(interval=settings.SUMMARY_RECONCILE_INTERVAL)))
+
+    # Alerts raised in the collector/evaluator processes reach the
+    # WebSocket feed and the fleet summary through Redis, and so do
+    # samples for the evaluator
+    if not (settings.RUN_COLLECTOR_IN_API and settings.RUN_EVALUATOR_IN_API):
+        from .core import events
+        from .core.event_relay import EventPublisher, listen
+        background_tasks.append(asyncio.create_task(listen()))
+        # Writes made through this worker reach the caches of the others
+        published = [events.RESOURCES_CHANGED, events.DEVICE_CHANGED, events.ALERTS_ACKNOWLEDGED]
+        if settings.RUN_COLLECTOR_IN_API:
+            published.append(events.SAMPLES_INGESTED)
+        EventPublisher(published).start()
+
+    # Workers serve the same ETags and shared responses, even after missing
+    # a relayed bump; without the relay, Redis is the only way a write on
+    # one worker reaches the caches of the others
+    if http_cache.versions_shared():
+        http_cache.share_versions()
+
+@app.on_event("shutdown")
+async def shutdown():
+    logger.info("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    loop_monitor.stop()
+
+# Request latency per route template, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware, routes=lambda: app.routes)
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint to check if the API is running"""
@@ -167,14 +190,19 @@ async def health_check():
         )
     finally:
         db.close()
-    return {"status": "healthy"}
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics_endpoint():
+    """Internal metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "app.main:app",
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", 8000)),
         reload=os.getenv("RELOAD", "true").lower() == "true",
-        workers=int(os.getenv("WORKERS", "1")),
+        workers=settings.WORKERS,
         log_level=os.getenv("LOG_LEVEL", "info").lower()
-    )
\ No newline at end of file
+    )
@@ -3,6 +3,7 @@
 from .base import Base, BaseModel
 from .device import Device, Interface, DeviceMetric, InterfaceMetric
 from .alert import AlertRule, AlertEvent
+from .notification import NotificationChannel, NotificationOutbox
 
 # This makes these available when doing 'from app.models import *'
 __all__ = [
@@ -13,7 +14,9 @@ __all__ = [
     'DeviceMetric',
     'InterfaceMetric',
     'AlertRule',
-    'AlertEvent'
+    'AlertEvent',
+    'NotificationChannel',
+    'NotificationOutbox'
 ]
 
 # Initialize models to ensure they're registered with SQLAlchemy
@@ -22,3 +25,4 @@ def init_models():
     # Import models here to avoid circular imports
     from . import device  # noqa
     from . import alert  # noqa
+    from . import notification  # noqa
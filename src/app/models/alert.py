@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 import datetime
@@ -8,9 +8,12 @@ class AlertRule(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=True)  # Null = global
-    oid = Column(String, nullable=False)
-    operator = Column(String, nullable=False)  # e.g. '>', '<', '=='
-    threshold = Column(Float, nullable=False)
+    rule_type = Column(String, nullable=False, default="threshold", server_default="threshold")  # or "anomaly"
+    expression = Column(String, nullable=True)  # e.g. "in_bps > 0.9 * speed for 5m", see utils/rule_expr.py
+    # Single-threshold form (metric name, operator, threshold), used when expression is NULL
+    oid = Column(String, nullable=True)
+    operator = Column(String, nullable=True)  # e.g. '>', '<', '=='
+    threshold = Column(Float, nullable=True)
     severity = Column(String, nullable=False, default="warning")
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -21,7 +24,7 @@ class AlertRule(Base):
 class AlertEvent(Base):
     __tablename__ = "alert_events"
     id = Column(Integer, primary_key=True, index=True)
-    rule_id = Column(Integer, ForeignKey("alert_rules.id"))
+    rule_id = Column(Integer, ForeignKey("alert_rules.id"), nullable=True)  # Null = SNMP trap
     device_id = Column(Integer, ForeignKey("devices.id"))
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     value = Column(Float, nullable=False)
@@ -32,3 +35,14 @@ class AlertEvent(Base):
 
     rule = relationship("AlertRule")
     device = relationship("Device")
+
+    # One index per access pattern, each ending in timestamp so that pages
+    # come out of the index already in order
+    __table_args__ = (
+        Index("ix_alert_events_timestamp", "timestamp", "id"),  # unfiltered listing
+        Index("ix_alert_events_rule_id_device_id_timestamp", "rule_id", "device_id", "timestamp"),  # evaluator dedup
+        Index("ix_alert_events_device_id_timestamp", "device_id", "timestamp"),
+        Index("ix_alert_events_severity_timestamp", "severity", "timestamp"),
+        # Unacknowledged listing, bulk acknowledgement and retention
+        Index("ix_alert_events_acknowledged_timestamp", "acknowledged", "timestamp"),
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, DateTime, func
 
-Base = declarative_base()
+# One declarative base for every model, so relationships between device and
+# alert models resolve in the same registry
+from ..database import Base
 
 class BaseModel:
     """Base model class that includes common columns and methods."""
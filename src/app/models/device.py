@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -23,8 +23,16 @@ class Device(Base):
     vendor = Column(Enum(DeviceVendor), nullable=False)
     model = Column(String)
     os_version = Column(String)
-    snmp_community = Column(String, nullable=True)  # For SNMP v2c
+    snmp_enabled = Column(Boolean, default=True, nullable=False)
+    snmp_version = Column(String, default="2c", nullable=False)  # "1", "2c" or "3"
+    snmp_community = Column(String, nullable=True)  # For SNMP v1/v2c
     snmp_port = Column(Integer, default=161)
+    # SNMPv3 USM credentials
+    snmp_v3_username = Column(String, nullable=True)
+    snmp_v3_auth_protocol = Column(String, nullable=True)  # md5, sha, sha256, ...
+    snmp_v3_auth_key = Column(String, nullable=True)
+    snmp_v3_priv_protocol = Column(String, nullable=True)  # des, aes, aes256, ...
+    snmp_v3_priv_key = Column(String, nullable=True)
     ssh_username = Column(String, nullable=True)
     ssh_password = Column(String, nullable=True)
     status = Column(Enum(DeviceStatus), default=DeviceStatus.UNKNOWN)
@@ -35,6 +43,7 @@ class Device(Base):
     # Relationships
     interfaces = relationship("Interface", back_populates="device")
     metrics = relationship("DeviceMetric", back_populates="device")
+    alert_rules = relationship("AlertRule", back_populates="device")
 
 class Interface(Base):
     __tablename__ = "interfaces"
@@ -45,15 +54,20 @@ class Interface(Base):
     if_index = Column(Integer, nullable=False)
     mac_address = Column(String)
     mtu = Column(Integer)
-    speed = Column(Integer)  # in bps
+    speed = Column(BigInteger)  # in bps; 10G and faster overflow 32 bits
     admin_status = Column(Boolean, default=True)
     oper_status = Column(Boolean, default=False)
     device_id = Column(Integer, ForeignKey("devices.id"))
+    removed_at = Column(DateTime(timezone=True), nullable=True)  # set when discovery no longer finds it
     
     # Relationships
     device = relationship("Device", back_populates="interfaces")
     metrics = relationship("InterfaceMetric", back_populates="interface")
 
+    __table_args__ = (
+        Index("ix_interfaces_device_id_if_index", "device_id", "if_index"),
+    )
+
 class DeviceMetric(Base):
     __tablename__ = "device_metrics"
     
@@ -74,12 +88,16 @@ class InterfaceMetric(Base):
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     interface_id = Column(Integer, ForeignKey("interfaces.id"))
-    bytes_in = Column(Integer)  # bytes
-    bytes_out = Column(Integer)  # bytes
-    errors_in = Column(Integer)
-    errors_out = Column(Integer)
-    discards_in = Column(Integer)
-    discards_out = Column(Integer)
+    # Raw counter values; ifHC octet counters are 64-bit
+    bytes_in = Column(BigInteger)  # bytes
+    bytes_out = Column(BigInteger)  # bytes
+    errors_in = Column(BigInteger)
+    errors_out = Column(BigInteger)
+    discards_in = Column(BigInteger)
+    discards_out = Column(BigInteger)
+    # Rates since the previous sample, wrap-corrected (NULL after a reboot)
+    in_bps = Column(Float)
+    out_bps = Column(Float)
     
     # Relationships
     interface = relationship("Interface", back_populates="metrics")
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from .base import Base
+import datetime
+
+class NotificationChannel(Base):
+    __tablename__ = "notification_channels"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    type = Column(String, nullable=False)  # "webhook", "slack" or "email", see tasks/notifier.py
+    target = Column(String, nullable=False)  # URL, or comma-separated addresses for email
+    min_severity = Column(String, nullable=False, default="warning")  # "info", "warning" or "critical"
+    batch_window = Column(Integer, nullable=False, default=10)  # seconds alerts are gathered before sending
+    batch_size = Column(Integer, nullable=False, default=50)  # alerts per message; more are split
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class NotificationOutbox(Base):
+    """One alert to deliver to one channel, written with the alert event"""
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(Integer, ForeignKey("notification_channels.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, ForeignKey("alert_events.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default="pending")  # "pending", "sent" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    channel = relationship("NotificationChannel")
+    event = relationship("AlertEvent")
+
+    __table_args__ = (
+        # Due entries for the dispatcher; finished ones for retention
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
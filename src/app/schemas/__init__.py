@@ -3,11 +3,15 @@ from .device import (
     # Enums
     DeviceVendor,
     DeviceStatus,
+    SNMPVersion,
+    SNMPAuthProtocol,
+    SNMPPrivProtocol,
     
     # Device schemas
     DeviceBase,
     DeviceCreate,
     DeviceUpdate,
+    SNMPv3Keys,
     DeviceInDBBase,
     Device,
     DeviceInDB,
@@ -24,18 +28,29 @@ from .device import (
     DeviceMetric,
     InterfaceMetricBase,
     InterfaceMetricCreate,
-    InterfaceMetric
+    InterfaceMetric,
+    
+    # On-demand poll schemas
+    MetricGroup,
+    PollRequest,
+    BatchPollRequest,
+    PollResult,
+    BatchPollItem
 )
 
 __all__ = [
     # Enums
     'DeviceVendor',
     'DeviceStatus',
+    'SNMPVersion',
+    'SNMPAuthProtocol',
+    'SNMPPrivProtocol',
     
     # Device schemas
     'DeviceBase',
     'DeviceCreate',
     'DeviceUpdate',
+    'SNMPv3Keys',
     'DeviceInDBBase',
     'Device',
     'DeviceInDB',
@@ -52,5 +67,12 @@ __all__ = [
     'DeviceMetric',
     'InterfaceMetricBase',
     'InterfaceMetricCreate',
-    'InterfaceMetric'
+    'InterfaceMetric',
+    
+    # On-demand poll schemas
+    'MetricGroup',
+    'PollRequest',
+    'BatchPollRequest',
+    'PollResult',
+    'BatchPollItem'
 ]
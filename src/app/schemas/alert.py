@@ -1,18 +1,45 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Any
+from pydantic import BaseModel, Field, root_validator
+from typing import List, Optional, Any
 from datetime import datetime
 
+from app.core.config import settings
+from app.utils.rule_expr import compile_rule, rule_source
+
 class AlertRuleBase(BaseModel):
     name: str
     device_id: Optional[int] = None
-    oid: str
-    operator: str
-    threshold: float
+    # "threshold" fires when the expression holds; "anomaly" fires when the
+    # expression's value (e.g. "in_bps") strays from its learned baseline by
+    # more than `threshold` standard deviations (default 3; operator '>' or
+    # '<' makes it one-sided)
+    rule_type: str = Field("threshold", regex="^(threshold|anomaly)$")
+    expression: Optional[str] = Field(None, max_length=1000)  # e.g. "in_bps > 0.9 * speed for 5m"
+    # Single-threshold form, used when expression is not set: oid names a metric
+    oid: Optional[str] = None
+    operator: Optional[str] = None
+    threshold: Optional[float] = None
     severity: str = "warning"
     enabled: bool = True
 
 class AlertRuleCreate(AlertRuleBase):
-    pass
+    @root_validator(skip_on_failure=True)
+    def compile_expression(cls, values):
+        # Rejects rules that don't compile (RuleSyntaxError is a ValueError)
+        if values.get('rule_type') == 'anomaly':
+            if not values.get('expression'):
+                raise ValueError('Anomaly rules need an expression')
+            if values.get('operator') not in (None, '>', '<'):
+                raise ValueError("Anomaly rules take operator '>', '<' or none")
+            if values.get('threshold') is not None and values['threshold'] <= 0:
+                raise ValueError('The z-score threshold must be positive')
+            compiled = compile_rule(values['expression'], kind='value')
+        else:
+            compiled = compile_rule(rule_source(
+                values.get('expression'), values.get('oid'), values.get('operator'), values.get('threshold')
+            ))
+        if compiled.max_window > settings.ALERT_MAX_WINDOW:
+            raise ValueError(f'Time windows are limited to {settings.ALERT_MAX_WINDOW} seconds')
+        return values
 
 class AlertRule(AlertRuleBase):
     id: int
@@ -23,7 +50,7 @@ class AlertRule(AlertRuleBase):
         orm_mode = True
 
 class AlertEventBase(BaseModel):
-    rule_id: int
+    rule_id: Optional[int] = None  # None for events raised by SNMP traps
     device_id: int
     value: float
     message: str
@@ -34,6 +61,23 @@ class AlertEventBase(BaseModel):
 class AlertEventCreate(AlertEventBase):
     pass
 
+class AlertEventFilter(BaseModel):
+    """Selects the unacknowledged events to acknowledge; unset fields match any event"""
+    event_ids: Optional[List[int]] = Field(None, max_items=10000)
+    severity: Optional[str] = None
+    device_id: Optional[int] = None
+    rule_id: Optional[int] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    # Required to acknowledge every event with an empty filter, so a bare {} can't
+    all: bool = False
+
+    @root_validator(skip_on_failure=True)
+    def require_filter(cls, values):
+        if not values.get('all') and all(value is None for key, value in values.items() if key != 'all'):
+            raise ValueError('Set at least one filter, or "all": true to acknowledge every event')
+        return values
+
 class AlertEvent(AlertEventBase):
     id: int
     timestamp: datetime
@@ -13,6 +13,26 @@ class DeviceStatus(str, Enum):
     down = "down"
     unknown = "unknown"
 
+class SNMPVersion(str, Enum):
+    v1 = "1"
+    v2c = "2c"
+    v3 = "3"
+
+class SNMPAuthProtocol(str, Enum):
+    md5 = "md5"
+    sha = "sha"
+    sha224 = "sha224"
+    sha256 = "sha256"
+    sha384 = "sha384"
+    sha512 = "sha512"
+
+class SNMPPrivProtocol(str, Enum):
+    des = "des"
+    des3 = "3des"
+    aes = "aes"
+    aes192 = "aes192"
+    aes256 = "aes256"
+
 # Shared properties
 class DeviceBase(BaseModel):
     hostname: str = Field(..., max_length=255)
@@ -20,20 +40,36 @@ class DeviceBase(BaseModel):
     vendor: DeviceVendor
     model: Optional[str] = Field(None, max_length=100)
     os_version: Optional[str] = Field(None, max_length=100)
+    snmp_enabled: bool = True
+    snmp_version: SNMPVersion = SNMPVersion.v2c
     snmp_community: Optional[str] = Field(None, max_length=100)
     snmp_port: int = Field(default=161, ge=1, le=65535)
+    snmp_v3_username: Optional[str] = Field(None, max_length=100)
+    snmp_v3_auth_protocol: Optional[SNMPAuthProtocol] = None
+    snmp_v3_priv_protocol: Optional[SNMPPrivProtocol] = None
     ssh_username: Optional[str] = Field(None, max_length=100)
     ssh_password: Optional[str] = Field(None, max_length=100)
 
+# SNMPv3 keys are write-only: accepted on create/update, never returned
+class SNMPv3Keys(BaseModel):
+    snmp_v3_auth_key: Optional[str] = Field(None, min_length=8, max_length=100)
+    snmp_v3_priv_key: Optional[str] = Field(None, min_length=8, max_length=100)
+
 # Properties to receive on device creation
-class DeviceCreate(DeviceBase):
-    pass
+class DeviceCreate(DeviceBase, SNMPv3Keys):
+    @validator('snmp_v3_username', always=True)
+    def require_v3_username(cls, v, values):
+        if values.get('snmp_version') == SNMPVersion.v3 and not v:
+            raise ValueError('snmp_v3_username is required for SNMP v3')
+        return v
 
 # Properties to receive on device update
-class DeviceUpdate(DeviceBase):
+class DeviceUpdate(DeviceBase, SNMPv3Keys):
     hostname: Optional[str] = Field(None, max_length=255)
     ip_address: Optional[str] = Field(None, max_length=45)
     vendor: Optional[DeviceVendor] = None
+    snmp_enabled: Optional[bool] = None
+    snmp_version: Optional[SNMPVersion] = None
     snmp_port: Optional[int] = Field(None, ge=1, le=65535)
 
 # Properties shared by models stored in DB
@@ -72,6 +108,7 @@ class InterfaceCreate(InterfaceBase):
 class Interface(InterfaceBase):
     id: int
     device_id: Optional[int] = None  # Make device_id optional in response
+    removed_at: Optional[datetime] = None  # no longer reported by the device
     
     class Config:
         orm_mode = True
@@ -109,6 +146,8 @@ class InterfaceMetricBase(BaseModel):
     errors_out: Optional[int] = None
     discards_in: Optional[int] = None
     discards_out: Optional[int] = None
+    in_bps: Optional[float] = None  # bits per second since the previous sample
+    out_bps: Optional[float] = None
 
 class InterfaceMetricCreate(InterfaceMetricBase):
     interface_id: Optional[int] = None
@@ -121,3 +160,29 @@ class InterfaceMetric(InterfaceMetricBase):
     
     class Config:
         orm_mode = True
+
+# On-demand poll schemas
+class MetricGroup(str, Enum):
+    device = "device"  # CPU, memory, temperature, uptime
+    interfaces = "interfaces"  # interface table and counters
+
+class PollRequest(BaseModel):
+    groups: List[MetricGroup] = [MetricGroup.device, MetricGroup.interfaces]
+
+class BatchPollRequest(PollRequest):
+    device_ids: List[int] = Field(..., min_items=1, max_items=1000)
+
+class PollResult(BaseModel):
+    device_id: int
+    polled_at: datetime
+    shared: bool  # answered by a poll another request started or made recently
+    groups: List[MetricGroup]
+    info: Dict[str, Any] = {}  # system group: sysUpTime, sysDescr, sysName, ...
+    metrics: Dict[str, Any] = {}
+    interfaces: List[Dict[str, Any]] = []
+
+class BatchPollItem(BaseModel):
+    device_id: int
+    status: str  # ok, not_found, rate_limited, timeout or error
+    detail: Optional[str] = None
+    result: Optional[PollResult] = None
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class NotificationChannelBase(BaseModel):
+    name: str
+    type: str = Field(..., regex="^(webhook|slack|email)$")
+    target: str = Field(..., max_length=2000)  # URL, or comma-separated addresses for email
+    min_severity: str = Field("warning", regex="^(info|warning|critical)$")
+    # Alerts raised within batch_window seconds go out together, batch_size per message
+    batch_window: int = Field(10, ge=0, le=3600)
+    batch_size: int = Field(50, ge=1, le=1000)
+    enabled: bool = True
+
+class NotificationChannelCreate(NotificationChannelBase):
+    pass
+
+class NotificationChannel(NotificationChannelBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class NotificationOutbox(BaseModel):
+    id: int
+    channel_id: int
+    event_id: int
+    status: str
+    attempts: int
+    next_attempt_at: datetime
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+    class Config:
+        orm_mode = True
@@ -1,70 +1,198 @@
 import asyncio
+import time
 from sqlalchemy.orm import Session
-from app.models import AlertRule, AlertEvent, DeviceMetric
+from app.models import AlertRule
 from app.database import SessionLocal
-from app.utils.snmp import SNMPClient
+from app.crud.crud_alert import create_alert_events, get_firing_series
+from app.utils.rule_expr import CompiledRule, RuleSyntaxError, compile_rule, rule_source
+from app.tasks.rule_frames import SeriesFrame, load_frames
+from app.tasks.anomaly import AnomalyDetector
+from app.tasks.windows import WindowStore
+from app.core import events, metrics
+from app.core.config import settings
+from app.core.profiling import CycleProfile
 import logging
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+class RuleState:
+    """Hold ("for") and firing state of one rule, by series id"""
+
+    __slots__ = ("source", "pending", "firing")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.pending: Dict[int, float] = {}  # series -> time the condition started holding
+        self.firing: Set[int] = set()
+
+    def update(self, series: List[int], now: float, hold: float) -> List[int]:
+        """Record the series meeting the condition now; returns the ones starting to fire"""
+        self.pending = {key: self.pending.get(key, now) for key in series}
+        firing = {key for key, since in self.pending.items() if now - since >= hold}
+        started = firing - self.firing
+        self.firing = firing
+        return sorted(started)
+
+def anomalous(scores: np.ndarray, operator: Optional[str], threshold: Optional[float]) -> np.ndarray:
+    """Series whose z-score is past the threshold: above for '>', below for '<', either way otherwise"""
+    threshold = settings.ANOMALY_THRESHOLD if threshold is None else threshold
+    with np.errstate(invalid="ignore"):
+        if operator == ">":
+            return scores > threshold
+        if operator == "<":
+            return scores < -threshold
+        return np.abs(scores) > threshold
+
 class AlertEvaluator:
     def __init__(self, interval: int = 60):
         self.interval = interval
-        self.snmp_client = SNMPClient()
         self.running = False
+        self.states: Dict[int, RuleState] = {}
+        self.invalid: Dict[int, str] = {}  # rule id -> source that failed to compile (logged once)
+        self.seeded = False
+        # Sliding-window state fed by the collector's samples
+        self.store = WindowStore()
+        # Baselines of anomaly rules, loaded from ANOMALY_STATE_FILE on the first pass
+        self.anomalies = AnomalyDetector()
+        self.anomalies_saved: Optional[float] = None
 
     async def start(self):
         self.running = True
+        events.subscribe(events.SAMPLES_INGESTED, self.store.ingest)
         while self.running:
             try:
                 await self.evaluate_all_rules()
             except Exception as e:
-                logger.error(f"Error evaluating alert rules: {e}")
+                logger.error("Error evaluating alert rules: %s", e, exc_info=True)
             await asyncio.sleep(self.interval)
 
     async def evaluate_all_rules(self):
         db: Session = SessionLocal()
+        start = time.perf_counter()
+        profile = CycleProfile("evaluation", settings.SLOW_EVALUATION_THRESHOLD)
         try:
-            rules = db.query(AlertRule).filter(AlertRule.enabled == True).all()
-            for rule in rules:
-                # For demo: get last metric from DeviceMetric (should be by OID)
-                metric = db.query(DeviceMetric).filter(
-                    DeviceMetric.device_id == rule.device_id
-                ).order_by(DeviceMetric.timestamp.desc()).first()
-                if metric:
-                    value = getattr(metric, 'value', None)
-                    if value is not None and self.check_condition(value, rule.operator, rule.threshold):
-                        # Check if already alerted recently (avoid duplicates)
-                        recent = db.query(AlertEvent).filter(
-                            AlertEvent.rule_id == rule.id,
-                            AlertEvent.device_id == rule.device_id,
-                            AlertEvent.timestamp > datetime.utcnow()
-                        ).first()
-                        if not recent:
-                            event = AlertEvent(
-                                rule_id=rule.id,
-                                device_id=rule.device_id,
-                                value=value,
-                                message=f"Alert: {rule.name} triggered (value: {value})",
-                                severity=rule.severity
-                            )
-                            db.add(event)
-                            db.commit()
-                            db.refresh(event)
-                            logger.info(f"Alert triggered: {event.message}")
+            with profile:
+                with profile.stage("load_rules"):
+                    rules = self.compile_rules(db.query(AlertRule).filter(AlertRule.enabled == True).all())
+                    if not self.seeded:
+                        self.seed(db)
+                        if settings.ANOMALY_STATE_FILE:
+                            self.anomalies.load(settings.ANOMALY_STATE_FILE)
+                    self.anomalies.retain(rule.id for rule, compiled in rules if compiled.kind == "value")
+                now = time.time()
+                with profile.stage("windows"):
+                    compiled_rules = [compiled for _, compiled in rules]
+                    self.store.configure(db, compiled_rules, now, settings.ALERT_STALE_AFTER)
+                    frames = load_frames(
+                        db, self.store, now, settings.ALERT_STALE_AFTER,
+                        interfaces=any(compiled.scope == "interface" for compiled in compiled_rules)
+                    )
+                with profile.stage("evaluate"):
+                    rows = []
+                    for rule, compiled in rules:
+                        metrics.ALERT_RULES_EVALUATED.inc()
+                        rows.extend(self.evaluate_rule(rule, compiled, frames[compiled.scope], now))
+                with profile.stage("store"):
+                    for event in create_alert_events(db, rows):
+                        logger.info("Alert triggered: %s", event.message, extra={"device_id": event.device_id})
+                if settings.ANOMALY_STATE_FILE and self.anomalies.rules:
+                    if self.anomalies_saved is None:
+                        self.anomalies_saved = now
+                    elif now - self.anomalies_saved >= settings.ANOMALY_SAVE_INTERVAL:
+                        with profile.stage("save_baselines"):
+                            self.save_baselines()
         finally:
+            metrics.ALERT_EVALUATION_DURATION.observe(time.perf_counter() - start)
             db.close()
 
-    def check_condition(self, value, operator, threshold):
-        if operator == '>':
-            return value > threshold
-        elif operator == '<':
-            return value < threshold
-        elif operator == '==':
-            return value == threshold
-        elif operator == '>=':
-            return value >= threshold
-        elif operator == '<=':
-            return value <= threshold
-        return False
+    def save_baselines(self):
+        """Write the anomaly baselines to ANOMALY_STATE_FILE; failures are logged, not raised"""
+        try:
+            self.anomalies.save(settings.ANOMALY_STATE_FILE)
+        except OSError as e:
+            logger.warning("Could not save anomaly baselines to %s: %s", settings.ANOMALY_STATE_FILE, e)
+        self.anomalies_saved = time.time()
+
+    def compile_rules(self, rules: List[AlertRule]) -> List[Tuple[AlertRule, CompiledRule]]:
+        """Compiled form of each rule (cached by source); rules that don't compile are skipped"""
+        compiled = []
+        for rule in rules:
+            try:
+                if rule.rule_type == "anomaly":
+                    # The expression is a value; operator and threshold apply to its z-score
+                    kind, source = "value", rule.expression or ""
+                else:
+                    kind, source = "condition", rule_source(rule.expression, rule.oid, rule.operator, rule.threshold)
+                compiled.append((rule, compile_rule(source, kind)))
+            except RuleSyntaxError as e:
+                if self.invalid.get(rule.id) != str(e):
+                    self.invalid[rule.id] = str(e)
+                    logger.warning("Skipping alert rule %s (%s): %s", rule.id, rule.name, e)
+                continue
+            self.invalid.pop(rule.id, None)
+            key = f"{kind}:{source}"
+            state = self.states.get(rule.id)
+            if state is None or state.source != key:
+                # New or changed rule: its condition starts over
+                self.states[rule.id] = RuleState(key)
+        active = {rule.id for rule, _ in compiled}
+        for rule_id in list(self.states):
+            if rule_id not in active:
+                del self.states[rule_id]
+        return compiled
+
+    def seed(self, db: Session):
+        """Restore the firing state from unacknowledged events, so a restart doesn't re-raise them"""
+        since = datetime.utcnow() - timedelta(seconds=settings.ALERT_REFIRE_AFTER)
+        for rule_id, device_id, extra in get_firing_series(db, list(self.states), since):
+            state = self.states.get(rule_id)
+            if state is not None:
+                interface_id = extra.get("interface_id") if isinstance(extra, dict) else None
+                state.firing.add(interface_id if interface_id is not None else device_id)
+        self.seeded = True
+
+    def evaluate_rule(self, rule: AlertRule, compiled: CompiledRule, frame: SeriesFrame, now: float) -> List[Dict[str, Any]]:
+        """Evaluate a rule over all series of its scope; returns the events to create"""
+        scores = None
+        if compiled.kind == "value":
+            scores = self.anomalies.score(rule.id, compiled.source, frame.ids, compiled.evaluate(frame), frame.sampled_at())
+            hits = anomalous(scores[0], rule.operator, rule.threshold)
+        else:
+            hits = compiled.evaluate(frame)
+        if rule.device_id is not None:
+            hits = hits & (frame.device_ids == rule.device_id)
+        positions = np.flatnonzero(hits)
+        started = self.states[rule.id].update(frame.ids[positions].tolist(), now, compiled.hold)
+        if not started:
+            return []
+        positions = np.searchsorted(frame.ids, started)
+        values = compiled.subject(frame)[positions]
+        rows = []
+        for position, value in zip(positions.tolist(), values.tolist()):
+            value = value if np.isfinite(value) else 0.0
+            extra = {"source": "rule", "expression": compiled.source}
+            subject = ""
+            if compiled.scope == "interface":
+                extra.update({
+                    "interface_id": int(frame.ids[position]),
+                    "if_index": frame.if_indexes[position],
+                    "interface": frame.names[position],
+                })
+                subject = f" on {frame.names[position]}"
+            message = f"Alert: {rule.name} triggered{subject} (value: {value:g})"
+            if scores is not None:
+                z_score, mean, stddev = (float(column[position]) for column in scores)
+                extra.update({"z_score": round(z_score, 2), "baseline_mean": mean, "baseline_stddev": stddev})
+                message = f"Alert: {rule.name} anomaly{subject} (value: {value:g}, z-score: {z_score:.1f})"
+            rows.append({
+                "rule_id": rule.id,
+                "device_id": int(frame.device_ids[position]),
+                "value": value,
+                "message": message,
+                "severity": rule.severity,
+                "extra": extra,
+            })
+        return rows
@@ -0,0 +1,209 @@
+"""
+Online baselines for anomaly rules.
+
+An anomaly rule tracks a numeric expression per series (e.g. ``in_bps``
+per interface) instead of comparing it with a fixed threshold. Each new
+sample is scored against the series' baseline before being folded into
+it. The z-score is ``(value - mean) / stddev`` and the rule fires while
+``|z|`` (or z, or -z for one-sided rules) exceeds the rule's threshold.
+
+Baselines are exponentially weighted means and variances, updated in
+place over whole NumPy columns:
+
+- a global one per series (``ANOMALY_ALPHA``);
+- a seasonal one per series and hour of the week, or hour of the day
+  (``ANOMALY_SEASONAL``, UTC hours, ``ANOMALY_SEASONAL_ALPHA``). It is
+  used once its bucket has seen ``ANOMALY_MIN_SAMPLES`` samples, so
+  daily traffic cycles don't look anomalous.
+
+Until a baseline has that many samples, the series is not scored.
+Memory is fixed per series: 48 bytes plus 10 per seasonal bucket
+(about 1.7 KB with hour-of-week baselines). With ``ANOMALY_STATE_FILE``
+set, baselines are saved to it now and then, so a restart doesn't
+relearn weeks of seasonality.
+"""
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEASONS = {"hour_of_week": 168, "hour_of_day": 24, "none": 0}
+
+# Floor of the standard deviation relative to the mean, so that a series
+# that has been flat doesn't turn the first wiggle into a huge z-score
+_RELATIVE_STDDEV_FLOOR = 0.01
+_STDDEV_FLOOR = 1e-6
+
+
+def season_of(timestamps: np.ndarray, seasons: int) -> np.ndarray:
+    """Seasonal bucket of epoch timestamps: UTC hour of the week (Monday 00:00 is 0) or of the day."""
+    hours = (timestamps // 3600).astype(np.int64)
+    # 1970-01-01 was a Thursday, 72 hours after Monday 00:00
+    return (hours + 72) % seasons if seasons else np.zeros(len(timestamps), np.int64)
+
+
+class SeriesBaselines:
+    """Baselines of one anomaly rule, one row per series id."""
+
+    ARRAYS = ("ids", "sampled_at", "mean", "var", "n", "score", "seasonal_mean", "seasonal_var", "seasonal_n")
+
+    def __init__(self, seasons: int):
+        self.seasons = seasons
+        self.rows: Dict[int, int] = {}
+        self.size = 0
+        self._allocate(0)
+
+    def _allocate(self, series: int):
+        self.ids = np.zeros(series, np.int64)
+        self.sampled_at = np.full(series, -np.inf)  # newest sample folded in
+        self.mean = np.zeros(series)
+        self.var = np.zeros(series)
+        self.n = np.zeros(series, np.int64)
+        self.score = np.full(series, np.nan)  # z-score of the newest sample
+        self.seasonal_mean = np.zeros((series, self.seasons), np.float32)
+        self.seasonal_var = np.zeros((series, self.seasons), np.float32)
+        self.seasonal_n = np.zeros((series, self.seasons), np.uint16)
+
+    def _grow(self, needed: int):
+        old = {name: getattr(self, name) for name in self.ARRAYS}
+        self._allocate(max(needed, 2 * len(self.ids), 1024))
+        for name, array in old.items():
+            getattr(self, name)[:len(array)] = array
+
+    def lookup(self, ids: np.ndarray) -> np.ndarray:
+        """Rows of series ids, added as needed."""
+        rows = np.fromiter((self.rows.get(key, -1) for key in ids.tolist()), np.int64, len(ids))
+        missing = np.flatnonzero(rows < 0)
+        if len(missing):
+            for i in missing.tolist():
+                rows[i] = self.rows[int(ids[i])] = self.size
+                self.size += 1
+            if self.size > len(self.ids):
+                self._grow(self.size)
+            self.ids[rows[missing]] = ids[missing]
+        return rows
+
+    def update(self, ids: np.ndarray, values: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score and fold in the samples newer than each series' baseline.
+
+        Returns (z-score, baseline mean, baseline stddev) per id, the
+        baseline being the one new samples were scored against. Series
+        without a new sample keep the score of their newest one; missing
+        values score NaN.
+        """
+        rows = self.lookup(ids)
+        new = ~np.isnan(values) & ~np.isnan(timestamps) & (timestamps > self.sampled_at[rows])
+        rows_new, values_new, timestamps_new = rows[new], values[new], timestamps[new]
+
+        mean, var, ready = self.mean[rows_new], self.var[rows_new], self.n[rows_new] >= settings.ANOMALY_MIN_SAMPLES
+        if self.seasons:
+            season = season_of(timestamps_new, self.seasons)
+            seasonal_ready = self.seasonal_n[rows_new, season] >= settings.ANOMALY_MIN_SAMPLES
+            mean = np.where(seasonal_ready, self.seasonal_mean[rows_new, season], mean)
+            var = np.where(seasonal_ready, self.seasonal_var[rows_new, season], var)
+            ready |= seasonal_ready
+        stddev = np.maximum(np.sqrt(var), np.maximum(_RELATIVE_STDDEV_FLOOR * np.abs(mean), _STDDEV_FLOOR))
+        self.score[rows_new] = np.where(ready, (values_new - mean) / stddev, np.nan)
+        baseline_mean, baseline_stddev = self.mean[rows], np.sqrt(self.var[rows])
+        baseline_mean[new], baseline_stddev[new] = mean, stddev
+
+        self.mean[rows_new], self.var[rows_new] = self._fold(
+            self.mean[rows_new], self.var[rows_new], self.n[rows_new], values_new, settings.ANOMALY_ALPHA
+        )
+        self.n[rows_new] += 1
+        if self.seasons:
+            seasonal_mean, seasonal_var = self._fold(
+                self.seasonal_mean[rows_new, season], self.seasonal_var[rows_new, season],
+                self.seasonal_n[rows_new, season], values_new, settings.ANOMALY_SEASONAL_ALPHA
+            )
+            self.seasonal_mean[rows_new, season] = seasonal_mean
+            self.seasonal_var[rows_new, season] = seasonal_var
+            self.seasonal_n[rows_new, season] = np.minimum(self.seasonal_n[rows_new, season].astype(np.int64) + 1, 65535)
+        self.sampled_at[rows_new] = timestamps_new
+
+        scores = np.where(np.isnan(values), np.nan, self.score[rows])
+        return scores, baseline_mean, baseline_stddev
+
+    @staticmethod
+    def _fold(mean: np.ndarray, var: np.ndarray, n: np.ndarray, values: np.ndarray, alpha: float):
+        """One EWMA step of mean and variance; the first sample sets the mean."""
+        delta = values - mean
+        first = n == 0
+        mean = np.where(first, values, mean + alpha * delta)
+        var = np.where(first, 0.0, (1 - alpha) * (var + alpha * delta * delta))
+        return mean, var
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name)[:self.size] for name in self.ARRAYS}
+
+    @classmethod
+    def from_state(cls, seasons: int, arrays: Dict[str, np.ndarray]) -> "SeriesBaselines":
+        baselines = cls(seasons)
+        size = len(arrays["ids"])
+        baselines._allocate(size)
+        for name in cls.ARRAYS:
+            getattr(baselines, name)[:] = arrays[name]
+        baselines.size = size
+        baselines.rows = {key: row for row, key in enumerate(arrays["ids"].tolist())}
+        return baselines
+
+
+class AnomalyDetector:
+    """Baselines of every anomaly rule, reset when a rule's expression changes."""
+
+    def __init__(self, seasons: Optional[int] = None):
+        self.seasons = SEASONS[settings.ANOMALY_SEASONAL] if seasons is None else seasons
+        self.rules: Dict[int, Tuple[str, SeriesBaselines]] = {}
+
+    def score(self, rule_id: int, source: str, ids: np.ndarray, values: np.ndarray, timestamps: np.ndarray):
+        """Update a rule's baselines; returns (z-score, mean, stddev) per id (see ``SeriesBaselines.update``)."""
+        entry = self.rules.get(rule_id)
+        if entry is None or entry[0] != source:
+            entry = self.rules[rule_id] = (source, SeriesBaselines(self.seasons))
+        return entry[1].update(ids, values, timestamps)
+
+    def retain(self, rule_ids: Iterable[int]):
+        """Drop the baselines of rules that are gone or disabled."""
+        keep = set(rule_ids)
+        for rule_id in list(self.rules):
+            if rule_id not in keep:
+                del self.rules[rule_id]
+
+    def save(self, path: str):
+        """Write all baselines to one .npz file, atomically."""
+        arrays = {"meta": np.array(orjson.dumps({
+            "seasons": self.seasons,
+            "rules": {str(rule_id): source for rule_id, (source, _) in self.rules.items()},
+        }).decode())}
+        for rule_id, (_, baselines) in self.rules.items():
+            for name, array in baselines.state().items():
+                arrays[f"{rule_id}.{name}"] = array
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        """Restore baselines saved by ``save``; a file with other seasons is ignored."""
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                meta = orjson.loads(str(data["meta"]))
+                if meta["seasons"] != self.seasons:
+                    logger.info("Ignoring saved anomaly baselines with %s seasons", meta["seasons"])
+                    return
+                for rule_id, source in meta["rules"].items():
+                    arrays = {name: data[f"{rule_id}.{name}"] for name in SeriesBaselines.ARRAYS}
+                    self.rules[int(rule_id)] = (source, SeriesBaselines.from_state(self.seasons, arrays))
+        except Exception as e:
+            logger.warning("Could not load anomaly baselines from %s: %s", path, e)
+            return
+        logger.info("Loaded anomaly baselines of %d rules from %s", len(self.rules), path)
@@ -1,18 +1,41 @@
 import asyncio
+import time
+import numpy as np
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, FrozenSet, Optional
 from sqlalchemy.orm import Session
-from .. import crud, models, schemas
+from .. import models, schemas
+from ..crud import crud_device as crud
 from ..database import SessionLocal
-from ..utils.snmp import SNMPClient
+from ..utils.snmp import SNMPClient, SNMPTimeout
+from ..utils.rule_expr import DEVICE_METRICS
+from ..utils.snmp_profiles import METRIC_GROUPS, plan_for
+from ..utils.rtt import CircuitBreaker
+from ..models.device import DeviceStatus
+from .reachability import ReachabilitySweep
+from .device_status import DeviceStatusTracker
+from .buffers import COUNTERS, OCTET_COUNTERS, InterfaceIndex, InterfaceSamples, RateCalculator
+from ..core import events, metrics
+from ..core.profiling import CycleProfile
 from ..core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1)
+
 class SNMPCollector:
     def __init__(self):
         self.snmp = SNMPClient()
+        self.breaker = CircuitBreaker()
+        self.status = DeviceStatusTracker()
+        self.sweep = ReachabilitySweep.from_settings(self.snmp) if settings.PROBE_ENABLED else None
+        self.device_metrics: List[Dict[str, Any]] = []
+        # Interface counters of the running cycle, columnar and reused
+        self.samples = InterfaceSamples()
+        self.rates = RateCalculator()
+        self.agents: Dict[int, tuple] = {}  # device id -> (address, port) its counters came from
+        self.interval = 300
         self.running = False
         self.task = None
 
@@ -23,13 +46,14 @@ class SNMPCollector:
             return
 
         self.running = True
-        logger.info(f"Starting SNMP collector with {interval}s interval")
+        self.interval = interval
+        logger.info("Starting SNMP collector with %ss interval", interval)
         
         while self.running:
             try:
                 await self.collect_all_devices()
             except Exception as e:
-                logger.error(f"Error in SNMP collection: {str(e)}", exc_info=True)
+                logger.error("Error in SNMP collection: %s", e, exc_info=True)
             
             # Wait for the next collection interval
             await asyncio.sleep(interval)
@@ -44,133 +68,251 @@ class SNMPCollector:
     async def collect_all_devices(self):
         """Collect metrics from all enabled devices."""
         db = SessionLocal()
+        start = time.perf_counter()
+        profile = CycleProfile("collection", settings.SLOW_COLLECTION_THRESHOLD)
         try:
-            # Get all devices that have SNMP enabled
-            devices = crud.get_devices(db, skip=0, limit=1000)  # Adjust limit as needed
-            logger.info(f"Collecting metrics for {len(devices)} devices")
-            
-            for device in devices:
-                if not device.snmp_enabled:
-                    continue
-                    
-                try:
-                    await self.collect_device_metrics(db, device)
-                except Exception as e:
-                    logger.error(f"Error collecting metrics for device {device.id}: {str(e)}", exc_info=True)
-                    # Update device status to indicate error
-                    device.status = "error"
-                    db.commit()
+            with profile:
+                # Get all devices that have SNMP enabled
+                with profile.stage("load_devices"):
+                    devices = crud.get_snmp_devices(db)
+                logger.info("Collecting metrics for %d devices", len(devices))
+                self.snmp.begin_cycle()
+                self.samples.clear()
+                self.status.load(devices)
+                self.forget_moved_devices(devices)
+                total = len(devices)
+                
+                with profile.stage("probe"):
+                    devices = await self.reachable_devices(db, devices)
+                
+                deadline = start + self.interval
+                failed = behind = 0
+                with profile.stage("collect"):
+                    for device in devices:
+                        if time.perf_counter() > deadline:
+                            behind += 1
+                        try:
+                            await self.collect_device_metrics(db, device)
+                            self.breaker.record(device.id, ok=True)
+                        except Exception:
+                            # Logged with its error by collect_device_metrics
+                            failed += 1
+                            self.breaker.record(device.id, ok=False)
+                            self.status.set(device.id, DeviceStatus.DOWN)
+                
+                # Samples of the whole cycle in one INSERT, status and
+                # last_seen in one UPDATE
+                with profile.stage("flush_metrics"):
+                    self.flush_device_metrics(db)
+                    self.flush_interface_metrics(db)
+                with profile.stage("flush_status"):
+                    self.status.flush(db)
+                
+                metrics.COLLECTOR_DEVICES.labels("collected").set(len(devices) - failed)
+                metrics.COLLECTOR_DEVICES.labels("failed").set(failed)
+                metrics.COLLECTOR_DEVICES.labels("unreachable").set(total - len(devices))
+                metrics.COLLECTOR_BEHIND_SCHEDULE.set(behind)
                     
         finally:
+            metrics.COLLECTOR_CYCLE_DURATION.observe(time.perf_counter() - start)
             db.close()
     
-    async def collect_device_metrics(self, db: Session, device: models.Device):
-        """Collect metrics for a single device."""
+    def forget_moved_devices(self, devices: List[models.Device]):
+        """Drop the previous counters of devices that are gone or now point at another agent."""
+        agents = {device.id: (device.ip_address, device.snmp_port or 161) for device in devices}
+        stale = [
+            device_id for device_id, agent in self.agents.items()
+            if agents.get(device_id) != agent
+        ]
+        self.rates.forget(stale)
+        self.agents = agents
+
+    async def reachable_devices(
+        self,
+        db: Session,
+        devices: List[models.Device]
+    ) -> List[models.Device]:
+        """
+        Filter out devices that don't answer before the expensive collection.
+        
+        With the probe stage enabled the whole fleet is swept concurrently and
+        unreachable devices are marked down (flushed with the rest of the
+        cycle's status changes). Otherwise only devices with an open circuit
+        breaker are probed, one at a time.
+        """
+        if self.sweep is not None:
+            reachable, unreachable = await self.sweep.run(devices)
+            for device in reachable:
+                self.breaker.close(device.id)
+            for device in unreachable:
+                self.breaker.record(device.id, ok=False)
+                self.status.set(device.id, DeviceStatus.DOWN)
+            logger.info("Probe: %d reachable, %d down", len(reachable), len(unreachable))
+            return reachable
+        
+        reachable = []
+        for device in devices:
+            # Devices that failed several cycles in a row only get a cheap probe
+            if self.breaker.is_open(device.id):
+                if not await self.snmp.probe(self.snmp.target(device)):
+                    logger.debug("Skipping device %s: circuit open, probe failed", device.id)
+                    self.status.set(device.id, DeviceStatus.DOWN)
+                    continue
+                self.breaker.close(device.id)
+            reachable.append(device)
+        return reachable
+    
+    async def poll_device(
+        self,
+        device_id: int,
+        groups: FrozenSet[str] = METRIC_GROUPS
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Collect one device right away, outside the cycle (after a trap or
+        for the on-demand poll API).
+        
+        Its samples and status go to buffers of its own, written
+        immediately, so a poll during a cycle leaves the cycle's pending
+        rows and status changes alone; its interface rates are merged with
+        those of the last cycle.
+        
+        Returns:
+            The fetched data (see ``RequestPlan.fetch``), None when the
+            device doesn't exist or has SNMP disabled; collection errors
+            are raised once the device is marked down
+        """
+        db = SessionLocal()
         try:
-            # Update device status to indicate we're collecting
-            device.status = "collecting"
-            device.last_seen = datetime.utcnow()
-            db.commit()
-            
-            # Get basic device info
-            device_info = await self.snmp.get_device_info(device.ip_address)
+            device = crud.get_device(db, device_id)
+            if device is None or not device.snmp_enabled:
+                return None
+            status = DeviceStatusTracker()
+            status.load([device])
+            samples = InterfaceSamples(capacity=256)
+            device_metrics: List[Dict[str, Any]] = []
+            try:
+                result = await self.collect_device_metrics(db, device, samples, groups, device_metrics, status)
+                self.breaker.record(device.id, ok=True)
+            except Exception:
+                self.breaker.record(device.id, ok=False)
+                status.set(device.id, DeviceStatus.DOWN)
+                self.status.update(status.flush(db))
+                raise
+            self.flush_device_metrics(db, device_metrics)
+            self.flush_interface_metrics(db, samples, merge=True)
+            # The cycle compares its own changes with the status written here
+            self.status.update(status.flush(db))
+            return result
+        finally:
+            db.close()
+    
+    async def collect_device_metrics(
+        self,
+        db: Session,
+        device: models.Device,
+        samples: Optional[InterfaceSamples] = None,
+        groups: FrozenSet[str] = METRIC_GROUPS,
+        device_metrics: Optional[List[Dict[str, Any]]] = None,
+        status: Optional[DeviceStatusTracker] = None
+    ):
+        """Collect metrics for a single device into the cycle's buffers, or the ones given."""
+        try:
+            # Per-device community/USM credentials and port, cached across cycles
+            target = self.snmp.target(device)
             
-            # Get CPU metrics
-            cpu_metrics = await self.collect_cpu_metrics(device.ip_address)
+            # Vendor profile compiled into GET PDUs and table walks, shared
+            # by all devices of the vendor
+            plan = plan_for(device, groups)
+            result = await plan.fetch(self.snmp, target)
+            uptime = result["info"]["sysUpTime"]
+            if uptime is None:
+                raise SNMPTimeout(f"No SNMP response from {target.host}")
             
-            # Get interface metrics
-            interface_metrics = await self.collect_interface_metrics(device.ip_address)
+            sampled_at = time.time()
+            now = datetime.utcfromtimestamp(sampled_at)
+            # Written with the rest of the cycle in one INSERT, whose
+            # executemany takes its columns from the first row: every row
+            # has every metric, None where the vendor profile lacks it
+            if "device" in plan.groups:
+                if device_metrics is None:
+                    device_metrics = self.device_metrics
+                device_metrics.append({
+                    "device_id": device.id, "timestamp": now, **dict.fromkeys(DEVICE_METRICS), **result["metrics"]
+                })
+            if samples is None:
+                samples = self.samples
+            samples.append(device.id, sampled_at, uptime, plan.hc_octets, result["interfaces"])
             
-            # Update device status
-            device.status = "online"
-            db.commit()
+            # Recorded now, written with the rest of the cycle by DeviceStatusTracker.flush
+            if status is None:
+                status = self.status
+            status.set(device.id, DeviceStatus.UP, last_seen=now)
             
-            return {
-                "device_info": device_info,
-                "cpu_metrics": cpu_metrics,
-                "interface_metrics": interface_metrics
-            }
+            return result
             
         except Exception as e:
-            logger.error(f"Error collecting metrics for device {device.id}: {str(e)}", exc_info=True)
-            device.status = "error"
-            db.commit()
+            # Rate-limited per device (see RateLimitFilter); tracebacks only when debugging
+            logger.error(
+                "Error collecting metrics for device %s: %s", device.id, e,
+                exc_info=logger.isEnabledFor(logging.DEBUG),
+                extra={"device_id": device.id}
+            )
             raise
     
-    async def collect_cpu_metrics(self, host: str) -> Dict[str, Any]:
-        """Collect CPU metrics from the device."""
-        # OID for CPU usage (1.3.6.1.2.1.25.3.3.1.2 - hrProcessorLoad)
-        oids = ["1.3.6.1.2.1.25.3.3.1.2"]
-        results = await self.snmp.get_multiple(host, oids)
-        
-        # Process CPU metrics
-        cpu_usage = []
-        for oid, result in results.items():
-            if not result.get("error"):
-                cpu_usage.append({
-                    "index": oid.split(".")[-1],
-                    "usage_percent": int(result["value"])
-                })
-        
-        return {"cpus": cpu_usage}
+    def flush_device_metrics(self, db: Session, rows: Optional[List[Dict[str, Any]]] = None):
+        """Insert the device metrics collected this cycle (or ``rows``)."""
+        if rows is None:
+            rows, self.device_metrics = self.device_metrics, []
+        if rows:
+            start = time.perf_counter()
+            crud.bulk_add_device_metrics(db, rows)
+            metrics.INGEST_DURATION.labels("device_metrics").observe(time.perf_counter() - start)
+            metrics.INGEST_BATCH_SIZE.labels("device_metrics").observe(len(rows))
+            # Feeds the alert evaluator's sliding windows
+            columns = {
+                "id": [row["device_id"] for row in rows],
+                "timestamp": [(row["timestamp"] - EPOCH).total_seconds() for row in rows],
+            }
+            for name in DEVICE_METRICS:
+                columns[name] = [row.get(name) for row in rows]
+            events.emit(events.SAMPLES_INGESTED, scope="device", columns=columns)
     
-    async def collect_interface_metrics(self, host: str) -> Dict[str, Any]:
-        """Collect interface metrics from the device."""
-        # OIDs for interface metrics
-        oids = [
-            "1.3.6.1.2.1.2.2.1.2",  # ifDescr
-            "1.3.6.1.2.1.2.2.1.7",  # ifAdminStatus
-            "1.3.6.1.2.1.2.2.1.8",  # ifOperStatus
-            "1.3.6.1.2.1.2.2.1.10", # ifInOctets
-            "1.3.6.1.2.1.2.2.1.16", # ifOutOctets
-            "1.3.6.1.2.1.2.2.1.14", # ifInErrors
-            "1.3.6.1.2.1.2.2.1.20", # ifOutErrors
-            "1.3.6.1.2.1.2.2.1.13", # ifInDiscards
-            "1.3.6.1.2.1.2.2.1.19"   # ifOutDiscards
-        ]
-        
-        results = await self.snmp.get_multiple(host, oids)
-        
-        # Process interface metrics
-        interfaces = {}
+    def flush_interface_metrics(self, db: Session, samples: InterfaceSamples = None, merge: bool = False):
+        """Compute rates and insert the interface samples of this cycle (or ``samples``), column by column."""
+        if samples is None:
+            samples = self.samples
+        if not samples.size:
+            return
+        start = time.perf_counter()
+        rates = self.rates.update(samples, OCTET_COUNTERS, merge=merge)
         
-        # First, get all interface indices
-        if_descr_oid = "1.3.6.1.2.1.2.2.1.2"
-        for oid, result in results.items():
-            if oid.startswith(if_descr_oid) and not result.get("error"):
-                if_index = oid.split(".")[-1]
-                interfaces[if_index] = {
-                    "name": result["value"],
-                    "index": if_index
-                }
+        # Samples of interfaces without a record (not discovered yet) are dropped
+        interface_ids = InterfaceIndex(crud.get_interface_keys(db)).resolve(samples.keys())
+        known = interface_ids >= 0
+        if not known.all():
+            logger.debug("Dropping %d samples of unknown interfaces", int((~known).sum()))
+        if not known.any():
+            return
         
-        # Add other metrics to interfaces
-        for oid, result in results.items():
-            if not result.get("value") or result.get("error"):
-                continue
-                
-            parts = oid.split(".")
-            base_oid = ".".join(parts[:-1])
-            if_index = parts[-1]
-            
-            if if_index not in interfaces:
-                continue
-                
-            if base_oid == "1.3.6.1.2.1.2.2.1.7":  # ifAdminStatus
-                interfaces[if_index]["admin_status"] = result["value"]
-            elif base_oid == "1.3.6.1.2.1.2.2.1.8":  # ifOperStatus
-                interfaces[if_index]["oper_status"] = result["value"]
-            elif base_oid == "1.3.6.1.2.1.2.2.1.10":  # ifInOctets
-                interfaces[if_index]["bytes_in"] = int(result["value"])
-            elif base_oid == "1.3.6.1.2.1.2.2.1.16":  # ifOutOctets
-                interfaces[if_index]["bytes_out"] = int(result["value"])
-            elif base_oid == "1.3.6.1.2.1.2.2.1.14":  # ifInErrors
-                interfaces[if_index]["errors_in"] = int(result["value"])
-            elif base_oid == "1.3.6.1.2.1.2.2.1.20":  # ifOutErrors
-                interfaces[if_index]["errors_out"] = int(result["value"])
-            elif base_oid == "1.3.6.1.2.1.2.2.1.13":  # ifInDiscards
-                interfaces[if_index]["discards_in"] = int(result["value"])
-            elif base_oid == "1.3.6.1.2.1.2.2.1.19":  # ifOutDiscards
-                interfaces[if_index]["discards_out"] = int(result["value"])
+        timestamps = (samples.column("timestamp")[known] * 1e6).astype(np.int64).astype("datetime64[us]")
+        columns = {
+            "interface_id": interface_ids[known].tolist(),
+            "timestamp": timestamps.tolist(),
+        }
+        for name in COUNTERS:
+            values = samples.column(name)[known].astype(np.int64).astype(object)
+            values[~samples.present[name][:samples.size][known]] = None
+            columns[name] = values.tolist()
+        for name, field in (("bytes_in", "in_bps"), ("bytes_out", "out_bps")):
+            rate = rates[name][known].astype(object)
+            rate[np.isnan(rates[name][known])] = None
+            columns[field] = rate.tolist()
         
-        return {"interfaces": list(interfaces.values())}
+        crud.bulk_add_interface_metrics(db, columns)
+        metrics.INGEST_DURATION.labels("interface_metrics").observe(time.perf_counter() - start)
+        metrics.INGEST_BATCH_SIZE.labels("interface_metrics").observe(len(columns["interface_id"]))
+        events.emit(events.SAMPLES_INGESTED, scope="interface", columns={
+            "id": columns.pop("interface_id"),
+            "timestamp": samples.column("timestamp")[known].tolist(),
+            **{name: values for name, values in columns.items() if name != "timestamp"},
+        })
@@ -0,0 +1,82 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core import events, metrics
+from ..crud import crud_device as crud
+from ..models.device import DeviceStatus
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceStatusTracker:
+    """
+    Accumulate device status and last_seen changes during a collection cycle.
+
+    Nothing is written until ``flush``, which stores every pending change
+    in one set-based UPDATE and emits a ``device.status_changed`` event for
+    each device whose status actually changed.
+    """
+
+    def __init__(self):
+        self._known: Dict[int, Optional[DeviceStatus]] = {}
+        self._pending: Dict[int, Tuple[DeviceStatus, Optional[datetime]]] = {}
+
+    def load(self, devices: Iterable[models.Device]):
+        """Remember the stored status of devices at the start of a cycle."""
+        for device in devices:
+            self._known[device.id] = device.status
+
+    def set(self, device_id: int, status: DeviceStatus, last_seen: Optional[datetime] = None):
+        """Record the status of a device; ``last_seen`` is kept as stored when None."""
+        self._pending[device_id] = (status, last_seen)
+
+    def flush(self, db: Session) -> List[Tuple[int, Optional[DeviceStatus], DeviceStatus]]:
+        """
+        Write pending changes and emit transitions.
+
+        Returns:
+            (device_id, old_status, new_status) for every transition
+        """
+        rows = [
+            (device_id, status, last_seen)
+            for device_id, (status, last_seen) in self._pending.items()
+            # A device that stays down has nothing to write
+            if last_seen is not None or self._known.get(device_id) != status
+        ]
+        self._pending = {}
+        if rows:
+            start = time.perf_counter()
+            crud.bulk_set_device_status(db, rows)
+            metrics.INGEST_DURATION.labels("device_status").observe(time.perf_counter() - start)
+            metrics.INGEST_BATCH_SIZE.labels("device_status").observe(len(rows))
+
+        transitions = []
+        for device_id, status, last_seen in rows:
+            old = self._known.get(device_id)
+            self._known[device_id] = status
+            if old != status:
+                transitions.append((device_id, old, status))
+                events.emit(
+                    events.DEVICE_STATUS_CHANGED,
+                    device_id=device_id,
+                    old=old.value if old is not None else None,
+                    new=DeviceStatus(status).value,
+                    timestamp=(last_seen or datetime.utcnow()).isoformat()
+                )
+        if transitions:
+            logger.info("%d device status transitions", len(transitions))
+        return transitions
+
+    def update(self, transitions: Iterable[Tuple[int, Optional[DeviceStatus], DeviceStatus]]):
+        """Take in the transitions another tracker flushed (an on-demand poll's)."""
+        for device_id, _, status in transitions:
+            self._known[device_id] = status
+
+    def forget(self, device_id: int):
+        self._known.pop(device_id, None)
+        self._pending.pop(device_id, None)
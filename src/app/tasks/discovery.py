@@ -0,0 +1,267 @@
+"""
+Interface inventory discovery.
+
+Walks ifTable/ifXTable of every SNMP device and reconciles the result with
+the stored ``Interface`` rows in one set-based pass per run: new
+interfaces are inserted, changed ones updated and vanished ones stamped
+with ``removed_at``, each kind of change as one executemany for the whole
+fleet.
+
+A walk is preceded by one GET of sysUpTime and ifTableLastChange. When
+ifTableLastChange is the same as at the device's last walk and the device
+has not rebooted since, the walk is skipped, so a run over a stable fleet
+costs one GET per device. Admin/oper status are as of the last walk; the
+collector samples them every cycle.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .. import models
+from ..crud import crud_device as crud
+from ..database import SessionLocal
+from ..core import metrics
+from ..core.config import settings
+from ..utils.oid import OidTrie, parse_oid
+from ..utils.snmp import SNMPClient, SNMPTimeout, octets_of
+from ..utils.snmp_profiles import (
+    IF_ADMIN_STATUS, IF_ALIAS, IF_DESCR, IF_HIGH_SPEED, IF_MTU, IF_NAME, IF_OPER_STATUS,
+    IF_PHYS_ADDRESS, IF_SPEED, IF_TABLE_LAST_CHANGE, SYS_UPTIME, plan_walks
+)
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_COLUMNS = {
+    "descr": IF_DESCR,
+    "mtu": IF_MTU,
+    "speed": IF_SPEED,
+    "mac_address": IF_PHYS_ADDRESS,
+    "admin_status": IF_ADMIN_STATUS,
+    "oper_status": IF_OPER_STATUS,
+    "name": IF_NAME,
+    "high_speed": IF_HIGH_SPEED,  # Mbit/s; ifSpeed saturates at 4.29 Gbit/s
+    "alias": IF_ALIAS,
+}
+
+CHANGE_MARKERS = (parse_oid(SYS_UPTIME), parse_oid(IF_TABLE_LAST_CHANGE))
+
+# Interface columns owned by discovery: compared with the stored values
+# and overwritten when they differ
+SYNCED_FIELDS = ("if_index", "name", "description", "mac_address", "mtu", "speed", "admin_status", "oper_status")
+
+
+def format_mac(value: Any) -> Optional[str]:
+    """ifPhysAddress as "00:1b:54:00:00:01", None when empty."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        # Binary strings arrive hex-encoded, printable ones as text
+        octets = octets_of(value)
+    else:
+        octets = bytes(value)
+    return ":".join(f"{octet:02x}" for octet in octets) or None
+
+
+def interface_record(if_index: int, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Interface column values from the walked ifTable/ifXTable fields of one row."""
+    high_speed = values.get("high_speed")
+    return {
+        "if_index": if_index,
+        "name": values.get("name") or values.get("descr") or f"ifIndex {if_index}",
+        "description": values.get("alias") or None,
+        "mac_address": format_mac(values.get("mac_address")),
+        "mtu": values.get("mtu"),
+        "speed": high_speed * 1_000_000 if high_speed else values.get("speed"),
+        "admin_status": values.get("admin_status") == 1,
+        "oper_status": values.get("oper_status") == 1,
+    }
+
+
+def diff_inventory(
+    stored: Sequence[Tuple],
+    discovered: Dict[int, List[Dict[str, Any]]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[int]]:
+    """
+    Compare the stored interfaces of devices with freshly discovered ones.
+
+    Interfaces match on (device, ifIndex). Rows created by hand with
+    ifIndex 0 (the interface metrics API does this) are adopted by name.
+
+    Args:
+        stored: Rows ordered like ``crud.INTERFACE_INVENTORY_FIELDS`` for the
+            devices in ``discovered``
+        discovered: {device id: interface records}
+
+    Returns:
+        (rows to insert, rows to update keyed by "id", ids to mark removed)
+    """
+    current: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    placeholders: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for row in stored:
+        record = dict(zip(crud.INTERFACE_INVENTORY_FIELDS, row))
+        if record["if_index"]:
+            current[record["device_id"], record["if_index"]] = record
+        else:
+            placeholders[record["device_id"], record["name"]] = record
+
+    new: List[Dict[str, Any]] = []
+    changed: List[Dict[str, Any]] = []
+    for device_id, interfaces in discovered.items():
+        for interface in interfaces:
+            record = current.pop((device_id, interface["if_index"]), None)
+            if record is None:
+                record = placeholders.pop((device_id, interface["name"]), None)
+            if record is None:
+                new.append({"device_id": device_id, **interface})
+            elif record["removed_at"] is not None or any(
+                record[field] != interface[field] for field in SYNCED_FIELDS
+            ):
+                # removed_at is cleared for interfaces that came back
+                changed.append({"id": record["id"], **interface, "removed_at": None})
+
+    removed = [record["id"] for record in current.values() if record["removed_at"] is None]
+    return new, changed, removed
+
+
+class InterfaceDiscovery:
+    def __init__(self, snmp: SNMPClient = None, concurrency: int = None):
+        self.snmp = snmp or SNMPClient()
+        self.concurrency = concurrency or settings.DISCOVERY_CONCURRENCY
+        columns = [(field, parse_oid(oid)) for field, oid in INVENTORY_COLUMNS.items()]
+        self.walks = plan_walks([oid for _, oid in columns])
+        self.dispatch = OidTrie((oid, field) for field, oid in columns)
+        # Device id -> (sysUpTime, ifTableLastChange) at its last synced walk
+        self.markers: Dict[int, Tuple[int, int]] = {}
+        self.running = False
+
+    async def start(self, interval: int = 3600):
+        """Run discovery every ``interval`` seconds, starting now."""
+        if self.running:
+            logger.warning("Interface discovery is already running")
+            return
+
+        self.running = True
+        logger.info("Starting interface discovery with %ss interval", interval)
+        while self.running:
+            try:
+                await self.discover_all()
+            except Exception as e:
+                logger.error("Error in interface discovery: %s", e, exc_info=True)
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        self.running = False
+
+    async def discover_all(self) -> Dict[str, int]:
+        """
+        Discover the interfaces of every SNMP device and sync them.
+
+        Returns:
+            Number of devices walked, unchanged and failed, and of interfaces
+            added, updated and removed
+        """
+        db = SessionLocal()
+        start = time.perf_counter()
+        try:
+            devices = crud.get_snmp_devices(db)
+            self.snmp.begin_cycle()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def discover(device: models.Device):
+                async with semaphore:
+                    try:
+                        return await self.discover_device(device)
+                    except Exception as e:
+                        logger.warning(
+                            "Interface discovery failed for device %s: %s", device.id, e,
+                            extra={"device_id": device.id}
+                        )
+                        return e
+
+            results = await asyncio.gather(*(discover(device) for device in devices))
+
+            discovered: Dict[int, List[Dict[str, Any]]] = {}
+            markers: Dict[int, Tuple[int, int]] = {}
+            unchanged = failed = 0
+            for device, result in zip(devices, results):
+                if isinstance(result, Exception):
+                    failed += 1
+                elif result is None:
+                    unchanged += 1
+                else:
+                    discovered[device.id], markers[device.id] = result
+
+            new, changed, removed = diff_inventory(
+                crud.get_interface_inventory(db, list(discovered)), discovered
+            )
+            if new or changed or removed:
+                crud.apply_interface_changes(db, new, changed, removed, datetime.utcnow())
+            # Only once written: a failed write makes the next run walk again
+            self.markers.update(markers)
+
+            summary = {
+                "walked": len(discovered), "unchanged": unchanged, "failed": failed,
+                "added": len(new), "updated": len(changed), "removed": len(removed),
+            }
+            for state in ("walked", "unchanged", "failed"):
+                metrics.DISCOVERY_DEVICES.labels(state).set(summary[state])
+            for change in ("added", "updated", "removed"):
+                metrics.DISCOVERY_CHANGES.labels(change).inc(summary[change])
+            logger.info(
+                "Discovery: %d devices walked, %d unchanged, %d failed; "
+                "%d interfaces added, %d updated, %d removed in %.1fs",
+                summary["walked"], unchanged, failed, len(new), len(changed), len(removed),
+                time.perf_counter() - start
+            )
+            return summary
+        finally:
+            db.close()
+
+    async def discover_device(
+        self,
+        device: models.Device
+    ) -> Optional[Tuple[List[Dict[str, Any]], Tuple[int, int]]]:
+        """
+        Walk the interface tables of one device unless they are unchanged.
+
+        Returns:
+            (interface records, change markers), or None when the device
+            reports no change since its last walk
+        """
+        target = self.snmp.target(device)
+        uptime, last_change = await self.snmp.get_values(target, CHANGE_MARKERS)
+        if uptime is None:
+            raise SNMPTimeout(f"No sysUpTime from {target.host}")
+        previous = self.markers.get(device.id)
+        if (
+            previous is not None and last_change is not None
+            and last_change == previous[1] and uptime >= previous[0]
+        ):
+            self.markers[device.id] = (uptime, last_change)
+            return None
+
+        # A failed walk fails the device: a partial table would mark the
+        # missing interfaces removed
+        bulk = (getattr(device, "snmp_version", None) or "2c") != "1"
+        results = await asyncio.gather(*[
+            self.snmp.walk(target, group, max_repetitions=repetitions, bulk=bulk)
+            for group, repetitions in self.walks
+        ])
+
+        rows: Dict[int, Dict[str, Any]] = {}
+        match = self.dispatch.match
+        for result in results:
+            for oid, value in result:
+                hit = match(oid)
+                # ifTable and ifXTable are indexed by the single ifIndex arc
+                if hit is not None and len(hit[1]) == 1:
+                    field, (if_index,) = hit
+                    fields = rows.get(if_index)
+                    if fields is None:
+                        fields = rows[if_index] = {}
+                    fields[field] = value
+
+        interfaces = [interface_record(if_index, fields) for if_index, fields in sorted(rows.items())]
+        return interfaces, (uptime, last_change)
@@ -0,0 +1,66 @@
+"""
+Alert event retention.
+
+Deletes acknowledged events older than ``ALERT_EVENT_RETENTION_DAYS`` in
+batches of ``ALERT_EVENT_DELETE_BATCH``, oldest first, so the table (and
+its indexes) stays bounded by the retention period plus whatever is still
+unacknowledged. Sent and failed notification outbox rows are pruned with
+the same retention. Each batch is a short transaction found through the
+(acknowledged, timestamp) index, and the loop yields between batches, so
+an event storm being cleaned up doesn't stall the rest of the process.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from ..crud import crud_alert as crud
+from ..crud import crud_notification
+from ..database import SessionLocal
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EventRetention:
+    def __init__(self):
+        self.running = False
+
+    async def start(self, interval: int = 3600):
+        """Prune old events every ``interval`` seconds, starting now."""
+        if self.running:
+            logger.warning("Alert event retention is already running")
+            return
+
+        self.running = True
+        logger.info("Starting alert event retention (%s days)", settings.ALERT_EVENT_RETENTION_DAYS)
+        while self.running:
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error("Error pruning alert events: %s", e, exc_info=True)
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        self.running = False
+
+    async def prune(self) -> int:
+        """Delete the acknowledged events past retention; returns how many."""
+        before = datetime.utcnow() - timedelta(days=settings.ALERT_EVENT_RETENTION_DAYS)
+        deleted = 0
+        db = SessionLocal()
+        try:
+            batch = settings.ALERT_EVENT_DELETE_BATCH
+            # Outbox rows first: they reference the events
+            while crud_notification.delete_finished_notifications(db, before, batch) >= batch:
+                await asyncio.sleep(0)
+            while True:
+                count = crud.delete_acknowledged_events(db, before, batch)
+                deleted += count
+                if count < batch:
+                    break
+                await asyncio.sleep(0)
+        finally:
+            db.close()
+        if deleted:
+            logger.info("Deleted %d acknowledged alert events older than %s", deleted, before.isoformat())
+        return deleted
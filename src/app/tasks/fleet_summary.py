@@ -0,0 +1,269 @@
+"""
+Fleet summary for dashboards.
+
+``FleetSummary`` keeps the aggregates served by ``GET /api/v1/summary``
+in memory and updates them from the event bus instead of querying:
+
+- device counts by status and by vendor, from ``device.status_changed``
+  (collector) and ``device.changed`` (device API);
+- interface utilisation, ``max(in_bps, out_bps) / speed``, from
+  ``samples.ingested``; the top ``SUMMARY_TOP_N`` come from a max-heap
+  with lazy deletion, so a sample costs O(log n) and a read O(N log n);
+- unacknowledged alerts by severity, from ``alert.created`` and
+  ``alerts.acknowledged``.
+
+Each change bumps a version; the encoded document and its ETag are
+rebuilt on the first read after a change, so polling an unchanged
+summary costs a header comparison. The aggregates are loaded from the
+database at startup and reloaded every ``SUMMARY_RECONCILE_INTERVAL``,
+which also picks up interfaces added by discovery and anything missed
+while a relay connection was down.
+
+Handlers run in the thread of whoever emits (the collector's loop, the
+API threadpool for CRUD writes, the relay listener), so every update and
+read of the aggregates holds ``FleetSummary.lock``.
+"""
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+
+from ..core import events
+from ..core.config import settings
+from ..crud import crud_alert, crud_device
+from ..database import SessionLocal
+from ..models import Device
+
+logger = logging.getLogger(__name__)
+
+
+class TopN:
+    """Largest value per key: a max-heap whose outdated entries are skipped and dropped on read."""
+
+    def __init__(self):
+        self.values: Dict[int, float] = {}
+        self.heap: List[Tuple[float, int]] = []  # (-value, key)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def set(self, key: int, value: Optional[float]):
+        """Set a key's value; None (or NaN) removes it."""
+        if value is None or math.isnan(value):
+            self.values.pop(key, None)
+            return
+        if self.values.get(key) == value:
+            return
+        self.values[key] = value
+        heapq.heappush(self.heap, (-value, key))
+        if len(self.heap) > 2 * len(self.values) + 64:
+            # Mostly outdated entries: rebuild from the current values
+            self.heap = [(-value, key) for key, value in self.values.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, n: int) -> List[Tuple[int, float]]:
+        """The ``n`` keys with the largest values, largest first."""
+        found, kept, seen = [], [], set()
+        while self.heap and len(found) < n:
+            entry = heapq.heappop(self.heap)
+            key, value = entry[1], -entry[0]
+            if self.values.get(key) != value or key in seen:
+                continue  # outdated: dropped for good
+            seen.add(key)
+            found.append((key, value))
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self.heap, entry)
+        return found
+
+
+class FleetSummary:
+    def __init__(self):
+        self.running = False
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.version = 0
+        self.devices: Dict[int, Tuple[Optional[str], Optional[str]]] = {}  # id -> (status, vendor)
+        self.by_status: Counter = Counter()
+        self.by_vendor: Counter = Counter()
+        self.interfaces: Dict[int, Tuple[int, Optional[str], Optional[int]]] = {}  # id -> (device_id, name, speed)
+        self.rates: Dict[int, Tuple[Optional[float], Optional[float]]] = {}  # id -> (in_bps, out_bps)
+        self.utilisation = TopN()
+        self.unacknowledged: Counter = Counter()  # severity -> events
+        self._encoded: Tuple[int, bytes, str] = (-1, b"", "")
+
+    async def start(self, interval: int = 600):
+        """Subscribe to the event bus and reload from the database every ``interval`` seconds."""
+        if self.running:
+            return
+        self.running = True
+        events.subscribe(events.DEVICE_STATUS_CHANGED, self.on_status_changed)
+        events.subscribe(events.DEVICE_CHANGED, self.on_device_changed)
+        events.subscribe(events.SAMPLES_INGESTED, self.on_samples)
+        events.subscribe(events.ALERT_CREATED, self.on_alert_created)
+        events.subscribe(events.ALERTS_ACKNOWLEDGED, self.on_alerts_acknowledged)
+        while self.running:
+            db = SessionLocal()
+            try:
+                self.load(db)
+            except Exception as e:
+                logger.error("Error loading the fleet summary: %s", e, exc_info=True)
+            finally:
+                db.close()
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        self.running = False
+
+    def load(self, db: Session):
+        """Rebuild every aggregate from the database."""
+        start = time.perf_counter()
+        devices = {
+            device_id: (_value(status), _value(vendor))
+            for device_id, status, vendor in db.query(Device.id, Device.status, Device.vendor)
+        }
+        interfaces = {row[0]: (row[1], row[3], row[4]) for row in crud_device.get_interface_attributes(db)}
+        # Latest rates per interface, as the collector last reported them
+        since = datetime.utcnow() - timedelta(seconds=2 * settings.COLLECTOR_INTERVAL)
+        latest: Dict[int, Tuple[datetime, Optional[float], Optional[float]]] = {}
+        for interface_id, timestamp, in_bps, out_bps in crud_device.get_interface_rates(db, since):
+            if interface_id not in latest or timestamp > latest[interface_id][0]:
+                latest[interface_id] = (timestamp, in_bps, out_bps)
+        unacknowledged = crud_alert.count_unacknowledged_events(db)
+
+        with self.lock:
+            self.devices = devices
+            self.by_status = Counter(status for status, _ in devices.values())
+            self.by_vendor = Counter(vendor for _, vendor in devices.values())
+            self.interfaces = interfaces
+            self.rates = {interface_id: (in_bps, out_bps) for interface_id, (_, in_bps, out_bps) in latest.items()}
+            self.utilisation = TopN()
+            for interface_id in self.rates:
+                self.utilisation.set(interface_id, self._utilisation(interface_id))
+            self.unacknowledged = Counter(unacknowledged)
+            self.loaded = True
+            self._changed()
+        logger.debug(
+            "Loaded the fleet summary (%d devices, %d interfaces) in %.3fs",
+            len(devices), len(interfaces), time.perf_counter() - start
+        )
+
+    def _changed(self):
+        self.version += 1
+
+    def _utilisation(self, interface_id: int) -> Optional[float]:
+        """Percent of the interface speed used by its busier direction, None when unknown."""
+        info = self.interfaces.get(interface_id)
+        rates = [rate for rate in self.rates.get(interface_id, ()) if rate is not None]
+        if info is None or not info[2] or not rates:
+            return None
+        return 100.0 * max(rates) / info[2]
+
+    def on_status_changed(self, device_id: int, new: str, **payload):
+        with self.lock:
+            old_status, vendor = self.devices.get(device_id, (None, None))
+            if device_id not in self.devices or old_status == new:
+                return  # unknown devices arrive with device.changed or the next reload
+            self.by_status[old_status] -= 1
+            self.by_status[new] += 1
+            self.devices[device_id] = (new, vendor)
+            self._changed()
+
+    def on_device_changed(self, device_id: int, status: Optional[str], vendor: Optional[str], **payload):
+        with self.lock:
+            old = self.devices.pop(device_id, None)
+            if old is not None:
+                self.by_status[old[0]] -= 1
+                self.by_vendor[old[1]] -= 1
+            if vendor is not None:
+                self.devices[device_id] = (status, vendor)
+                self.by_status[status] += 1
+                self.by_vendor[vendor] += 1
+            else:  # deleted, with its interfaces
+                for interface_id in [i for i, info in self.interfaces.items() if info[0] == device_id]:
+                    del self.interfaces[interface_id]
+                    self.rates.pop(interface_id, None)
+                    self.utilisation.set(interface_id, None)
+            self._changed()
+
+    def on_samples(self, scope: str, columns: Dict[str, list]):
+        if scope != "interface" or "in_bps" not in columns:
+            return
+        with self.lock:
+            for interface_id, in_bps, out_bps in zip(columns["id"], columns["in_bps"], columns["out_bps"]):
+                self.rates[interface_id] = (in_bps, out_bps)
+                self.utilisation.set(interface_id, self._utilisation(interface_id))
+            self._changed()
+
+    def on_alert_created(self, alert: Dict[str, Any]):
+        if not alert.get("acknowledged"):
+            with self.lock:
+                self.unacknowledged[alert["severity"]] += 1
+                self._changed()
+
+    def on_alerts_acknowledged(self, counts: Dict[str, int]):
+        with self.lock:
+            for severity, count in counts.items():
+                self.unacknowledged[severity] = max(0, self.unacknowledged[severity] - count)
+            self._changed()
+
+    def document(self) -> Dict[str, Any]:
+        """The summary as a JSON-ready dict; the caller holds ``lock``."""
+        top = []
+        for interface_id, utilisation in self.utilisation.top(settings.SUMMARY_TOP_N):
+            device_id, name, speed = self.interfaces[interface_id]
+            in_bps, out_bps = self.rates[interface_id]
+            top.append({
+                "interface_id": interface_id,
+                "device_id": device_id,
+                "name": name,
+                "speed": speed,
+                "in_bps": in_bps,
+                "out_bps": out_bps,
+                "utilisation": round(utilisation, 2),
+            })
+        unacknowledged = {severity: count for severity, count in self.unacknowledged.items() if count > 0}
+        return {
+            "devices": {
+                "total": len(self.devices),
+                "by_status": {status: count for status, count in self.by_status.items() if count > 0},
+                "by_vendor": {vendor: count for vendor, count in self.by_vendor.items() if count > 0},
+            },
+            "interfaces": {
+                "total": len(self.interfaces),
+                "reporting": len(self.utilisation),
+                "top_utilisation": top,
+            },
+            "alerts": {
+                "unacknowledged": sum(unacknowledged.values()),
+                "by_severity": unacknowledged,
+            },
+        }
+
+    def encoded(self) -> Tuple[bytes, str]:
+        """(JSON body, ETag) of the current summary, re-encoded only after a change."""
+        with self.lock:
+            version, body, etag = self._encoded
+            if version != self.version:
+                version = self.version
+                body = orjson.dumps(self.document())
+                etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+                self._encoded = (version, body, etag)
+            return body, etag
+
+
+def _value(member) -> Optional[str]:
+    """Enum column value as its string value."""
+    return getattr(member, "value", member)
+
+
+fleet_summary = FleetSummary()
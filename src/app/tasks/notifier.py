@@ -0,0 +1,271 @@
+"""
+Alert notification dispatcher.
+
+Alert events are never sent from where they are raised: ``create_alert_events``
+writes one outbox row (``notification_outbox``) per event and channel in
+the same transaction as the events, and this dispatcher delivers them. A
+slow or failing endpoint therefore delays notifications, not evaluation,
+and nothing is lost when a process stops between raising and sending.
+
+- An outbox row becomes due at the end of its channel's current
+  ``batch_window``; the due rows of a channel go out together,
+  ``batch_size`` alerts per message (a digest when there are several).
+- Each channel has its own pool of ``NOTIFICATION_WORKERS`` concurrent
+  deliveries, so one slow channel doesn't hold up the others.
+- A failed delivery is retried with exponential backoff and jitter
+  (``NOTIFICATION_RETRY_BASE`` doubling up to ``NOTIFICATION_RETRY_MAX``)
+  until ``NOTIFICATION_MAX_ATTEMPTS``; client errors other than 408/429
+  are not retried. Given-up rows are kept as "failed".
+
+Channel types: "webhook" (JSON POST of the alerts), "slack" (incoming
+webhook text, or any chat accepting ``{"text": ...}``) and "email"
+(SMTP_* settings). Run one dispatcher per database: it runs next to the
+alert evaluator. ``benchmarks/notify_stub.py`` is a local endpoint to
+deliver to.
+"""
+import asyncio
+import logging
+import random
+import smtplib
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import orjson
+
+from ..crud import crud_notification as crud
+from ..crud.crud_alert import alert_payload
+from ..database import SessionLocal
+from ..core import events, metrics
+from ..core.config import settings
+from ..models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentError(Exception):
+    """A delivery failure that retrying won't fix"""
+
+
+class Delivery:
+    """One message to a channel: a batch of outbox rows with the same attempt count"""
+
+    __slots__ = ("channel_id", "channel_type", "channel_name", "target", "entry_ids", "alerts", "attempts")
+
+    def __init__(self, channel, attempts: int):
+        self.channel_id = channel.id
+        self.channel_type = channel.type
+        self.channel_name = channel.name
+        self.target = channel.target
+        self.attempts = attempts
+        self.entry_ids: List[int] = []
+        self.alerts: List[Dict[str, Any]] = []
+
+
+def summary(alerts: Sequence[Dict[str, Any]]) -> str:
+    """One-line description of a batch: the alert itself, or counts by severity"""
+    if len(alerts) == 1:
+        return f"[{alerts[0]['severity'].upper()}] {alerts[0]['message']}"
+    counts = Counter(alert["severity"] for alert in alerts)
+    severities = sorted(counts, key=crud.severity_rank, reverse=True)
+    return f"{len(alerts)} alerts ({', '.join(f'{counts[s]} {s}' for s in severities)})"
+
+
+def digest(alerts: Sequence[Dict[str, Any]]) -> str:
+    """Text of a chat or email message: the summary, then up to NOTIFICATION_DIGEST_LINES alerts"""
+    lines = [summary(alerts)]
+    if len(alerts) > 1:
+        shown = alerts[:settings.NOTIFICATION_DIGEST_LINES]
+        lines.extend(
+            f"- [{alert['severity']}] {alert['message']} (device {alert['device_id']}, {alert['timestamp']})"
+            for alert in shown
+        )
+        if len(alerts) > len(shown):
+            lines.append(f"... and {len(alerts) - len(shown)} more")
+    return "\n".join(lines)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number ``attempts``, with +-20% jitter"""
+    delay = min(settings.NOTIFICATION_RETRY_BASE * 2 ** (attempts - 1), settings.NOTIFICATION_RETRY_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Notifier:
+    def __init__(self):
+        self.running = False
+        self.client = None  # httpx.AsyncClient, created in start()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.pools: Dict[int, asyncio.Semaphore] = {}  # channel id -> delivery slots
+        self.in_flight: Set[int] = set()  # outbox ids being delivered
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Deliver due outbox rows until stopped; new alerts wake the dispatcher up."""
+        if self.running:
+            logger.warning("Notifier is already running")
+            return
+
+        import httpx  # only needed where notifications are dispatched
+
+        self.running = True
+        self.client = httpx.AsyncClient(timeout=settings.NOTIFICATION_TIMEOUT)
+        self.wakeup = asyncio.Event()
+        events.subscribe(events.ALERT_CREATED, self._wake)
+        logger.info("Starting notifier with %d workers per channel", settings.NOTIFICATION_WORKERS)
+        try:
+            while self.running:
+                try:
+                    delay = self.dispatch()
+                except Exception as e:
+                    logger.error("Error dispatching notifications: %s", e, exc_info=True)
+                    delay = settings.NOTIFICATION_POLL_INTERVAL
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+        finally:
+            events.unsubscribe(events.ALERT_CREATED, self._wake)
+            for task in self.tasks:
+                task.cancel()
+            await self.client.aclose()
+
+    def stop(self):
+        self.running = False
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def _wake(self, **payload):
+        self.wakeup.set()
+
+    def dispatch(self) -> float:
+        """Start deliveries for the due outbox rows; returns the seconds until the next check"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            entries = crud.get_due_notifications(db, now, settings.NOTIFICATION_FETCH_LIMIT, self.in_flight)
+            deliverable = [entry for entry in entries if entry.event is not None and entry.channel is not None]
+            if len(deliverable) < len(entries):
+                # Without foreign key enforcement (SQLite) the event or channel may be gone
+                orphans = {entry.id for entry in entries} - {entry.id for entry in deliverable}
+                crud.reschedule_notifications(db, orphans, settings.NOTIFICATION_MAX_ATTEMPTS, None, "Event or channel deleted")
+            for delivery in self.batches(deliverable):
+                self.in_flight.update(delivery.entry_ids)
+                task = asyncio.create_task(self.deliver(delivery))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            if len(entries) >= settings.NOTIFICATION_FETCH_LIMIT:
+                return 0
+            next_due = crud.get_next_due_time(db, exclude=self.in_flight)
+        finally:
+            db.close()
+        if next_due is None:
+            return settings.NOTIFICATION_POLL_INTERVAL
+        return min(max((next_due - now).total_seconds(), 0.05), settings.NOTIFICATION_POLL_INTERVAL)
+
+    @staticmethod
+    def batches(entries: List[NotificationOutbox]) -> List[Delivery]:
+        """Group due rows by channel and attempt count, ``batch_size`` alerts per delivery"""
+        groups: Dict[tuple, List[NotificationOutbox]] = defaultdict(list)
+        for entry in entries:
+            groups[(entry.channel_id, entry.attempts)].append(entry)
+        deliveries = []
+        for (_, attempts), group in groups.items():
+            channel = group[0].channel
+            for start in range(0, len(group), channel.batch_size):
+                delivery = Delivery(channel, attempts)
+                for entry in group[start:start + channel.batch_size]:
+                    delivery.entry_ids.append(entry.id)
+                    delivery.alerts.append(alert_payload(entry.event))
+                deliveries.append(delivery)
+        return deliveries
+
+    async def deliver(self, delivery: Delivery):
+        """Send one delivery within its channel's pool and record the outcome"""
+        pool = self.pools.get(delivery.channel_id)
+        if pool is None:
+            pool = self.pools[delivery.channel_id] = asyncio.Semaphore(settings.NOTIFICATION_WORKERS)
+        error, permanent = None, False
+        try:
+            async with pool:
+                start = time.perf_counter()
+                try:
+                    await self.send(delivery)
+                except PermanentError as e:
+                    error, permanent = str(e), True
+                except Exception as e:
+                    error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                metrics.NOTIFICATION_DELIVERY_DURATION.labels(delivery.channel_type).observe(time.perf_counter() - start)
+            self.record(delivery, error, permanent)
+        except Exception as e:
+            # The rows stay pending and are picked up again
+            logger.error("Could not record notification delivery: %s", e, exc_info=True)
+        finally:
+            self.in_flight.difference_update(delivery.entry_ids)
+            self.wakeup.set()
+
+    async def send(self, delivery: Delivery):
+        if delivery.channel_type == "webhook":
+            await self.post(delivery, {"channel": delivery.channel_name, "count": len(delivery.alerts), "alerts": delivery.alerts})
+        elif delivery.channel_type == "slack":
+            await self.post(delivery, {"text": digest(delivery.alerts)})
+        elif delivery.channel_type == "email":
+            await asyncio.get_running_loop().run_in_executor(None, send_email, delivery)
+        else:
+            raise PermanentError(f"Unknown channel type {delivery.channel_type!r}")
+
+    async def post(self, delivery: Delivery, body: Dict[str, Any]):
+        response = await self.client.post(
+            delivery.target, content=orjson.dumps(body), headers={"Content-Type": "application/json"}
+        )
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise PermanentError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+    def record(self, delivery: Delivery, error: Optional[str], permanent: bool):
+        """Mark the rows of a delivery sent, or schedule their retry"""
+        db = SessionLocal()
+        try:
+            if error is None:
+                crud.mark_notifications_sent(db, delivery.entry_ids, datetime.utcnow())
+                metrics.NOTIFICATIONS_SENT.labels(delivery.channel_type, "sent").inc(len(delivery.alerts))
+                logger.debug("Sent %d alerts to channel %s", len(delivery.alerts), delivery.channel_name)
+                return
+            attempts = delivery.attempts + 1
+            if permanent or attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                crud.reschedule_notifications(db, delivery.entry_ids, attempts, None, error)
+                metrics.NOTIFICATIONS_SENT.labels(delivery.channel_type, "failed").inc(len(delivery.alerts))
+                logger.warning(
+                    "Giving up on %d alerts for channel %s after %d attempts: %s",
+                    len(delivery.alerts), delivery.channel_name, attempts, error
+                )
+            else:
+                retry_at = datetime.utcnow() + timedelta(seconds=backoff(attempts))
+                crud.reschedule_notifications(db, delivery.entry_ids, attempts, retry_at, error)
+                metrics.NOTIFICATIONS_SENT.labels(delivery.channel_type, "retried").inc(len(delivery.alerts))
+                logger.info(
+                    "Delivery of %d alerts to channel %s failed (attempt %d), retrying at %s: %s",
+                    len(delivery.alerts), delivery.channel_name, attempts, retry_at.isoformat(), error
+                )
+        finally:
+            db.close()
+
+
+def send_email(delivery: Delivery):
+    """Send a delivery as one email (blocking; runs in a worker thread)"""
+    if not settings.SMTP_HOST:
+        raise PermanentError("SMTP_HOST is not set")
+    message = EmailMessage()
+    message["Subject"] = summary(delivery.alerts)
+    message["From"] = settings.SMTP_FROM
+    message["To"] = ", ".join(address.strip() for address in delivery.target.split(","))
+    message.set_content(digest(delivery.alerts))
+    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.NOTIFICATION_TIMEOUT) as smtp:
+        if settings.SMTP_STARTTLS:
+            smtp.starttls()
+        if settings.SMTP_USERNAME:
+            smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD or "")
+        smtp.send_message(message)
@@ -0,0 +1,134 @@
+"""
+On-demand device polls with request coalescing.
+
+``PollCoordinator`` sits in front of ``SNMPCollector.poll_device`` for the
+poll API. Concurrent requests for the same device share one in-flight
+poll (single-flight), and the outcome of a poll, failures included, is
+served to later requests for ``POLL_MIN_INTERVAL`` seconds. However many
+dashboards hit refresh, a device sees at most one SNMP burst per
+interval; requests the current poll can't answer (other metric groups)
+are refused until the interval is over.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Tuple
+
+from ..core.config import settings
+from ..utils.snmp_profiles import METRIC_GROUPS
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """The device was polled too recently for this request."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Device polled too recently, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class PollResult:
+    """Outcome of one poll, shared by every request it answers."""
+
+    __slots__ = ("device_id", "groups", "data", "error", "polled_at", "completed")
+
+    def __init__(
+        self,
+        device_id: int,
+        groups: FrozenSet[str],
+        data: Optional[Dict[str, Any]] = None,
+        error: Optional[BaseException] = None
+    ):
+        self.device_id = device_id
+        self.groups = groups
+        self.data = data
+        self.error = error
+        self.polled_at = datetime.utcnow()
+        self.completed = time.monotonic()
+
+
+class PollCoordinator:
+    def __init__(
+        self,
+        poll: Callable[[int, FrozenSet[str]], Awaitable[Optional[Dict[str, Any]]]],
+        min_interval: float = None
+    ):
+        self._poll = poll
+        self.min_interval = settings.POLL_MIN_INTERVAL if min_interval is None else min_interval
+        self._inflight: Dict[int, Tuple[FrozenSet[str], asyncio.Future]] = {}
+        self._recent: Dict[int, PollResult] = {}
+
+    async def poll(self, device_id: int, groups: FrozenSet[str] = METRIC_GROUPS) -> Tuple[PollResult, bool]:
+        """
+        Poll a device, or join/reuse a poll that covers ``groups``.
+
+        Returns:
+            (result, shared): shared is True when another request's poll
+            answered this one
+
+        Raises ``RateLimited`` when the device was polled within the
+        interval for other groups. A failed poll's result carries the
+        error instead of raising it, so it can be shared too.
+        """
+        groups = frozenset(groups)
+        inflight = self._inflight.get(device_id)
+        if inflight is not None:
+            flight_groups, future = inflight
+            if groups <= flight_groups:
+                return await asyncio.shield(future), True
+            raise RateLimited(self.min_interval)
+
+        recent = self._recent.get(device_id)
+        if recent is not None:
+            age = time.monotonic() - recent.completed
+            if age < self.min_interval:
+                if groups <= recent.groups:
+                    return recent, True
+                raise RateLimited(self.min_interval - age)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[device_id] = (groups, future)
+        try:
+            try:
+                result = PollResult(device_id, groups, data=await self._poll(device_id, groups))
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                logger.debug("On-demand poll of device %s failed: %s", device_id, e)
+                result = PollResult(device_id, groups, error=e)
+            self._recent[device_id] = result
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._inflight[device_id]
+
+    def forget(self, device_id: int):
+        """Drop the cached result of a device, e.g. after its settings changed."""
+        self._recent.pop(device_id, None)
+
+
+_coordinator: Optional[PollCoordinator] = None
+
+
+def use_collector(collector):
+    """Serve on-demand polls with a running collector (in-process collection)."""
+    global _coordinator
+    _coordinator = PollCoordinator(collector.poll_device)
+
+
+def forget_device(device_id: int):
+    """Drop the cached poll of a device whose settings changed or that was deleted."""
+    if _coordinator is not None:
+        _coordinator.forget(device_id)
+
+
+def get_coordinator() -> PollCoordinator:
+    """The process-wide coordinator; without a running collector the API polls with its own."""
+    global _coordinator
+    if _coordinator is None:
+        from .collector import SNMPCollector
+        _coordinator = PollCoordinator(SNMPCollector().poll_device)
+    return _coordinator
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from .. import models
+from ..core import metrics
+from ..core.config import settings
+from ..utils.snmp import SNMPClient, SYS_UPTIME_OID
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeBackend:
+    """Cheap check of whether a device answers at all."""
+
+    async def probe(self, device: models.Device) -> bool:
+        raise NotImplementedError
+
+
+class SNMPProbe(ProbeBackend):
+    """
+    Single sysUpTime GET through pysnmp's asyncio API.
+
+    Unlike ``SNMPClient`` this needs no worker thread per request, so
+    thousands of probes can be in flight on one engine. Credentials come
+    from the collector's target cache and successful probes feed the
+    client's RTT estimates.
+    """
+
+    def __init__(self, client: SNMPClient, timeout: float = None, retries: int = None):
+        # Imported here: only needed when probing, and it pulls in the asyncio carrier
+        from pysnmp.hlapi import asyncio as snmp_asyncio
+        self._api = snmp_asyncio
+        self.client = client
+        self.timeout = timeout or settings.PROBE_TIMEOUT
+        self.retries = retries if retries is not None else settings.PROBE_RETRIES
+        self._engine = None
+        self._transports: Dict[tuple, object] = {}
+        self._var_bind = snmp_asyncio.ObjectType(snmp_asyncio.ObjectIdentity(SYS_UPTIME_OID))
+
+    def _transport(self, address: tuple):
+        transport = self._transports.get(address)
+        if transport is None:
+            transport = self._transports[address] = self._api.UdpTransportTarget(
+                address, timeout=self.timeout, retries=self.retries
+            )
+        return transport
+
+    async def probe(self, device: models.Device) -> bool:
+        api = self._api
+        if self._engine is None:
+            self._engine = api.SnmpEngine()
+        target = self.client.target(device)
+        transport = self._transport(target.address)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        metrics.SNMP_REQUESTS.labels(target.vendor).inc()
+        error_indication, _, _, _ = await api.getCmd(
+            self._engine, target.auth, transport, api.ContextData(),
+            self._var_bind, lookupMib=False
+        )
+        if error_indication:
+            metrics.SNMP_TIMEOUTS.labels(target.vendor).inc()
+            return False
+        # Any answer, even an SNMP error status, proves the agent is up
+        elapsed = loop.time() - start
+        self.client.rtt.observe(target.address, elapsed, self.timeout)
+        metrics.SNMP_RTT.labels(target.vendor).observe(elapsed)
+        return True
+
+
+class PingProbe(ProbeBackend):
+    """ICMP echo through the system ``ping`` binary (no raw socket privileges needed)."""
+
+    def __init__(self, client: SNMPClient = None, timeout: float = None):
+        self.timeout = timeout or settings.PROBE_TIMEOUT
+
+    async def probe(self, device: models.Device) -> bool:
+        process = await asyncio.create_subprocess_exec(
+            "ping", "-c", "1", "-W", str(max(1, round(self.timeout))), device.ip_address,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        return await process.wait() == 0
+
+
+PROBE_BACKENDS = {
+    "snmp": SNMPProbe,
+    "ping": PingProbe,
+}
+
+
+class ReachabilitySweep:
+    """Probe a whole fleet concurrently and split it into up and down devices."""
+
+    def __init__(self, backend: ProbeBackend, concurrency: int = None):
+        self.backend = backend
+        self.concurrency = concurrency or settings.PROBE_CONCURRENCY
+
+    @classmethod
+    def from_settings(cls, client: SNMPClient) -> "ReachabilitySweep":
+        backend = PROBE_BACKENDS[settings.PROBE_BACKEND](client)
+        return cls(backend)
+
+    async def run(
+        self,
+        devices: Sequence[models.Device]
+    ) -> Tuple[List[models.Device], List[models.Device]]:
+        """
+        Probe every device.
+
+        Returns:
+            (reachable, unreachable) device lists, each in input order
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(device: models.Device) -> bool:
+            async with semaphore:
+                try:
+                    return await self.backend.probe(device)
+                except Exception as e:
+                    logger.debug("Probe of device %s failed: %s", device.id, e)
+                    return False
+
+        results = await asyncio.gather(*(probe(device) for device in devices))
+        reachable = [d for d, ok in zip(devices, results) if ok]
+        unreachable = [d for d, ok in zip(devices, results) if not ok]
+        return reachable, unreachable
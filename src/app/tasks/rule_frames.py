@@ -0,0 +1,121 @@
+"""
+Metric frames for alert rule evaluation.
+
+A frame is the view of one scope (devices or interfaces) for one
+evaluation pass: the series ids in a fixed order, and the ``value`` and
+``window`` lookups of compiled rules (see utils/rule_expr.py) answered
+as arrays in that order from the window state (see tasks/windows.py).
+Interface frames also carry the interface attributes and see device
+metrics through the interface's device.
+"""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..crud import crud_device as crud
+from ..utils.rule_expr import DEVICE_METRICS, INTERFACE_ATTRIBUTES
+from .windows import SeriesWindows, WindowStore, float_column
+
+
+class SeriesFrame:
+    """One scope as of ``now``, one row per series id."""
+
+    def __init__(self, ids: np.ndarray, windows: SeriesWindows, now: float, stale_after: float):
+        self.ids = np.asarray(ids, np.int64)  # sorted
+        self.windows = windows
+        self.now = now
+        self.stale_after = stale_after
+        self.rows = windows.lookup(self.ids.tolist())
+        self._cache: Dict[tuple, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def device_ids(self) -> np.ndarray:
+        return self.ids
+
+    def value(self, name: str) -> np.ndarray:
+        """Latest sample of each series, NaN when missing or older than ``stale_after``."""
+        key = ("value", name)
+        if key not in self._cache:
+            self._cache[key] = self.windows.latest(name, self.rows, self.now - self.stale_after)
+        return self._cache[key]
+
+    def sampled_at(self) -> np.ndarray:
+        """Time of each series' newest sample (NaN for none)."""
+        return self.windows.latest_timestamp(self.rows)
+
+    def window(self, func: str, name: str, seconds: float) -> np.ndarray:
+        """Aggregate of each series' samples in the last ``seconds``."""
+        key = (func, name, seconds)
+        if key not in self._cache:
+            self._cache[key] = self.windows.aggregate(func, name, seconds, self.rows, self.now)
+        return self._cache[key]
+
+
+class InterfaceFrame(SeriesFrame):
+    """Interfaces with their attributes; device metrics come from ``devices``."""
+
+    def __init__(
+        self,
+        attributes: Sequence[tuple],
+        windows: SeriesWindows,
+        devices: Optional[SeriesFrame],
+        now: float,
+        stale_after: float
+    ):
+        attributes = sorted(attributes)
+        ids, device_ids, if_indexes, names, *values = zip(*attributes) if attributes else ((),) * (4 + len(INTERFACE_ATTRIBUTES))
+        super().__init__(np.array(ids, np.int64), windows, now, stale_after)
+        self._device_ids = np.array(device_ids, np.int64)
+        self.if_indexes = list(if_indexes)
+        self.names = list(names)
+        self.attributes = {name: float_column(column) for name, column in zip(INTERFACE_ATTRIBUTES, values)}
+        self.devices = devices
+        if devices is not None and len(devices):
+            positions = np.minimum(np.searchsorted(devices.ids, self._device_ids), len(devices) - 1)
+            self._device_rows = np.where(devices.ids[positions] == self._device_ids, positions, -1)
+        else:
+            self._device_rows = np.full(len(self.ids), -1)
+
+    @property
+    def device_ids(self) -> np.ndarray:
+        return self._device_ids
+
+    def _broadcast(self, values: np.ndarray) -> np.ndarray:
+        out = np.full(len(self), np.nan)
+        mapped = self._device_rows >= 0
+        out[mapped] = values[self._device_rows[mapped]]
+        return out
+
+    def value(self, name: str) -> np.ndarray:
+        if name in self.attributes:
+            return self.attributes[name]
+        if name in DEVICE_METRICS:
+            return self._broadcast(self.devices.value(name))
+        return super().value(name)
+
+    def window(self, func: str, name: str, seconds: float) -> np.ndarray:
+        if name in DEVICE_METRICS:
+            return self._broadcast(self.devices.window(func, name, seconds))
+        return super().window(func, name, seconds)
+
+
+def load_frames(db: Session, store: WindowStore, now: float, stale_after: float, interfaces: bool = True) -> Dict[str, SeriesFrame]:
+    """
+    Frames of both scopes from the window state, advanced to ``now``.
+
+    Devices are the ones with samples; interfaces are read from the
+    database (attributes, not history) only when ``interfaces`` rules exist.
+    """
+    for windows in store.scopes.values():
+        windows.advance(now)
+    device_windows = store.scopes["device"]
+    devices = SeriesFrame(np.sort(device_windows.ids[:device_windows.size]), device_windows, now, stale_after)
+    attributes = crud.get_interface_attributes(db) if interfaces else ()
+    return {
+        "device": devices,
+        "interface": InterfaceFrame(attributes, store.scopes["interface"], devices, now, stale_after),
+    }
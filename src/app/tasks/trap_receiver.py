@@ -0,0 +1,297 @@
+"""
+SNMPv2c trap and inform receiver.
+
+Listens on UDP ``TRAP_PORT`` with an asyncio datagram endpoint. Each
+notification is decoded, matched to a ``Device`` by source address
+through an in-memory index (reloaded every ``TRAP_DEVICE_REFRESH``
+seconds) and checked against the device's community. Informs are
+acknowledged right away.
+
+linkDown, linkUp, coldStart and warmStart become ``AlertEvent`` rows
+without a rule and are pushed to the WebSocket feed as they are written;
+link traps also set the interface's oper status. The device is then
+re-polled at once, so state changes are picked up when they happen
+rather than at the next collection cycle.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..core import metrics
+from ..core.config import settings
+from ..crud import crud_device as crud
+from ..crud.crud_alert import create_alert_events
+from ..database import SessionLocal
+from ..utils.oid import OID, format_oid, parse_oid
+from ..utils.snmp import python_value
+
+logger = logging.getLogger(__name__)
+
+SNMP_TRAP_OID = (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0)
+SYS_UPTIME_INSTANCE = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+IF_INDEX = (1, 3, 6, 1, 2, 1, 2, 2, 1, 1)
+IF_DESCR = (1, 3, 6, 1, 2, 1, 2, 2, 1, 2)
+IF_OPER_STATUS = (1, 3, 6, 1, 2, 1, 2, 2, 1, 8)
+IF_NAME = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1)
+
+# SNMPv2-MIB standard notifications: name, alert severity
+LINK_DOWN = (1, 3, 6, 1, 6, 3, 1, 1, 5, 3)
+LINK_UP = (1, 3, 6, 1, 6, 3, 1, 1, 5, 4)
+TRAPS = {
+    (1, 3, 6, 1, 6, 3, 1, 1, 5, 1): ("coldStart", "warning"),
+    (1, 3, 6, 1, 6, 3, 1, 1, 5, 2): ("warmStart", "warning"),
+    LINK_DOWN: ("linkDown", "critical"),
+    LINK_UP: ("linkUp", "info"),
+}
+
+
+@lru_cache(maxsize=None)
+def _proto():
+    """pysnmp's message layer, imported on first use."""
+    from pyasn1.codec.ber import decoder, encoder
+    from pysnmp.proto import api
+    return api, api.protoModules[api.protoVersion2c], decoder, encoder
+
+
+class Notification:
+    """A decoded SNMPv2c trap or inform."""
+
+    __slots__ = ("community", "inform", "var_binds", "message")
+
+    def __init__(self, community: str, inform: bool, var_binds: List[Tuple[OID, Any]], message):
+        self.community = community
+        self.inform = inform
+        self.var_binds = var_binds
+        self.message = message
+
+    @property
+    def trap_oid(self) -> Optional[OID]:
+        for oid, value in self.var_binds:
+            if oid == SNMP_TRAP_OID and value:
+                return parse_oid(value)
+        return None
+
+    def column(self, column: OID) -> Optional[Tuple[OID, Any]]:
+        """(row index, value) of the first varbind in a table column."""
+        for oid, value in self.var_binds:
+            if oid[:len(column)] == column and len(oid) > len(column):
+                return oid[len(column):], value
+        return None
+
+    def response(self) -> bytes:
+        """The Response PDU acknowledging an inform."""
+        _, v2c, _, encoder = _proto()
+        response = v2c.apiMessage.getResponse(self.message)
+        v2c.apiPDU.setVarBinds(
+            v2c.apiMessage.getPDU(response),
+            v2c.apiPDU.getVarBinds(v2c.apiMessage.getPDU(self.message))
+        )
+        return encoder.encode(response)
+
+
+def decode_notification(data: bytes) -> Optional[Notification]:
+    """Decode a datagram; None for other SNMP versions and PDU types."""
+    api, v2c, decoder, _ = _proto()
+    if int(api.decodeMessageVersion(data)) != api.protoVersion2c:
+        return None
+    message, _ = decoder.decode(data, asn1Spec=v2c.Message())
+    pdu = v2c.apiMessage.getPDU(message)
+    inform = pdu.isSameTypeWith(v2c.InformRequestPDU())
+    if not inform and not pdu.isSameTypeWith(v2c.SNMPv2TrapPDU()):
+        return None
+    var_binds = [(tuple(oid), python_value(value)) for oid, value in v2c.apiPDU.getVarBinds(pdu)]
+    return Notification(str(v2c.apiMessage.getCommunity(message)), inform, var_binds, message)
+
+
+class SourceIndex:
+    """Trap source address -> (device id, expected community)."""
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def load(self, rows):
+        """Rebuild from (id, ip_address, snmp_version, snmp_community) rows."""
+        self._sources = {
+            ip_address: (device_id, community or settings.SNMP_COMMUNITY)
+            for device_id, ip_address, version, community in rows
+            if version != "3"
+        }
+
+    def get(self, address: str) -> Optional[Tuple[int, str]]:
+        return self._sources.get(address)
+
+
+class TrapProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: "TrapReceiver"):
+        self.receiver = receiver
+
+    def connection_made(self, transport):
+        self.receiver.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.receiver.handle(data, addr)
+
+
+class TrapReceiver:
+    def __init__(self, repoll: Optional[Callable[[int], Awaitable[Any]]] = None):
+        self.repoll = repoll if settings.TRAP_REPOLL else None
+        self.sources = SourceIndex()
+        self.transport = None
+        self.queue: Optional[asyncio.Queue] = None  # created on the receiver's loop
+        self._repolling: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def refresh(self):
+        """Reload the source address index from the devices table."""
+        db = SessionLocal()
+        try:
+            self.sources.load(crud.get_trap_sources(db))
+        finally:
+            db.close()
+
+    async def start(self, host: str = None, port: int = None):
+        """Listen for notifications until cancelled."""
+        host = host or settings.TRAP_HOST
+        port = port or settings.TRAP_PORT
+        self.refresh()
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_datagram_endpoint(lambda: TrapProtocol(self), local_addr=(host, port))
+        except OSError as e:
+            logger.error("Cannot listen for SNMP traps on %s:%s: %s", host, port, e)
+            return
+        logger.info("Listening for SNMP traps on %s:%s (%d devices)", host, port, len(self.sources))
+        writer = asyncio.create_task(self._write_events())
+        try:
+            while True:
+                await asyncio.sleep(settings.TRAP_DEVICE_REFRESH)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning("Could not reload trap sources: %s", e)
+        finally:
+            writer.cancel()
+            if self.transport is not None:
+                self.transport.close()
+
+    def handle(self, data: bytes, addr: Tuple[str, int]):
+        """Decode, authenticate and acknowledge one datagram, then queue its event."""
+        try:
+            notification = decode_notification(data)
+        except Exception as e:
+            metrics.SNMP_TRAPS.labels("malformed").inc()
+            logger.debug("Malformed SNMP datagram from %s: %s", addr[0], e)
+            return
+        if notification is None:
+            metrics.SNMP_TRAPS.labels("ignored").inc()
+            return
+        source = self.sources.get(addr[0])
+        if source is None:
+            metrics.SNMP_TRAPS.labels("unknown_source").inc()
+            logger.debug("SNMP notification from unknown source %s", addr[0])
+            return
+        device_id, community = source
+        if notification.community != community:
+            metrics.SNMP_TRAPS.labels("bad_community").inc()
+            logger.warning("SNMP notification from %s with wrong community", addr[0])
+            return
+        if notification.inform and self.transport is not None:
+            self.transport.sendto(notification.response(), addr)
+
+        trap_oid = notification.trap_oid
+        if trap_oid not in TRAPS:
+            metrics.SNMP_TRAPS.labels("unhandled").inc()
+            logger.debug("Unhandled notification %s from device %s", trap_oid and format_oid(trap_oid), device_id)
+            return
+        metrics.SNMP_TRAPS.labels("accepted").inc()
+        self.queue.put_nowait((device_id, addr[0], trap_oid, notification, datetime.utcnow()))
+        if self.repoll is not None:
+            self._schedule_repoll(device_id)
+
+    def _schedule_repoll(self, device_id: int):
+        # One poll in flight per device; a burst of traps needs only one
+        if device_id in self._repolling:
+            return
+        self._repolling.add(device_id)
+        task = asyncio.get_running_loop().create_task(self._repoll(device_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _repoll(self, device_id: int):
+        try:
+            await self.repoll(device_id)
+        except Exception as e:
+            logger.warning("Re-poll of device %s after trap failed: %s", device_id, e)
+        finally:
+            self._repolling.discard(device_id)
+
+    async def _write_events(self, batch_size: int = 500):
+        """Write queued notifications, everything queued so far in one commit."""
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                self.write_events(batch)
+            except Exception as e:
+                logger.error("Could not store %d SNMP notifications: %s", len(batch), e, exc_info=True)
+
+    def write_events(self, batch: List[Tuple[int, str, OID, Notification, datetime]]):
+        db = SessionLocal()
+        try:
+            names = crud.get_interface_names(
+                db, list({device_id for device_id, _, trap_oid, _, _ in batch if trap_oid in (LINK_DOWN, LINK_UP)})
+            )
+            rows, oper_status = [], []
+            for device_id, address, trap_oid, notification, received_at in batch:
+                trap, severity = TRAPS[trap_oid]
+                extra = {
+                    "source": "trap",
+                    "trap": trap,
+                    "trap_oid": format_oid(trap_oid),
+                    "address": address,
+                    "varbinds": {format_oid(oid): value for oid, value in notification.var_binds},
+                }
+                if trap_oid in (LINK_DOWN, LINK_UP):
+                    if_index = self._if_index(notification)
+                    up = trap_oid == LINK_UP
+                    name = notification.column(IF_NAME) or notification.column(IF_DESCR)
+                    name = name[1] if name else names.get((device_id, if_index))
+                    subject = name or (f"ifIndex {if_index}" if if_index is not None else "unknown interface")
+                    message = f"{trap}: {subject}"
+                    value = 1 if up else 2  # ifOperStatus up(1) / down(2)
+                    extra["if_index"] = if_index
+                    if if_index is not None:
+                        oper_status.append((device_id, if_index, up))
+                else:
+                    uptime = notification.column(SYS_UPTIME_INSTANCE[:-1])
+                    message = f"{trap}: device restarted"
+                    value = uptime[1] / 100 if uptime and isinstance(uptime[1], int) else 0  # seconds
+                rows.append({
+                    "rule_id": None,
+                    "device_id": device_id,
+                    "timestamp": received_at,
+                    "value": value,
+                    "message": message,
+                    "severity": severity,
+                    "extra": extra,
+                })
+            crud.set_interface_oper_status(db, oper_status)
+            create_alert_events(db, rows)
+            logger.debug("Stored %d SNMP notifications", len(rows))
+        finally:
+            db.close()
+
+    @staticmethod
+    def _if_index(notification: Notification) -> Optional[int]:
+        for column in (IF_INDEX, IF_OPER_STATUS):
+            hit = notification.column(column)
+            if hit is not None and len(hit[0]) == 1:
+                return hit[0][0]
+        return None
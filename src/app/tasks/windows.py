@@ -0,0 +1,291 @@
+"""
+Sliding-window state for alert rules.
+
+``WindowStore`` keeps, per scope (devices, interfaces), the recent samples
+of the metrics the enabled rules read in ring buffers: one NumPy row per
+series, ``capacity`` slots per row. Every (metric, window length) a rule
+uses also has running sums and counts per series. A new sample adds to
+them and a sample leaving the window (or the ring) is subtracted, so
+count/sum/avg and delta/rate cost O(1) per sample whatever the window
+length; min/max scan the bounded ring.
+
+The store is fed from the ingest stream (``samples.ingested``, emitted by
+the collector as it writes samples, relayed over Redis when the
+evaluator runs as its own process). It is rebuilt from recent history
+when it starts or when the rules need metrics or windows it doesn't
+track yet, so the evaluator no longer queries sample history per pass.
+"""
+import calendar
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..crud import crud_device as crud
+from ..utils.rule_expr import DEVICE_METRICS, INTERFACE_METRICS, CompiledRule
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("device", "interface")
+
+Window = Tuple[str, float]  # (metric, seconds)
+
+
+def epoch_seconds(timestamps: Sequence[datetime]) -> np.ndarray:
+    """Epoch seconds of naive (UTC) or aware datetimes."""
+    return np.fromiter(
+        (calendar.timegm(t.utctimetuple()) + t.microsecond / 1e6 for t in timestamps),
+        np.float64, len(timestamps)
+    )
+
+
+def float_column(values: Sequence) -> np.ndarray:
+    """Float column with NaN for NULL."""
+    return np.array([np.nan if value is None else value for value in values], np.float64)
+
+
+class SeriesWindows:
+    """Ring buffers and running window sums of one scope, one row per series id."""
+
+    def __init__(self, metrics: Iterable[str] = (), windows: Iterable[Window] = (), capacity: int = 1):
+        self.metrics = tuple(sorted(set(metrics)))
+        self.windows = tuple(sorted(set(windows)))
+        self.capacity = max(1, capacity)
+        self.rows: Dict[int, int] = {}
+        self.size = 0
+        self._allocate(0)
+
+    def _allocate(self, series: int):
+        shape = (series, self.capacity)
+        self.ids = np.zeros(series, np.int64)
+        self.head = np.zeros(series, np.int64)  # next slot to write
+        self.count = np.zeros(series, np.int64)  # samples in the ring
+        self.timestamps = np.full(shape, np.nan)
+        self.values = {name: np.full(shape, np.nan) for name in self.metrics}
+        # Per window: sum and count of non-NaN values, samples (NaN included) in the window
+        self.sums = {window: np.zeros(series) for window in self.windows}
+        self.counts = {window: np.zeros(series, np.int64) for window in self.windows}
+        self.spans = {window: np.zeros(series, np.int64) for window in self.windows}
+
+    def _grow(self, needed: int):
+        old = {
+            "ids": self.ids, "head": self.head, "count": self.count, "timestamps": self.timestamps,
+            "values": self.values, "sums": self.sums, "counts": self.counts, "spans": self.spans,
+        }
+        self._allocate(max(needed, 2 * len(self.ids), 1024))
+        for name, arrays in old.items():
+            if isinstance(arrays, dict):
+                for key, array in arrays.items():
+                    getattr(self, name)[key][:len(array)] = array
+            else:
+                getattr(self, name)[:len(arrays)] = arrays
+
+    def lookup(self, ids: Sequence[int], create: bool = False) -> np.ndarray:
+        """Rows of series ids, -1 for unknown ones unless ``create``."""
+        rows = np.fromiter((self.rows.get(key, -1) for key in ids), np.int64, len(ids))
+        if create and (rows < 0).any():
+            for i in np.flatnonzero(rows < 0).tolist():
+                key = int(ids[i])
+                row = self.rows.get(key)
+                if row is None:
+                    row = self.rows[key] = self.size
+                    self.size += 1
+                rows[i] = row
+            if self.size > len(self.ids):
+                self._grow(self.size)
+            self.ids[rows] = ids
+        return rows
+
+    def append(self, ids: Sequence[int], timestamps: np.ndarray, columns: Dict[str, np.ndarray]):
+        """Add samples; samples not newer than their series' latest are ignored."""
+        if not self.metrics or not len(ids):
+            return
+        rows = self.lookup(ids, create=True)
+        order = np.lexsort((timestamps, rows))
+        rows, timestamps = rows[order], timestamps[order]
+        columns = {name: columns[name][order] for name in self.metrics}
+        # Rank of each sample within its series; round k appends every k-th sample
+        starts = np.r_[0, np.flatnonzero(rows[1:] != rows[:-1]) + 1]
+        rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        for k in range(int(rank.max()) + 1):
+            selected = rank == k
+            self._append_unique(rows[selected], timestamps[selected], {
+                name: values[selected] for name, values in columns.items()
+            })
+
+    def _append_unique(self, rows: np.ndarray, timestamps: np.ndarray, columns: Dict[str, np.ndarray]):
+        capacity = self.capacity
+        latest = self.timestamps[rows, (self.head[rows] - 1) % capacity]
+        fresh = (self.count[rows] == 0) | (timestamps > latest)
+        if not fresh.all():
+            rows, timestamps = rows[fresh], timestamps[fresh]
+            columns = {name: values[fresh] for name, values in columns.items()}
+        slots = self.head[rows]
+        full = self.count[rows] == capacity
+        for window in self.windows:
+            # The overwritten slot is the oldest sample; drop it from windows still holding it
+            evicted = full & (self.spans[window][rows] == capacity)
+            if evicted.any():
+                self._remove(window, rows[evicted], self.values[window[0]][rows[evicted], slots[evicted]])
+        self.timestamps[rows, slots] = timestamps
+        for name, values in columns.items():
+            self.values[name][rows, slots] = values
+        for window in self.windows:
+            values = columns[window[0]]
+            valid = ~np.isnan(values)
+            self.sums[window][rows] += np.where(valid, values, 0.0)
+            self.counts[window][rows] += valid
+            self.spans[window][rows] += 1
+        self.head[rows] = (slots + 1) % capacity
+        self.count[rows] = np.minimum(self.count[rows] + 1, capacity)
+
+    def _remove(self, window: Window, rows: np.ndarray, values: np.ndarray):
+        valid = ~np.isnan(values)
+        self.sums[window][rows] -= np.where(valid, values, 0.0)
+        self.counts[window][rows] -= valid
+        self.spans[window][rows] -= 1
+        # An empty window restarts its sum from zero, shedding rounding drift
+        emptied = rows[self.counts[window][rows] == 0]
+        self.sums[window][emptied] = 0.0
+
+    def advance(self, now: float):
+        """Drop samples that left their windows; each sample is dropped once."""
+        capacity = self.capacity
+        for window in self.windows:
+            name, seconds = window
+            cutoff = now - seconds
+            spans = self.spans[window]
+            rows = np.flatnonzero(spans[:self.size] > 0)
+            while len(rows):
+                tails = (self.head[rows] - spans[rows]) % capacity
+                expired = self.timestamps[rows, tails] < cutoff
+                rows, tails = rows[expired], tails[expired]
+                if not len(rows):
+                    break
+                self._remove(window, rows, self.values[name][rows, tails])
+                rows = rows[spans[rows] > 0]
+
+    def latest(self, name: str, rows: np.ndarray, since: float) -> np.ndarray:
+        """Newest sample of each row if taken since ``since``, else NaN (also for row -1)."""
+        out = np.full(len(rows), np.nan)
+        known = np.flatnonzero(rows >= 0)
+        rows = rows[known]
+        slots = (self.head[rows] - 1) % self.capacity
+        recent = (self.count[rows] > 0) & (self.timestamps[rows, slots] >= since)
+        out[known[recent]] = self.values[name][rows[recent], slots[recent]]
+        return out
+
+    def latest_timestamp(self, rows: np.ndarray) -> np.ndarray:
+        """Time of the newest sample of each row, NaN for none (and row -1)."""
+        out = np.full(len(rows), np.nan)
+        known = np.flatnonzero(rows >= 0)
+        rows = rows[known]
+        slots = (self.head[rows] - 1) % self.capacity
+        out[known] = np.where(self.count[rows] > 0, self.timestamps[rows, slots], np.nan)
+        return out
+
+    def aggregate(self, func: str, name: str, seconds: float, rows: np.ndarray, now: float) -> np.ndarray:
+        """Window aggregate per row as of the last ``advance``; NaN for row -1."""
+        out = np.full(len(rows), np.nan)
+        known = np.flatnonzero(rows >= 0)
+        rows = rows[known]
+        window = (name, seconds)
+        if func in ("count", "sum", "avg"):
+            counts = self.counts[window][rows].astype(np.float64)
+            sums = self.sums[window][rows]
+            if func == "avg":
+                sums = np.divide(sums, counts, out=np.full(len(rows), np.nan), where=counts > 0)
+            out[known] = counts if func == "count" else sums
+        elif func in ("min", "max"):
+            inside = self.timestamps[rows] >= now - seconds
+            fill = np.inf if func == "min" else -np.inf
+            values = np.where(inside & ~np.isnan(self.values[name][rows]), self.values[name][rows], fill)
+            result = values.min(axis=1) if func == "min" else values.max(axis=1)
+            result[np.isinf(result)] = np.nan
+            out[known] = result
+        else:
+            spans = self.spans[window][rows]
+            newest = (self.head[rows] - 1) % self.capacity
+            oldest = (self.head[rows] - spans) % self.capacity
+            values = self.values[name]
+            delta = values[rows, newest] - values[rows, oldest]
+            if func == "rate":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    delta = delta / (self.timestamps[rows, newest] - self.timestamps[rows, oldest])
+            delta[(spans < 2) | (delta < 0)] = np.nan  # a single sample, or a counter reset
+            out[known] = delta
+        return out
+
+
+def _scope(name: str) -> str:
+    return "device" if name in DEVICE_METRICS else "interface"
+
+
+class WindowStore:
+    """Window state of both scopes, shaped by the enabled rules."""
+
+    def __init__(self):
+        self.scopes: Dict[str, SeriesWindows] = {scope: SeriesWindows() for scope in SCOPES}
+        self.spec: Optional[dict] = None
+
+    def requirements(self, rules: Iterable[CompiledRule], stale_after: float) -> dict:
+        """Metrics, windows, ring capacity and history lookback per scope."""
+        metrics = {scope: set() for scope in SCOPES}
+        windows = {scope: set() for scope in SCOPES}
+        for rule in rules:
+            for name in rule.metrics:
+                metrics[_scope(name)].add(name)
+            for _, name, seconds in rule.windows:
+                windows[_scope(name)].add((name, seconds))
+        spec = {}
+        for scope in SCOPES:
+            longest = max((seconds for _, seconds in windows[scope]), default=0.0)
+            # Room for two samples per collection interval, e.g. on-demand polls in between
+            capacity = 2 * math.ceil(longest / settings.COLLECTOR_INTERVAL) + 2 if longest else 1
+            spec[scope] = {
+                "metrics": tuple(sorted(metrics[scope])),
+                "windows": tuple(sorted(windows[scope])),
+                "capacity": min(capacity, settings.ALERT_WINDOW_SAMPLES),
+                "lookback": max(longest, stale_after) if metrics[scope] else 0.0,
+            }
+        return spec
+
+    def configure(self, db: Session, rules: Iterable[CompiledRule], now: float, stale_after: float) -> bool:
+        """Match the state to the rules; rebuilds from history when they changed what is tracked."""
+        spec = self.requirements(rules, stale_after)
+        if spec == self.spec:
+            return False
+        self.spec = spec
+        self.rebuild(db, now)
+        return True
+
+    def rebuild(self, db: Session, now: float):
+        """Reload every scope from the samples of its lookback."""
+        for scope, loader in (("device", crud.get_device_metric_samples), ("interface", crud.get_interface_metric_samples)):
+            spec = self.spec[scope]
+            windows = self.scopes[scope] = SeriesWindows(spec["metrics"], spec["windows"], spec["capacity"])
+            if not spec["metrics"]:
+                continue
+            rows = loader(db, datetime.utcfromtimestamp(now - spec["lookback"]))
+            if rows:
+                names = DEVICE_METRICS if scope == "device" else INTERFACE_METRICS
+                ids, timestamps, *values = zip(*rows)
+                windows.append(ids, epoch_seconds(timestamps), {
+                    name: float_column(column) for name, column in zip(names, values) if name in windows.metrics
+                })
+            logger.info("Rebuilt %s alert windows from %d samples of %d series", scope, len(rows), windows.size)
+
+    def ingest(self, scope: str, columns: Dict[str, list]):
+        """``samples.ingested`` handler: add a batch of samples to its scope."""
+        windows = self.scopes.get(scope)
+        if windows is None or not windows.metrics:
+            return
+        windows.append(
+            columns["id"],
+            np.asarray(columns["timestamp"], np.float64),
+            {name: float_column(columns[name]) for name in windows.metrics},
+        )
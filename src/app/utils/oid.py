@@ -0,0 +1,107 @@
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+OID = Tuple[int, ...]
+
+
+def parse_oid(oid: Union[str, Iterable[int]]) -> OID:
+    """Parse a dotted OID ("1.3.6.1.2.1.1.3.0", leading dot allowed) into a tuple of ints."""
+    if isinstance(oid, str):
+        try:
+            return tuple(int(part) for part in oid.strip().lstrip(".").split("."))
+        except ValueError:
+            raise ValueError(f"Invalid OID: {oid!r}") from None
+    return tuple(oid)
+
+
+def format_oid(oid: OID) -> str:
+    """Dotted string form of an OID tuple."""
+    return ".".join(map(str, oid))
+
+
+def is_prefix(prefix: OID, oid: OID) -> bool:
+    """True when ``oid`` lies in the subtree rooted at ``prefix``."""
+    return oid[:len(prefix)] == prefix
+
+
+class _Node:
+    __slots__ = ("edges", "value", "terminal")
+
+    def __init__(self):
+        # First arc of an edge -> (edge label, child); labels are whole runs
+        # of arcs, so the shared 1.3.6.1.2.1... prefixes cost one comparison
+        self.edges: Dict[int, Tuple[OID, "_Node"]] = {}
+        self.value: Any = None
+        self.terminal = False
+
+
+class OidTrie:
+    """
+    Map OID prefixes to values, e.g. table columns to the code handling them.
+
+    A path-compressed (radix) trie: ``match`` follows a handful of edges,
+    comparing each edge's run of arcs as a tuple slice, and returns the
+    value of the longest registered prefix together with the remaining
+    arcs (the row index for a column), with no string formatting or
+    splitting.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, items: Iterable[Tuple[OID, Any]] = ()):
+        self._root = _Node()
+        self._size = 0
+        for prefix, value in items:
+            self.insert(prefix, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, prefix: OID, value: Any):
+        prefix = tuple(prefix)
+        node = self._root
+        position = 0
+        while position < len(prefix):
+            edge = node.edges.get(prefix[position])
+            if edge is None:
+                child = _Node()
+                node.edges[prefix[position]] = (prefix[position:], child)
+                node = child
+                break
+            label, child = edge
+            rest = prefix[position:]
+            common = 0
+            while common < len(label) and common < len(rest) and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the new prefix diverges from it
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[prefix[position]] = (label[:common], middle)
+                child = middle
+            node = child
+            position += common
+        if not node.terminal:
+            self._size += 1
+        node.value = value
+        node.terminal = True
+
+    def match(self, oid: OID) -> Optional[Tuple[Any, OID]]:
+        """(value, suffix) for the longest registered prefix of ``oid``, or None."""
+        node = self._root
+        found = (node.value, 0) if node.terminal else None
+        position = 0
+        length = len(oid)
+        while position < length:
+            edge = node.edges.get(oid[position])
+            if edge is None:
+                break
+            label, node = edge
+            end = position + len(label)
+            if oid[position:end] != label:
+                break
+            position = end
+            if node.terminal:
+                found = node.value, position
+        if found is None:
+            return None
+        return found[0], oid[found[1]:]
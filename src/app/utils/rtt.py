@@ -0,0 +1,154 @@
+import math
+from typing import Dict, Hashable, Tuple
+
+from ..core.config import settings
+
+# RFC 6298 smoothing factors
+ALPHA = 0.125
+BETA = 0.25
+K = 4
+
+# Timeouts are rounded onto a geometric grid so pysnmp's per-engine target
+# cache (keyed by timeout and retries) stays bounded.
+_GRID_BASE = 0.01
+_GRID_STEP = 1.25
+
+
+def _quantize(timeout: float) -> float:
+    steps = math.ceil(math.log(max(timeout, _GRID_BASE) / _GRID_BASE, _GRID_STEP))
+    return round(_GRID_BASE * _GRID_STEP ** steps, 2)
+
+
+class RTTEstimate:
+    """Smoothed RTT and RTT variance of one agent, TCP-RTO style."""
+
+    __slots__ = ("srtt", "rttvar", "backoff")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.backoff = 1
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.backoff = 1
+
+    def rto(self, initial: float) -> float:
+        if self.srtt is None:
+            return initial * self.backoff
+        return (self.srtt + max(0.01, K * self.rttvar)) * self.backoff
+
+
+class RTTEstimator:
+    """
+    Per-agent adaptive timeouts and retries.
+
+    Each agent gets a retransmission timeout derived from its observed RTT
+    (EWMA plus variance, RFC 6298), doubled on every timeout until a new
+    sample arrives. Retries are sized so that one request never waits
+    longer than ``SNMP_TIMEOUT`` in total: a LAN switch answering in 2ms
+    gets several quick retries, a slow or silent one gets few or none.
+    """
+
+    def __init__(
+        self,
+        initial: float = None,
+        minimum: float = None,
+        maximum: float = None,
+        max_retries: int = None
+    ):
+        self.initial = initial or settings.SNMP_INITIAL_TIMEOUT
+        self.minimum = minimum or settings.SNMP_MIN_TIMEOUT
+        self.maximum = maximum or settings.SNMP_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else settings.SNMP_RETRIES
+        self._estimates: Dict[Hashable, RTTEstimate] = {}
+
+    def _estimate(self, key: Hashable) -> RTTEstimate:
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            estimate = self._estimates[key] = RTTEstimate()
+        return estimate
+
+    def timeout_and_retries(self, key: Hashable) -> Tuple[float, int]:
+        """Get the per-attempt timeout and retry count for an agent."""
+        rto = self._estimate(key).rto(self.initial)
+        timeout = min(_quantize(max(rto, self.minimum)), self.maximum)
+        retries = min(self.max_retries, max(0, int(self.maximum // timeout) - 1))
+        return timeout, retries
+
+    def observe(self, key: Hashable, rtt: float, timeout: float):
+        """Record a successful request that took ``rtt`` seconds."""
+        # Karn's rule: a response that arrived after a retransmission is
+        # ambiguous, so it does not update the estimate
+        if rtt <= timeout:
+            self._estimate(key).sample(rtt)
+
+    def timed_out(self, key: Hashable):
+        """Record a request that got no response at all."""
+        estimate = self._estimate(key)
+        if estimate.rto(self.initial) < self.maximum:
+            estimate.backoff *= 2
+
+    def srtt(self, key: Hashable):
+        """Smoothed RTT of an agent in seconds, or None if never measured."""
+        estimate = self._estimates.get(key)
+        return estimate.srtt if estimate else None
+
+    def forget(self, key: Hashable):
+        self._estimates.pop(key, None)
+
+
+class RetryBudget:
+    """
+    Number of SNMP retransmissions allowed per collection cycle.
+
+    Requests reserve their retries up front; once the budget is spent,
+    further requests get a single attempt, so a cycle with many dead
+    agents can't spend its time retransmitting to them.
+    """
+
+    def __init__(self, total: int = None):
+        self.total = total if total is not None else settings.SNMP_RETRY_BUDGET
+        self.remaining = self.total
+
+    def reset(self):
+        self.remaining = self.total
+
+    def reserve(self, retries: int) -> int:
+        granted = min(retries, self.remaining)
+        self.remaining -= granted
+        return granted
+
+    def refund(self, retries: int):
+        self.remaining = min(self.total, self.remaining + retries)
+
+
+class CircuitBreaker:
+    """
+    Skip devices that failed several collection cycles in a row.
+
+    After ``threshold`` consecutive failed cycles a device is open: the
+    collector only sends it a cheap probe, and closes the breaker again
+    once the probe succeeds.
+    """
+
+    def __init__(self, threshold: int = None):
+        self.threshold = threshold or settings.SNMP_BREAKER_THRESHOLD
+        self._failures: Dict[Hashable, int] = {}
+
+    def is_open(self, key: Hashable) -> bool:
+        return self._failures.get(key, 0) >= self.threshold
+
+    def record(self, key: Hashable, ok: bool):
+        if ok:
+            self._failures.pop(key, None)
+        else:
+            self._failures[key] = self._failures.get(key, 0) + 1
+
+    def close(self, key: Hashable):
+        self._failures.pop(key, None)
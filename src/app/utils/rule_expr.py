@@ -0,0 +1,402 @@
+"""
+Alert rule expressions.
+
+A rule is a condition over the latest samples, interface attributes and
+time windows, optionally required to hold for some time::
+
+    cpu_usage > 90
+    in_bps > 0.9 * speed for 5m
+    avg(temperature, 10m) >= 70 and uptime > 600
+    rate(errors_in, 5m) > 10 or oper_status == 0
+
+Numbers take the suffixes k, M, G, T (powers of 1000) and % (1/100);
+durations are written 30s, 5m, 2h or 1d. A rule referring to any
+interface metric or attribute is evaluated per interface, otherwise per
+device; device metrics used in an interface rule are those of the
+interface's device.
+
+Rules are parsed once by a small Pratt parser and compiled into a tree
+of closures over NumPy arrays, constants folded. Evaluation takes a
+frame holding one row per series and returns a boolean array, so a rule
+costs a few vectorized operations per pass whatever the fleet size. A
+frame provides ``value(name)`` (latest value, NaN when missing) and
+``window(func, name, seconds)``; missing data never satisfies a
+comparison, nor its negation.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+DEVICE_METRICS = ("cpu_usage", "memory_usage", "temperature", "uptime")
+INTERFACE_METRICS = (
+    "in_bps", "out_bps", "bytes_in", "bytes_out",
+    "errors_in", "errors_out", "discards_in", "discards_out",
+)
+INTERFACE_ATTRIBUTES = ("speed", "mtu", "oper_status", "admin_status")
+METRICS = DEVICE_METRICS + INTERFACE_METRICS
+
+# func(metric, duration): aggregates of the samples in the window;
+# delta and rate (per second) are counter increases, NaN across a reset
+WINDOW_FUNCTIONS = ("avg", "min", "max", "sum", "count", "delta", "rate")
+FUNCTIONS = {"abs": np.abs}
+
+LEGACY_OPERATORS = (">", "<", ">=", "<=", "==", "!=")
+
+_VALUE_UNITS = {"": 1.0, "k": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "%": 0.01}
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_TOKEN = re.compile(
+    r"(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?P<unit>[A-Za-z%]*)"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>>=|<=|==|!=|[-+*/<>(),]))"
+)
+_KEYWORDS = ("and", "or", "not", "for")
+
+_ARITHMETIC = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide}
+
+
+def _not_equal(left, right):
+    # NaN != x is True in IEEE arithmetic; missing data satisfies no comparison
+    return np.logical_and(np.not_equal(left, right), np.logical_not(np.isnan(left) | np.isnan(right)))
+
+
+_COMPARISONS = {
+    ">": np.greater, "<": np.less, ">=": np.greater_equal,
+    "<=": np.less_equal, "==": np.equal, "!=": _not_equal,
+}
+_LOGIC = {"and": np.logical_and, "or": np.logical_or}
+
+# Infix binding powers; comparisons don't chain
+_BINDING = {"or": 10, "and": 20, **{op: 40 for op in _COMPARISONS}, "+": 50, "-": 50, "*": 60, "/": 60}
+_NOT_BINDING = 30
+_NEGATE_BINDING = 70
+
+
+class RuleSyntaxError(ValueError):
+    """An expression that doesn't parse or doesn't type-check."""
+
+    def __init__(self, message: str, position: Optional[int] = None):
+        if position is not None:
+            message = f"{message} at position {position}"
+        super().__init__(message)
+        self.position = position
+
+
+class _Token:
+    __slots__ = ("kind", "text", "unit", "position")
+
+    def __init__(self, kind: str, text: str, position: int, unit: str = ""):
+        self.kind = kind
+        self.text = text
+        self.unit = unit
+        self.position = position
+
+
+def _tokenize(source: str) -> List[_Token]:
+    tokens, position = [], 0
+    source = source.rstrip()
+    while position < len(source):
+        if source[position].isspace():
+            position += 1
+            continue
+        match = _TOKEN.match(source, position)
+        if match is None:
+            raise RuleSyntaxError(f"Unexpected character {source[position]!r}", position)
+        start = match.start()
+        if match.group("number") is not None:
+            tokens.append(_Token("number", match.group("number"), start, match.group("unit")))
+        elif match.group("name") is not None:
+            name = match.group("name")
+            tokens.append(_Token("keyword" if name in _KEYWORDS else "name", name, start))
+        else:
+            tokens.append(_Token("op", match.group("op"), start))
+        position = match.end()
+    tokens.append(_Token("end", "", len(source)))
+    return tokens
+
+
+class _Parser:
+    """Pratt parser producing a tuple AST."""
+
+    def __init__(self, source: str):
+        self.tokens = _tokenize(source)
+        self.index = 0
+
+    @property
+    def token(self) -> _Token:
+        return self.tokens[self.index]
+
+    def advance(self) -> _Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, text: str) -> _Token:
+        token = self.advance()
+        if token.text != text or token.kind not in ("op", "keyword"):
+            raise RuleSyntaxError(f"Expected {text!r}, got {token.text or 'end of rule'!r}", token.position)
+        return token
+
+    def rule(self) -> Tuple[tuple, float]:
+        tree = self.expression(0)
+        hold = 0.0
+        if self.token.kind == "keyword" and self.token.text == "for":
+            self.advance()
+            hold = self.duration()
+        token = self.token
+        if token.kind != "end":
+            raise RuleSyntaxError(f"Unexpected {token.text!r}", token.position)
+        return tree, hold
+
+    def expression(self, min_binding: int) -> tuple:
+        left = self.prefix()
+        while True:
+            token = self.token
+            if token.kind not in ("op", "keyword"):
+                break
+            binding = _BINDING.get(token.text)
+            if binding is None or binding <= min_binding:
+                break
+            self.advance()
+            right = self.expression(binding)
+            if token.text in _COMPARISONS:
+                if self.token.text in _COMPARISONS:
+                    raise RuleSyntaxError("Comparisons can't be chained", self.token.position)
+                left = ("compare", token.text, left, right, token.position)
+            elif token.text in _LOGIC:
+                left = ("logic", token.text, left, right, token.position)
+            else:
+                left = ("arith", token.text, left, right, token.position)
+        return left
+
+    def prefix(self) -> tuple:
+        token = self.advance()
+        if token.kind == "number":
+            unit = _VALUE_UNITS.get(token.unit)
+            if unit is None:
+                raise RuleSyntaxError(f"Unknown unit {token.unit!r}", token.position)
+            return ("number", float(token.text) * unit, token.position)
+        if token.kind == "name":
+            if self.token.text == "(" and self.token.kind == "op":
+                return self.call(token)
+            if token.text not in METRICS and token.text not in INTERFACE_ATTRIBUTES:
+                raise RuleSyntaxError(f"Unknown name {token.text!r}", token.position)
+            return ("name", token.text, token.position)
+        if token.kind == "op" and token.text == "(":
+            inner = self.expression(0)
+            self.expect(")")
+            return inner
+        if token.kind == "op" and token.text == "-":
+            return ("negate", self.expression(_NEGATE_BINDING), token.position)
+        if token.kind == "keyword" and token.text == "not":
+            return ("not", self.expression(_NOT_BINDING), token.position)
+        raise RuleSyntaxError(f"Unexpected {token.text or 'end of rule'!r}", token.position)
+
+    def call(self, function: _Token) -> tuple:
+        self.expect("(")
+        if function.text in WINDOW_FUNCTIONS:
+            metric = self.advance()
+            if metric.kind != "name" or metric.text not in METRICS:
+                raise RuleSyntaxError(f"{function.text}() takes a metric name", metric.position)
+            self.expect(",")
+            seconds = self.duration()
+            self.expect(")")
+            return ("window", function.text, metric.text, seconds, function.position)
+        if function.text in FUNCTIONS:
+            argument = self.expression(0)
+            self.expect(")")
+            return ("call", function.text, argument, function.position)
+        raise RuleSyntaxError(f"Unknown function {function.text!r}", function.position)
+
+    def duration(self) -> float:
+        token = self.advance()
+        unit = _DURATION_UNITS.get(token.unit) if token.kind == "number" else None
+        if unit is None:
+            raise RuleSyntaxError("Expected a duration such as 30s, 5m or 1h", token.position)
+        return float(token.text) * unit
+
+
+# Compiled nodes: (type, fn(frame) or None, constant or None), "number" or "bool"
+_Compiled = Tuple[str, Optional[Callable[[Any], Any]], Any]
+
+
+def _lift(node: _Compiled) -> Callable[[Any], Any]:
+    kind, fn, constant = node
+    return fn if fn is not None else (lambda frame: constant)
+
+
+def _combine(ufunc, left: _Compiled, right: _Compiled, kind: str) -> _Compiled:
+    if left[1] is None and right[1] is None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return kind, None, ufunc(left[2], right[2])
+    if left[1] is None:
+        constant, fn = left[2], right[1]
+        return kind, (lambda frame: ufunc(constant, fn(frame))), None
+    if right[1] is None:
+        fn, constant = left[1], right[2]
+        return kind, (lambda frame: ufunc(fn(frame), constant)), None
+    left_fn, right_fn = left[1], right[1]
+    return kind, (lambda frame: ufunc(left_fn(frame), right_fn(frame))), None
+
+
+def _compile(tree: tuple) -> _Compiled:
+    node = tree[0]
+    if node == "number":
+        return "number", None, tree[1]
+    if node == "name":
+        name = tree[1]
+        return "number", (lambda frame: frame.value(name)), None
+    if node == "window":
+        _, func, name, seconds, _ = tree
+        return "number", (lambda frame: frame.window(func, name, seconds)), None
+    if node == "call":
+        _, name, argument, position = tree
+        argument = _expect_type(_compile(argument), "number", position)
+        return _apply(FUNCTIONS[name], argument, "number")
+    if node == "negate":
+        operand = _expect_type(_compile(tree[1]), "number", tree[2])
+        return _combine(np.subtract, ("number", None, 0.0), operand, "number")
+    if node == "not":
+        # Missing data satisfies neither a comparison nor its negation
+        operand = _expect_type(_compile(tree[1]), "bool", tree[2])
+        return _combine(np.logical_and, _apply(np.logical_not, operand, "bool"), _known(tree[1]), "bool")
+    _, op, left, right, position = tree
+    if node == "logic":
+        operands = _expect_type(_compile(left), "bool", position), _expect_type(_compile(right), "bool", position)
+        return _combine(_LOGIC[op], *operands, "bool")
+    operands = _expect_type(_compile(left), "number", position), _expect_type(_compile(right), "number", position)
+    if node == "compare":
+        return _combine(_COMPARISONS[op], *operands, "bool")
+    return _combine(_ARITHMETIC[op], *operands, "number")
+
+
+def _apply(ufunc, operand: _Compiled, kind: str) -> _Compiled:
+    if operand[1] is None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return kind, None, ufunc(operand[2])
+    fn = operand[1]
+    return kind, (lambda frame: ufunc(fn(frame))), None
+
+
+def _present(values):
+    return np.logical_not(np.isnan(values))
+
+
+def _known(tree: tuple) -> _Compiled:
+    """True where every comparison of a condition has both operands (neither is NaN)."""
+    if tree[0] == "compare":
+        _, _, left, right, _ = tree
+        left, right = _apply(_present, _compile(left), "bool"), _apply(_present, _compile(right), "bool")
+        return _combine(np.logical_and, left, right, "bool")
+    if tree[0] == "logic":
+        return _combine(np.logical_and, _known(tree[2]), _known(tree[3]), "bool")
+    return _known(tree[1])  # not
+
+
+def _expect_type(node: _Compiled, kind: str, position: int) -> _Compiled:
+    if node[0] != kind:
+        expected = "a condition" if kind == "bool" else "a number"
+        raise RuleSyntaxError(f"Expected {expected}", position)
+    return node
+
+
+def _subject(tree: tuple) -> Optional[tuple]:
+    """The value an alert reports: left side of the (first) comparison."""
+    if tree[0] == "compare":
+        return tree[2]
+    if tree[0] == "logic":
+        return _subject(tree[2]) or _subject(tree[3])
+    if tree[0] == "not":
+        return _subject(tree[1])
+    return None
+
+
+def _references(tree: tuple, names: set, windows: set):
+    if tree[0] == "name":
+        names.add(tree[1])
+    elif tree[0] == "window":
+        windows.add((tree[1], tree[2], tree[3]))
+    else:
+        for child in tree[1:]:
+            if isinstance(child, tuple):
+                _references(child, names, windows)
+
+
+class CompiledRule:
+    """
+    A parsed and compiled rule expression.
+
+    ``kind`` is "condition" for threshold rules, or "value" for a numeric
+    expression whose series are tracked for anomalies (see tasks/anomaly.py).
+    """
+
+    __slots__ = ("source", "kind", "scope", "hold", "names", "windows", "_condition", "_subject")
+
+    def __init__(self, source: str, kind: str = "condition"):
+        self.source = source
+        self.kind = kind
+        tree, self.hold = _Parser(source).rule()
+        names, windows = set(), set()
+        _references(tree, names, windows)
+        self.names: FrozenSet[str] = frozenset(names)
+        self.windows: FrozenSet[Tuple[str, str, float]] = frozenset(windows)
+        if not names and not windows:
+            raise RuleSyntaxError("Rule doesn't refer to any metric or attribute")
+        used = self.names | {name for _, name, _ in self.windows}
+        self.scope = "interface" if used & set(INTERFACE_METRICS + INTERFACE_ATTRIBUTES) else "device"
+        if kind == "value":
+            self._condition = self._subject = _lift(_expect_type(_compile(tree), "number", 0))
+            return
+        self._condition = _lift(_expect_type(_compile(tree), "bool", 0))
+        subject = _subject(tree)
+        self._subject = _lift(_compile(subject)) if subject is not None else (lambda frame: np.nan)
+
+    @property
+    def metrics(self) -> FrozenSet[str]:
+        """Metric names the rule reads, latest or windowed."""
+        return (self.names | {name for _, name, _ in self.windows}) & set(METRICS)
+
+    @property
+    def max_window(self) -> float:
+        return max((seconds for _, _, seconds in self.windows), default=0.0)
+
+    def evaluate(self, frame) -> np.ndarray:
+        """Boolean array, True for the series of ``frame`` meeting the condition (values for "value" rules)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(self._condition(frame), (len(frame),))
+
+    def subject(self, frame) -> np.ndarray:
+        """Value reported with an alert, per series of ``frame``."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(np.asarray(self._subject(frame), np.float64), (len(frame),))
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(source: str, kind: str = "condition") -> CompiledRule:
+    """Compile a rule expression; raises ``RuleSyntaxError``."""
+    return CompiledRule(source, kind)
+
+
+def legacy_expression(oid: Optional[str], operator: Optional[str], threshold: Optional[float]) -> str:
+    """Expression equivalent to an ``oid operator threshold`` rule, the metric named by ``oid``."""
+    if operator not in LEGACY_OPERATORS:
+        raise RuleSyntaxError(f"Unknown operator {operator!r}")
+    if oid not in METRICS and oid not in INTERFACE_ATTRIBUTES:
+        raise RuleSyntaxError(f"{oid!r} is not a metric name ({', '.join(METRICS)})")
+    if threshold is None:
+        raise RuleSyntaxError("Missing threshold")
+    return f"{oid} {operator} {threshold!r}"
+
+
+def rule_source(
+    expression: Optional[str],
+    oid: Optional[str] = None,
+    operator: Optional[str] = None,
+    threshold: Optional[float] = None
+) -> str:
+    """The expression a rule is evaluated with: its own, or its legacy threshold condition."""
+    if expression:
+        return expression
+    return legacy_expression(oid, operator, threshold)
@@ -0,0 +1,26 @@
+from typing import Any, Dict, Iterable, List, Sequence
+
+from fastapi.responses import ORJSONResponse
+
+
+def rows_response(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> ORJSONResponse:
+    """
+    Encode trusted database rows as a JSON array of objects.
+
+    The rows come straight from our own tables, so they skip the
+    per-row Pydantic validation done for ``response_model`` and are
+    encoded by orjson instead of the stdlib JSON encoder.
+
+    Args:
+        fields: Output keys, in the same order as the row columns
+        rows: Row tuples as returned by a column query
+
+    Returns:
+        ORJSONResponse with one object per row
+    """
+    return ORJSONResponse(rows_content(fields, rows))
+
+
+def rows_content(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """The objects of ``rows_response``, e.g. for a cached response."""
+    return [dict(zip(fields, row)) for row in rows]
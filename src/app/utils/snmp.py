@@ -1,75 +1,500 @@
-from pysnmp.hlapi import (
-    getCmd, SnmpEngine, CommunityData, UdpTransportTarget,
-    ContextData, ObjectType, ObjectIdentity
-)
-from pysnmp.proto import error
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 import asyncio
+import copy
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
+from ..core import metrics
 from ..core.config import settings
+from .oid import OID
+from .rtt import RTTEstimator, RetryBudget
+
+SYS_UPTIME_OID = "1.3.6.1.2.1.1.3.0"
+
+# Names in pysnmp.hlapi, resolved when a target is built
+AUTH_PROTOCOLS = {
+    None: "usmNoAuthProtocol",
+    "md5": "usmHMACMD5AuthProtocol",
+    "sha": "usmHMACSHAAuthProtocol",
+    "sha224": "usmHMAC128SHA224AuthProtocol",
+    "sha256": "usmHMAC192SHA256AuthProtocol",
+    "sha384": "usmHMAC256SHA384AuthProtocol",
+    "sha512": "usmHMAC384SHA512AuthProtocol",
+}
+
+PRIV_PROTOCOLS = {
+    None: "usmNoPrivProtocol",
+    "des": "usmDESPrivProtocol",
+    "3des": "usm3DESEDEPrivProtocol",
+    "aes": "usmAesCfb128Protocol",
+    "aes192": "usmAesCfb192Protocol",
+    "aes256": "usmAesCfb256Protocol",
+}
+
+
+def hlapi():
+    """
+    pysnmp's high-level API, imported on first use.
+
+    Importing it loads the MIB machinery (a quarter of a second), which
+    the API process only needs once it actually talks SNMP.
+    """
+    from pysnmp import hlapi as module
+    return module
+
+
+def is_exception_value(value) -> bool:
+    """True for the v2c noSuchObject/noSuchInstance/endOfMibView markers."""
+    from pysnmp.proto import rfc1905
+    return isinstance(value, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView))
+
+
+def _text(octets: bytes) -> Optional[str]:
+    """The octets as UTF-8 text, None unless every character is printable."""
+    try:
+        text = octets.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if all(char.isprintable() or char in "\t\r\n" for char in text):
+        return text
+    return None
+
+
+def _decode_octets(value) -> str:
+    octets = value.asOctets()
+    text = _text(octets)
+    # Text starting with "0x" is hex-encoded too, so "0x" always means hex
+    if text is None or text.startswith("0x"):
+        # Binary strings (MAC addresses, bitmaps), shown like prettyPrint does
+        return "0x" + octets.hex()
+    return text
+
+
+def octets_of(value: str) -> bytes:
+    """The octets of a string decoded by ``python_value``, text or "0x" hex."""
+    if value.startswith("0x"):
+        return bytes.fromhex(value[2:])
+    return value.encode("utf-8")
+
+
+def _none(value) -> None:
+    return None
+
+
+_decoders: Dict[type, Any] = {}
+
+
+def _build_decoders():
+    from pysnmp.proto import rfc1902, rfc1905
+    from pyasn1.type import univ
+
+    for cls in (
+        rfc1902.Integer, rfc1902.Integer32, rfc1902.Unsigned32, rfc1902.Counter32,
+        rfc1902.Counter64, rfc1902.Gauge32, rfc1902.TimeTicks, univ.Integer,
+    ):
+        _decoders[cls] = int
+    _decoders[rfc1902.OctetString] = _decode_octets
+    _decoders[univ.OctetString] = _decode_octets
+    _decoders[rfc1902.IpAddress] = lambda value: ".".join(map(str, value.asNumbers()))
+    _decoders[rfc1902.ObjectIdentifier] = lambda value: ".".join(map(str, value.asTuple()))
+    for cls in (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView, univ.Null):
+        _decoders[cls] = _none
+
+
+def python_value(value) -> Any:
+    """
+    Plain Python value of a response, decoded from its ASN.1 type.
+
+    int for numeric types (Counter32/64, Gauge32, TimeTicks, ...), str for
+    strings, addresses and OIDs, None for absent objects. One dict lookup
+    on the exact type instead of prettyPrint() and re-parsing the text.
+    """
+    if not _decoders:
+        _build_decoders()
+    decoder = _decoders.get(type(value))
+    if decoder is not None:
+        return decoder(value)
+    # Subclasses from MIB-resolved responses
+    from pyasn1.type import univ
+
+    if is_exception_value(value):
+        return None
+    if isinstance(value, univ.Integer):
+        return int(value)
+    return value.prettyPrint()
+
+
+NO_SUCH_NAME = 2  # SNMPv1 error-status of a GET naming an absent object
+
+
+class SNMPTimeout(Exception):
+    """The agent did not answer within the timeout and retries."""
+
+
+class SNMPTarget:
+    """Prebuilt pysnmp auth and transport objects for one agent."""
+
+    __slots__ = ("host", "auth", "transport", "fingerprint", "vendor")
+
+    def __init__(self, host: str, auth, transport, fingerprint: tuple, vendor: str = "unknown"):
+        self.host = host
+        self.auth = auth
+        self.transport = transport
+        self.fingerprint = fingerprint
+        self.vendor = vendor  # metrics label only
+
+    @property
+    def address(self) -> tuple:
+        """(host, port) of the agent, used to key per-agent state."""
+        return self.fingerprint[:2]
+
+
+class SNMPTargetCache:
+    """
+    Cache of SNMP targets keyed by device ID.
+
+    Building ``UdpTransportTarget`` resolves the address and USM keys are
+    localized per engine, so targets are built once per device and reused
+    every cycle. Each entry remembers the device settings it was built from
+    and is rebuilt when they change, even if the update happened in another
+    process; ``invalidate`` drops entries eagerly on local updates.
+    """
+
+    def __init__(self, timeout: int = None, retries: int = None):
+        self.timeout = timeout or settings.SNMP_TIMEOUT
+        self.retries = retries if retries is not None else settings.SNMP_RETRIES
+        self._targets: Dict[Any, SNMPTarget] = {}
+
+    def get(self, device) -> SNMPTarget:
+        """Get the target for a device, building it if missing or stale."""
+        fingerprint = self._fingerprint(device)
+        target = self._targets.get(device.id)
+        if target is None or target.fingerprint != fingerprint:
+            target = self._build(device.ip_address, fingerprint)
+            self._targets[device.id] = target
+        target.vendor = getattr(device.vendor, "value", device.vendor) or "unknown"
+        return target
+
+    def for_host(self, host: str, community: str = None, port: int = 161) -> SNMPTarget:
+        """Get a v2c target for a bare host, by default with the global community."""
+        fingerprint = (host, port, "2c", community or settings.SNMP_COMMUNITY)
+        target = self._targets.get(fingerprint)
+        if target is None:
+            target = self._targets[fingerprint] = self._build(host, fingerprint)
+        return target
+
+    def invalidate(self, device_id: Optional[int] = None):
+        """Drop the cached target of a device, or of all devices."""
+        if device_id is None:
+            self._targets.clear()
+        else:
+            self._targets.pop(device_id, None)
+
+    @staticmethod
+    def _fingerprint(device) -> tuple:
+        version = getattr(device, "snmp_version", None) or "2c"
+        if version == "3":
+            credentials = (
+                device.snmp_v3_username,
+                device.snmp_v3_auth_protocol,
+                device.snmp_v3_auth_key,
+                device.snmp_v3_priv_protocol,
+                device.snmp_v3_priv_key,
+            )
+        else:
+            credentials = (device.snmp_community or settings.SNMP_COMMUNITY,)
+        return (device.ip_address, device.snmp_port or 161, version) + credentials
+
+    def _build(self, host: str, fingerprint: tuple) -> SNMPTarget:
+        _, port, version, *credentials = fingerprint
+        if version == "3":
+            username, auth_protocol, auth_key, priv_protocol, priv_key = credentials
+            auth = hlapi().UsmUserData(
+                username,
+                authKey=auth_key,
+                privKey=priv_key,
+                authProtocol=getattr(hlapi(), AUTH_PROTOCOLS[auth_protocol if auth_key else None]),
+                privProtocol=getattr(hlapi(), PRIV_PROTOCOLS[priv_protocol if priv_key else None]),
+            )
+        else:
+            auth = hlapi().CommunityData(credentials[0], mpModel=0 if version == "1" else 1)
+        transport = hlapi().UdpTransportTarget(
+            (host, port), timeout=self.timeout, retries=self.retries
+        )
+        return SNMPTarget(host, auth, transport, fingerprint)
+
+
+# Shared by every SNMPClient in the process so device updates can invalidate it
+snmp_targets = SNMPTargetCache()
+
 
 class SNMPClient:
     def __init__(self, community: str = None, timeout: int = None, retries: int = None):
         self.community = community or settings.SNMP_COMMUNITY
         self.timeout = timeout or settings.SNMP_TIMEOUT
-        self.retries = retries or settings.SNMP_RETRIES
+        self.retries = retries if retries is not None else settings.SNMP_RETRIES
         self.executor = ThreadPoolExecutor(max_workers=10)
+        self.targets = snmp_targets
+        # Per-agent timeouts/retries from observed RTT; SNMP_TIMEOUT caps a whole request
+        self.rtt = RTTEstimator(maximum=self.timeout, max_retries=self.retries)
+        self.budget = RetryBudget()
+        # SnmpEngine is expensive to build and not thread-safe: one per worker thread
+        self._local = threading.local()
 
-    async def get(self, host: str, oid: str) -> Dict[str, Any]:
-        """Get a single SNMP OID value asynchronously."""
+    def begin_cycle(self):
+        """Start a collection cycle: refill the retry budget."""
+        self.budget.reset()
+
+    def target(self, device) -> SNMPTarget:
+        """Get the cached SNMP target for a device."""
+        return self.targets.get(device)
+
+    def _resolve(self, target: Union[str, SNMPTarget]) -> SNMPTarget:
+        if isinstance(target, SNMPTarget):
+            return target
+        return self.targets.for_host(target, community=self.community)
+
+    def _engine(self):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            engine = self._local.engine = hlapi().SnmpEngine()
+        return engine
+
+    async def _request(self, target: SNMPTarget, operation, args: tuple, retries: Optional[int] = None):
+        """
+        Run a blocking pysnmp operation in the worker pool.
+
+        The timeout and retries come from the agent's RTT estimate; retries
+        are further limited by ``retries`` and by the cycle's retry budget.
+        ``operation(target, *args, timeout, retries)`` returns the result,
+        the round-trip time of its first PDU and the number of PDUs sent.
+        """
+        timeout, wanted = self.rtt.timeout_and_retries(target.address)
+        if retries is not None:
+            wanted = min(wanted, retries)
+        granted = self.budget.reserve(wanted)
         loop = asyncio.get_running_loop()
+        metrics.SNMP_REQUESTS.labels(target.vendor).inc()
+        metrics.SNMP_IN_FLIGHT.inc()
         try:
-            result = await loop.run_in_executor(
+            result, elapsed, pdus = await loop.run_in_executor(
                 self.executor,
-                self._get_sync,
-                host,
-                oid
+                operation,
+                target,
+                *args,
+                timeout,
+                granted
             )
-            return {"oid": oid, "value": result}
+        except SNMPTimeout:
+            self.rtt.timed_out(target.address)
+            metrics.SNMP_TIMEOUTS.labels(target.vendor).inc()
+            raise
+        except Exception:
+            # The agent answered (with an error), so no retry was spent
+            self.budget.refund(granted)
+            metrics.SNMP_ERRORS.labels(target.vendor).inc()
+            raise
+        finally:
+            metrics.SNMP_IN_FLIGHT.dec()
+        if pdus > 1:
+            metrics.SNMP_REQUESTS.labels(target.vendor).inc(pdus - 1)
+        self.budget.refund(granted - min(granted, int(elapsed // timeout)))
+        self.rtt.observe(target.address, elapsed, timeout)
+        metrics.SNMP_RTT.labels(target.vendor).observe(elapsed)
+        return result
+
+    async def get(
+        self,
+        target: Union[str, SNMPTarget],
+        oid: str,
+        retries: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get a single SNMP OID value asynchronously."""
+        target = self._resolve(target)
+        try:
+            value = await self._request(target, self._get_sync, (oid,), retries)
+        except SNMPTimeout as e:
+            return {"oid": oid, "error": str(e), "timeout": True}
         except Exception as e:
             return {"oid": oid, "error": str(e)}
+        return {"oid": oid, "value": value}
 
-    def _get_sync(self, host: str, oid: str) -> Any:
-        """Synchronous SNMP GET operation."""
-        error_indication, error_status, error_index, var_binds = next(
-            getCmd(
-                SnmpEngine(),
-                CommunityData(self.community),
-                UdpTransportTarget((host, 161), timeout=self.timeout, retries=self.retries),
-                ContextData(),
-                ObjectType(ObjectIdentity(oid))
-            )
+    async def get_values(self, target: Union[str, SNMPTarget], oids: Sequence[OID]) -> List[Any]:
+        """
+        GET several pre-parsed OIDs in one PDU.
+
+        Returns one Python value per OID (int for numeric types, str
+        otherwise), None where the agent has no such object; SNMPv1
+        agents, which refuse the whole PDU for one absent object, are
+        asked again without it. Raises ``SNMPTimeout`` or the agent's
+        error.
+        """
+        return await self._request(self._resolve(target), self._get_values_sync, (tuple(oids),))
+
+    async def walk(
+        self,
+        target: Union[str, SNMPTarget],
+        columns: Sequence[OID],
+        max_repetitions: int = 10,
+        bulk: bool = True
+    ) -> List[Tuple[OID, Any]]:
+        """
+        Walk table columns side by side (GETBULK, or GETNEXT for SNMPv1).
+
+        Returns:
+            (oid, value) for every object inside the walked columns
+        """
+        return await self._request(
+            self._resolve(target), self._walk_sync, (tuple(columns), max_repetitions, bulk)
         )
 
-        if error_indication:
+    async def probe(self, target: Union[str, SNMPTarget]) -> bool:
+        """Cheap reachability check: a single sysUpTime GET without retries."""
+        result = await self.get(target, SYS_UPTIME_OID, retries=0)
+        return "value" in result
+
+    @staticmethod
+    def _transport(target: SNMPTarget, timeout: float, retries: int):
+        # Shallow copy: keeps the resolved address, overrides timeout/retries
+        transport = copy.copy(target.transport)
+        transport.timeout = timeout
+        transport.retries = retries
+        return transport
+
+    @staticmethod
+    def _check(error_indication, error_status, error_index, var_binds):
+        from pysnmp.proto import errind
+
+        if isinstance(error_indication, errind.RequestTimedOut):
+            raise SNMPTimeout(f"SNMP error: {error_indication}")
+        elif error_indication:
             raise Exception(f"SNMP error: {error_indication}")
         elif error_status:
             raise Exception(
                 f"SNMP error: {error_status.prettyPrint()} at "
                 f"{error_index and var_binds[int(error_index) - 1][0] or '?'}"
             )
+
+    def _get_sync(self, target: SNMPTarget, oid: str, timeout: float, retries: int) -> Any:
+        """Synchronous SNMP GET operation, returning the value and the elapsed time."""
+        from pysnmp.proto import rfc1905
+        api = hlapi()
+        start = time.perf_counter()
+        error_indication, error_status, error_index, var_binds = next(
+            api.getCmd(
+                self._engine(),
+                target.auth,
+                self._transport(target, timeout, retries),
+                api.ContextData(),
+                api.ObjectType(api.ObjectIdentity(oid))
+            )
+        )
+        elapsed = time.perf_counter() - start
+        self._check(error_indication, error_status, error_index, var_binds)
+        for var_bind in var_binds:
+            value = var_bind[1]
+            # v2c exception values: the agent has nothing at this OID
+            if isinstance(value, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView)):
+                raise Exception(f"SNMP error: {value.prettyPrint()} at {var_bind[0]}")
+            return value.prettyPrint(), elapsed, 1
+
+    def _get_values_sync(self, target: SNMPTarget, oids: Tuple[OID, ...], timeout: float, retries: int):
+        api = hlapi()
+        values: List[Any] = [None] * len(oids)
+        pending = list(range(len(oids)))
+        elapsed, pdus = 0.0, 0
+        while pending:
+            start = time.perf_counter()
+            # lookupMib=False: values come back as plain ASN.1 objects, skipping
+            # the MIB resolution of every response
+            error_indication, error_status, error_index, var_binds = next(
+                api.getCmd(
+                    self._engine(),
+                    target.auth,
+                    self._transport(target, timeout, retries),
+                    api.ContextData(),
+                    *[api.ObjectType(api.ObjectIdentity(oids[i])) for i in pending],
+                    lookupMib=False
+                )
+            )
+            if not pdus:
+                elapsed = time.perf_counter() - start
+            pdus += 1
+            if not error_indication and int(error_status) == NO_SUCH_NAME and 0 < int(error_index) <= len(pending):
+                # SNMPv1 has no per-object exceptions: the agent rejects the
+                # whole PDU naming the first absent object. Leave it None and
+                # ask for the others again
+                del pending[int(error_index) - 1]
+                continue
+            self._check(error_indication, error_status, error_index, var_binds)
+            for i, (_, value) in zip(pending, var_binds):
+                values[i] = python_value(value)
+            break
+        return values, elapsed, pdus
+
+    def _walk_sync(
+        self,
+        target: SNMPTarget,
+        columns: Tuple[OID, ...],
+        max_repetitions: int,
+        bulk: bool,
+        timeout: float,
+        retries: int
+    ):
+        api = hlapi()
+        var_binds = [api.ObjectType(api.ObjectIdentity(column)) for column in columns]
+        transport = self._transport(target, timeout, retries)
+        if bulk:
+            rows = api.bulkCmd(
+                self._engine(), target.auth, transport, api.ContextData(),
+                0, max_repetitions, *var_binds, lexicographicMode=False, lookupMib=False
+            )
         else:
-            for var_bind in var_binds:
-                return var_bind[1].prettyPrint()
+            rows = api.nextCmd(
+                self._engine(), target.auth, transport, api.ContextData(),
+                *var_binds, lexicographicMode=False, lookupMib=False
+            )
+        found: List[Tuple[OID, Any]] = []
+        start = time.perf_counter()
+        elapsed = None
+        count = 0
+        for error_indication, error_status, error_index, row in rows:
+            if elapsed is None:
+                # The RTT sample: later PDUs of the walk are sent back to back
+                elapsed = time.perf_counter() - start
+            self._check(error_indication, error_status, error_index, row)
+            count += 1
+            for column, (name, value) in zip(columns, row):
+                name = name.asTuple()
+                # Columns that ran out early repeat their last OID with endOfMibView
+                if name[:len(column)] == column:
+                    value = python_value(value)
+                    if value is not None:
+                        found.append((name, value))
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+        pdus = max(1, -(-count // max_repetitions)) if bulk else count + 1
+        return found, elapsed, pdus
 
-    async def get_multiple(self, host: str, oids: List[str]) -> Dict[str, Any]:
+    async def get_multiple(self, target: Union[str, SNMPTarget], oids: List[str]) -> Dict[str, Any]:
         """Get multiple SNMP OIDs asynchronously."""
-        tasks = [self.get(host, oid) for oid in oids]
+        target = self._resolve(target)
+        tasks = [self.get(target, oid) for oid in oids]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         return {result["oid"]: result for result in results}
 
-    async def get_device_info(self, host: str) -> Dict[str, Any]:
+    async def get_device_info(self, target: Union[str, SNMPTarget]) -> Dict[str, Any]:
         """Get basic device information using common SNMP OIDs."""
         oids = {
             "sysDescr": "1.3.6.1.2.1.1.1.0",
             "sysName": "1.3.6.1.2.1.1.5.0",
             "sysLocation": "1.3.6.1.2.1.1.6.0",
             "sysContact": "1.3.6.1.2.1.1.4.0",
-            "sysUpTime": "1.3.6.1.2.1.1.3.0"
+            "sysUpTime": SYS_UPTIME_OID
         }
-        
-        results = await self.get_multiple(host, list(oids.values()))
-        
+
+        results = await self.get_multiple(target, list(oids.values()))
+
         # Map results back to their names
         return {
             name: results[oid].get("value") if not results[oid].get("error") else None
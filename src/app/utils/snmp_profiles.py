@@ -0,0 +1,368 @@
+"""
+Per-vendor SNMP collection profiles and the request plans compiled from them.
+
+A ``CollectionProfile`` declares where each ``DeviceMetric`` field comes
+from (a scalar GET or a reduction over a walked table column) and which
+table columns make up the interface rows. ``compile_plan`` turns a
+profile into a ``RequestPlan``: OIDs parsed into tuples, scalars packed
+into as few GET PDUs as possible and columns of the same table walked
+side by side in one GETBULK sequence. Plans are built once per
+(vendor, SNMP version, metric groups) and reused by every device and
+every cycle.
+"""
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from .oid import OID, OidTrie, parse_oid
+from .snmp import SNMPTimeout
+
+logger = logging.getLogger(__name__)
+
+# SNMPv2-MIB system group
+SYS_DESCR = "1.3.6.1.2.1.1.1.0"
+SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+SYS_CONTACT = "1.3.6.1.2.1.1.4.0"
+SYS_NAME = "1.3.6.1.2.1.1.5.0"
+SYS_LOCATION = "1.3.6.1.2.1.1.6.0"
+
+# IF-MIB ifTable / ifXTable columns
+IF_DESCR = "1.3.6.1.2.1.2.2.1.2"
+IF_MTU = "1.3.6.1.2.1.2.2.1.4"
+IF_SPEED = "1.3.6.1.2.1.2.2.1.5"
+IF_PHYS_ADDRESS = "1.3.6.1.2.1.2.2.1.6"
+IF_ADMIN_STATUS = "1.3.6.1.2.1.2.2.1.7"
+IF_OPER_STATUS = "1.3.6.1.2.1.2.2.1.8"
+IF_IN_OCTETS = "1.3.6.1.2.1.2.2.1.10"
+IF_IN_DISCARDS = "1.3.6.1.2.1.2.2.1.13"
+IF_IN_ERRORS = "1.3.6.1.2.1.2.2.1.14"
+IF_OUT_OCTETS = "1.3.6.1.2.1.2.2.1.16"
+IF_OUT_DISCARDS = "1.3.6.1.2.1.2.2.1.19"
+IF_OUT_ERRORS = "1.3.6.1.2.1.2.2.1.20"
+IF_HC_IN_OCTETS = "1.3.6.1.2.1.31.1.1.1.6"
+IF_HC_OUT_OCTETS = "1.3.6.1.2.1.31.1.1.1.10"
+IF_NAME = "1.3.6.1.2.1.31.1.1.1.1"
+IF_HIGH_SPEED = "1.3.6.1.2.1.31.1.1.1.15"
+IF_ALIAS = "1.3.6.1.2.1.31.1.1.1.18"
+IF_TABLE_LAST_CHANGE = "1.3.6.1.2.1.31.1.5.0"
+
+# HOST-RESOURCES-MIB
+HR_PROCESSOR_LOAD = "1.3.6.1.2.1.25.3.3.1.2"
+
+# CISCO-PROCESS-MIB, CISCO-MEMORY-POOL-MIB, CISCO-ENVMON-MIB
+CISCO_CPU_TOTAL_5MIN_REV = "1.3.6.1.4.1.9.9.109.1.1.1.1.8"
+CISCO_MEMORY_POOL_USED = "1.3.6.1.4.1.9.9.48.1.1.1.5"
+CISCO_MEMORY_POOL_FREE = "1.3.6.1.4.1.9.9.48.1.1.1.6"
+CISCO_TEMPERATURE_VALUE = "1.3.6.1.4.1.9.9.13.1.3.1.3"
+
+# HUAWEI-ENTITY-EXTENT-MIB hwEntityStateTable
+HUAWEI_ENTITY_CPU_USAGE = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.5"
+HUAWEI_ENTITY_MEM_USAGE = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.7"
+HUAWEI_ENTITY_TEMPERATURE = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.11"
+
+
+class Scalar:
+    """A single object fetched with GET, optionally scaled (e.g. TimeTicks to seconds)."""
+
+    __slots__ = ("oid", "scale")
+
+    def __init__(self, oid: str, scale: float = 1):
+        self.oid = parse_oid(oid)
+        self.scale = scale
+
+
+class Column:
+    """A table column, walked and reduced to one value: "avg", "max", "sum" or "first"."""
+
+    __slots__ = ("oid", "reduce", "skip_zero")
+
+    def __init__(self, oid: str, reduce: str = "avg", skip_zero: bool = False):
+        if reduce not in REDUCERS:
+            raise ValueError(f"Unknown reduction {reduce!r}")
+        self.oid = parse_oid(oid)
+        self.reduce = reduce
+        self.skip_zero = skip_zero  # rows of entities without the sensor report 0
+
+
+class Percent:
+    """``used / (used + free)`` in percent, each summed over all rows of a column."""
+
+    __slots__ = ("used", "free")
+
+    def __init__(self, used: str, free: str):
+        self.used = parse_oid(used)
+        self.free = parse_oid(free)
+
+
+REDUCERS: Dict[str, Callable[[List[float]], float]] = {
+    "avg": lambda values: sum(values) / len(values),
+    "max": max,
+    "sum": sum,
+    "first": lambda values: values[0],
+}
+
+
+class CollectionProfile:
+    """Where one vendor keeps the device metrics and interface counters."""
+
+    def __init__(self, name: str, device: Dict[str, Any], interfaces: Dict[str, str]):
+        self.name = name
+        self.device = device
+        self.interfaces = interfaces
+
+
+# Identification and uptime, collected for every vendor; the first GET PDU
+# always carries sysUpTime, so an unanswered PDU means the device is down
+SYSTEM_INFO = {
+    "sysUpTime": Scalar(SYS_UPTIME),
+    "sysDescr": Scalar(SYS_DESCR),
+    "sysName": Scalar(SYS_NAME),
+    "sysLocation": Scalar(SYS_LOCATION),
+    "sysContact": Scalar(SYS_CONTACT),
+}
+
+IF_TABLE = {
+    "name": IF_DESCR,
+    "admin_status": IF_ADMIN_STATUS,
+    "oper_status": IF_OPER_STATUS,
+    "bytes_in": IF_IN_OCTETS,
+    "bytes_out": IF_OUT_OCTETS,
+    "errors_in": IF_IN_ERRORS,
+    "errors_out": IF_OUT_ERRORS,
+    "discards_in": IF_IN_DISCARDS,
+    "discards_out": IF_OUT_DISCARDS,
+}
+
+# 64-bit octet counters: 32-bit ones wrap in under a minute at 1 Gbit/s
+IF_TABLE_HC = {**IF_TABLE, "bytes_in": IF_HC_IN_OCTETS, "bytes_out": IF_HC_OUT_OCTETS}
+
+UPTIME = Scalar(SYS_UPTIME, scale=0.01)
+
+# Metric groups a plan can be limited to; the system group is always fetched
+METRIC_GROUPS = frozenset({"device", "interfaces"})
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "cisco": CollectionProfile(
+        "cisco",
+        device={
+            "cpu_usage": Column(CISCO_CPU_TOTAL_5MIN_REV, "avg"),
+            "memory_usage": Percent(CISCO_MEMORY_POOL_USED, CISCO_MEMORY_POOL_FREE),
+            "temperature": Column(CISCO_TEMPERATURE_VALUE, "max"),
+            "uptime": UPTIME,
+        },
+        interfaces=IF_TABLE_HC,
+    ),
+    "huawei": CollectionProfile(
+        "huawei",
+        device={
+            "cpu_usage": Column(HUAWEI_ENTITY_CPU_USAGE, "max", skip_zero=True),
+            "memory_usage": Column(HUAWEI_ENTITY_MEM_USAGE, "max", skip_zero=True),
+            "temperature": Column(HUAWEI_ENTITY_TEMPERATURE, "max", skip_zero=True),
+            "uptime": UPTIME,
+        },
+        interfaces=IF_TABLE_HC,
+    ),
+    "other": CollectionProfile(
+        "other",
+        device={
+            "cpu_usage": Column(HR_PROCESSOR_LOAD, "avg"),
+            "uptime": UPTIME,
+        },
+        interfaces=IF_TABLE,
+    ),
+}
+
+Extractor = Callable[[Dict[OID, Any], Dict[OID, Dict[OID, Any]]], Any]
+
+
+def _numbers(rows: Optional[Dict[OID, Any]], skip_zero: bool = False) -> List[float]:
+    if not rows:
+        return []
+    return [v for v in rows.values() if isinstance(v, (int, float)) and (v or not skip_zero)]
+
+
+def _extractor(spec) -> Extractor:
+    """Compile a field spec into a function of (scalars, columns)."""
+    if isinstance(spec, Scalar):
+        oid, scale = spec.oid, spec.scale
+
+        def scalar(scalars, columns):
+            value = scalars.get(oid)
+            if scale != 1 and isinstance(value, (int, float)):
+                return int(value * scale)
+            return value
+        return scalar
+
+    if isinstance(spec, Column):
+        oid, reduce, skip_zero = spec.oid, REDUCERS[spec.reduce], spec.skip_zero
+
+        def column(scalars, columns):
+            values = _numbers(columns.get(oid), skip_zero)
+            return int(round(reduce(values))) if values else None
+        return column
+
+    if isinstance(spec, Percent):
+        used_oid, free_oid = spec.used, spec.free
+
+        def percent(scalars, columns):
+            used = sum(_numbers(columns.get(used_oid)))
+            total = used + sum(_numbers(columns.get(free_oid)))
+            return int(round(100 * used / total)) if total else None
+        return percent
+
+    raise TypeError(f"Unknown field spec {spec!r}")
+
+
+def _column_oids(spec) -> Tuple[OID, ...]:
+    if isinstance(spec, Column):
+        return (spec.oid,)
+    if isinstance(spec, Percent):
+        return (spec.used, spec.free)
+    return ()
+
+
+def plan_walks(columns: Sequence[OID]) -> List[Tuple[Tuple[OID, ...], int]]:
+    """
+    Group columns into walks: (columns of one table, GETBULK repetitions).
+
+    Columns of one table share their row indexes, so a single walk fetches
+    all of them row by row; repetitions keep a response under
+    ``SNMP_BULK_VARBINDS``.
+    """
+    tables: Dict[OID, List[OID]] = {}
+    for oid in dict.fromkeys(columns):
+        tables.setdefault(oid[:-1], []).append(oid)
+    return [
+        (tuple(group), max(1, settings.SNMP_BULK_VARBINDS // len(group)))
+        for group in tables.values()
+    ]
+
+
+class RequestPlan:
+    """
+    The requests that collect one profile, ready to send.
+
+    ``get_pdus`` are tuples of scalar OIDs, one GET each; ``walks`` are
+    tuples of columns of the same table with the GETBULK repetitions that
+    keep a response under ``SNMP_BULK_VARBINDS``.
+    """
+
+    def __init__(self, profile: CollectionProfile, bulk: bool, groups: FrozenSet[str] = METRIC_GROUPS):
+        self.profile = profile
+        self.bulk = bulk
+        self.groups = groups
+        device = profile.device if "device" in groups else {}
+        interfaces = profile.interfaces if "interfaces" in groups else {}
+        self.info = [(name, _extractor(spec)) for name, spec in SYSTEM_INFO.items()]
+        self.fields = [(name, _extractor(spec)) for name, spec in device.items()]
+        self.interface_columns = [(name, parse_oid(oid)) for name, oid in interfaces.items()]
+
+        scalars: List[OID] = []
+        device_columns: List[OID] = []
+        for spec in list(SYSTEM_INFO.values()) + list(device.values()):
+            if isinstance(spec, Scalar):
+                scalars.append(spec.oid)
+            device_columns.extend(_column_oids(spec))
+        device_columns = list(dict.fromkeys(device_columns))
+        columns = device_columns + [oid for _, oid in self.interface_columns]
+
+        scalars = list(dict.fromkeys(scalars))
+        size = settings.SNMP_MAX_VARBINDS
+        self.get_pdus: List[Tuple[OID, ...]] = [
+            tuple(scalars[i:i + size]) for i in range(0, len(scalars), size)
+        ]
+
+        self.walks = plan_walks(columns)
+
+        # Walked OID -> the dict collecting that column's rows, by index.
+        # Values stay column-major: no per-interface objects are built
+        self.dispatch = OidTrie((oid, oid) for oid in columns)
+
+        # 64-bit ifXTable octet counters wrap at 2**64, the rest at 2**32
+        self.hc_octets = profile.interfaces.get("bytes_in") == IF_HC_IN_OCTETS
+
+    async def fetch(self, snmp, target) -> Dict[str, Any]:
+        """
+        Run the plan against one agent with an ``SNMPClient``.
+
+        Returns:
+            {"info": {sysUpTime, sysDescr, ...}, "metrics": {DeviceMetric field: value},
+            "interfaces": {"if_index": [...], "name": [...], "bytes_in": [...], ...}}
+
+        Raises ``SNMPTimeout`` when the agent does not answer the first GET.
+        A failed walk only leaves its fields empty.
+        """
+        results = await asyncio.gather(
+            *[snmp.get_values(target, pdu) for pdu in self.get_pdus],
+            *[
+                snmp.walk(target, group, max_repetitions=repetitions, bulk=self.bulk)
+                for group, repetitions in self.walks
+            ],
+            return_exceptions=True
+        )
+
+        scalars: Dict[OID, Any] = {}
+        for i, (pdu, result) in enumerate(zip(self.get_pdus, results)):
+            if isinstance(result, BaseException):
+                if i == 0 or isinstance(result, SNMPTimeout):
+                    raise result
+                logger.debug("GET of %d OIDs failed on %s: %s", len(pdu), target.host, result)
+                continue
+            scalars.update(zip(pdu, result))
+
+        columns: Dict[OID, Dict[OID, Any]] = {}
+        match = self.dispatch.match
+        for (group, _), result in zip(self.walks, results[len(self.get_pdus):]):
+            if isinstance(result, BaseException):
+                logger.debug("Walk of %d columns failed on %s: %s", len(group), target.host, result)
+                continue
+            for oid, value in result:
+                hit = match(oid)
+                if hit is not None:
+                    column, index = hit
+                    rows = columns.get(column)
+                    if rows is None:
+                        rows = columns[column] = {}
+                    rows[index] = value
+
+        return {
+            "info": {name: extract(scalars, columns) for name, extract in self.info},
+            "metrics": {name: extract(scalars, columns) for name, extract in self.fields},
+            "interfaces": self._interfaces(columns),
+        }
+
+    def _interfaces(self, columns: Dict[OID, Dict[OID, Any]]) -> Dict[str, list]:
+        """Interface columns as parallel lists, aligned on ``if_index``."""
+        if not self.interface_columns:
+            return {"if_index": []}
+        (_, name_oid), *_ = self.interface_columns
+        # ifTable is indexed by the single ifIndex arc
+        indexes = [index for index in columns.get(name_oid, {}) if len(index) == 1]
+        interfaces = {"if_index": [index[0] for index in indexes]}
+        for field, oid in self.interface_columns:
+            rows = columns.get(oid, {})
+            interfaces[field] = [rows.get(index) for index in indexes]
+        return interfaces
+
+
+@lru_cache(maxsize=None)
+def compile_plan(vendor: str, version: str = "2c", groups: FrozenSet[str] = METRIC_GROUPS) -> RequestPlan:
+    """
+    The request plan of a vendor profile; SNMPv1 agents are walked with
+    GETNEXT and get the 32-bit octet counters, as v1 can't carry Counter64.
+    """
+    profile = PROFILES.get(vendor, PROFILES["other"])
+    if version == "1" and profile.interfaces.get("bytes_in") == IF_HC_IN_OCTETS:
+        profile = CollectionProfile(profile.name, profile.device, {
+            **profile.interfaces, "bytes_in": IF_IN_OCTETS, "bytes_out": IF_OUT_OCTETS
+        })
+    logger.debug("Compiled %s collection plan for SNMPv%s (%s)", profile.name, version, ", ".join(sorted(groups)))
+    return RequestPlan(profile, bulk=version != "1", groups=groups)
+
+
+def plan_for(device, groups: FrozenSet[str] = METRIC_GROUPS) -> RequestPlan:
+    """The cached request plan for a device, limited to some metric groups."""
+    vendor = getattr(device.vendor, "value", device.vendor) or "other"
+    return compile_plan(vendor, getattr(device, "snmp_version", None) or "2c", frozenset(groups))
@@ -0,0 +1,115 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.models.device import DeviceStatus, DeviceVendor
+from app.tasks import collector as collector_module
+from app.tasks.collector import SNMPCollector
+from app.utils.snmp_profiles import compile_plan
+
+VENDORS = (DeviceVendor.OTHER, DeviceVendor.CISCO, DeviceVendor.HUAWEI, DeviceVendor.OTHER)
+
+
+class FakePlan:
+    """The vendor's plan, answering every object it asks for."""
+
+    def __init__(self, plan, gates):
+        self.gates = gates
+        self.groups = plan.groups
+        self.hc_octets = plan.hc_octets
+        self.fields = [name for name, _ in plan.fields]
+        self.interface_columns = [name for name, _ in plan.interface_columns]
+
+    async def fetch(self, snmp, target):
+        if target in self.gates:
+            await self.gates[target].wait()
+        interfaces = {"if_index": [1]}
+        for name in self.interface_columns:
+            interfaces[name] = ["eth0"] if name == "name" else [1000]
+        return {
+            "info": {"sysUpTime": 100},
+            "metrics": {name: 42 for name in self.fields},
+            "interfaces": interfaces,
+        }
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'collector.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for number, vendor in enumerate(VENDORS, 1):
+        db.add(models.Device(
+            id=number, hostname=f"sw{number}", ip_address=f"10.0.0.{number}", vendor=vendor
+        ))
+        db.add(models.Interface(id=number, device_id=number, name="eth0", if_index=1))
+    db.commit()
+    db.close()
+    return factory
+
+
+@pytest.fixture
+def gates():
+    """asyncio.Event per agent address, answered once set."""
+    return {}
+
+
+@pytest.fixture
+def collector(session_factory, gates, monkeypatch):
+    monkeypatch.setattr(collector_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(collector_module, "plan_for", lambda device, groups=None: FakePlan(
+        compile_plan(device.vendor.value, device.snmp_version), gates
+    ))
+    collector = SNMPCollector()
+    collector.sweep = None
+    monkeypatch.setattr(collector.snmp, "target", lambda device: device.ip_address)
+    return collector
+
+
+def test_mixed_vendor_fleet(collector, session_factory):
+    asyncio.run(collector.collect_all_devices())
+
+    db = session_factory()
+    rows = {
+        row.device_id: (row.cpu_usage, row.memory_usage, row.temperature, row.uptime)
+        for row in db.query(models.DeviceMetric)
+    }
+    assert rows == {
+        1: (42, None, None, 42),
+        2: (42, 42, 42, 42),
+        3: (42, 42, 42, 42),
+        4: (42, None, None, 42),
+    }
+    assert sorted(row.interface_id for row in db.query(models.InterfaceMetric)) == [1, 2, 3, 4]
+    assert {device.status for device in db.query(models.Device)} == {DeviceStatus.UP}
+    db.close()
+
+
+def device_rows(session_factory):
+    db = session_factory()
+    try:
+        return Counter(row.device_id for row in db.query(models.DeviceMetric))
+    finally:
+        db.close()
+
+
+def test_poll_during_cycle_leaves_the_cycle_buffers_alone(collector, session_factory, gates):
+    async def run():
+        gates["10.0.0.3"] = asyncio.Event()
+        cycle = asyncio.create_task(collector.collect_all_devices())
+        while len(collector.device_metrics) < 2:  # devices 1 and 2 collected, 3 waiting
+            await asyncio.sleep(0)
+        await collector.poll_device(1)
+        assert device_rows(session_factory) == {1: 1}
+        assert [row["device_id"] for row in collector.device_metrics] == [1, 2]
+        gates["10.0.0.3"].set()
+        await cycle
+
+    asyncio.run(run())
+    assert device_rows(session_factory) == {1: 2, 2: 1, 3: 1, 4: 1}
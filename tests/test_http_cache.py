@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from app.core import http_cache
+from app.core.config import settings
+from app.core.http_cache import ResourceVersions
+
+
+class FakeRedis:
+    """The hash commands ResourceVersions uses, with _RAISE_VERSIONS done in Python."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def eval(self, script, numkeys, key, version, *fields):
+        assert script == http_cache._RAISE_VERSIONS
+        fields_of = self.hashes.setdefault(key, {})
+        for field in fields:
+            if int(fields_of.get(field, b"0")) < int(version):
+                fields_of[field] = str(version).encode()
+
+    async def hmget(self, key, *fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    async def hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(field, str(value).encode())
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+
+class Unreachable:
+    async def hmget(self, key, *fields):
+        raise ConnectionError("Connection refused")
+
+
+async def settle():
+    """Let the scheduled writes to Redis run."""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def workers(count=2):
+    redis = FakeRedis()
+    stores = []
+    for _ in range(count):
+        store = ResourceVersions()
+        store.started += len(stores)  # workers start at different times
+        store.share(redis)
+        stores.append(store)
+    return stores
+
+
+def test_worker_countagree_on_unwritten_resources():
+    async def run():
+        first, second = workers()
+        assert first.started != second.started
+        assert await first.current(["devices"]) == await second.current(["devices"]) == first.started
+
+    asyncio.run(run())
+
+
+def test_bump_reaches_the_other_worker_without_the_relay():
+    async def run():
+        first, second = workers()
+        version = first.next(["devices", "device:1"])
+        first.apply(["devices", "device:1"], version)  # second never sees resources.changed
+        assert await first.current(["devices"]) == version  # before the write to Redis lands
+        await settle()
+        assert await second.current(["devices"]) == version
+        assert await second.current(["device:1", "device:2"]) == version
+        assert await second.current(["device:2"]) == first.started
+
+    asyncio.run(run())
+
+
+def test_versions_are_never_lowered():
+    async def run():
+        first, second = workers()
+        version = first.next(["devices"])
+        first.apply(["devices"], version)
+        second.apply(["devices"], version - 10)
+        await settle()
+        assert await first.current(["devices"]) == await second.current(["devices"]) == version
+
+    asyncio.run(run())
+
+
+def test_bump_from_another_thread():
+    async def run():
+        first, second = workers()
+        version = first.next(["alert_rules"])
+        await asyncio.get_running_loop().run_in_executor(None, first.apply, ["alert_rules"], version)
+        await settle()
+        assert await second.current(["alert_rules"]) == version
+
+    asyncio.run(run())
+
+
+def test_unreachable_redis_falls_back_to_local_versions():
+    async def run():
+        store = ResourceVersions()
+        store.share(Unreachable())
+        assert await store.current(["devices"]) == store.started
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("worker_count, collector_in_api, shared_responses, expected", [
+    (1, True, False, False),
+    (2, True, False, True),
+    (1, False, False, True),
+    (1, True, True, True),
+])
+def test_versions_shared(monkeypatch, worker_count, collector_in_api, shared_responses, expected):
+    monkeypatch.setattr(settings, "WORKERS", worker_count)
+    monkeypatch.setattr(settings, "RUN_COLLECTOR_IN_API", collector_in_api)
+    monkeypatch.setattr(settings, "RUN_EVALUATOR_IN_API", True)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_REDIS", shared_responses)
+    assert http_cache.versions_shared() is expected
@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.utils.rule_expr import CompiledRule, RuleSyntaxError, _Parser, legacy_expression, rule_source
+
+NAN = math.nan
+
+
+class Frame:
+    """Series given as columns: ``values`` by name, ``windows`` by (func, name, seconds)."""
+
+    def __init__(self, size, values=None, windows=None):
+        self.size = size
+        self.values = values or {}
+        self.windows = windows or {}
+
+    def __len__(self):
+        return self.size
+
+    def value(self, name):
+        return np.asarray(self.values.get(name, [NAN] * self.size), np.float64)
+
+    def window(self, func, name, seconds):
+        return np.asarray(self.windows.get((func, name, seconds), [NAN] * self.size), np.float64)
+
+
+def evaluate(source, frame, kind="condition"):
+    return CompiledRule(source, kind).evaluate(frame).tolist()
+
+
+def tree(source):
+    return _Parser(source).rule()[0]
+
+
+def strip(node):
+    """AST without positions."""
+    if not isinstance(node, tuple):
+        return node
+    return tuple(strip(child) for child in node if not isinstance(child, int) or isinstance(child, bool))
+
+
+class TestParser:
+    def test_multiplication_binds_tighter_than_addition(self):
+        assert strip(tree("1 + 2 * cpu_usage > 0")) == (
+            "compare", ">",
+            ("arith", "+", ("number", 1.0), ("arith", "*", ("number", 2.0), ("name", "cpu_usage"))),
+            ("number", 0.0),
+        )
+
+    def test_arithmetic_is_left_associative(self):
+        assert strip(tree("cpu_usage - 1 - 2 > 0"))[2] == (
+            "arith", "-", ("arith", "-", ("name", "cpu_usage"), ("number", 1.0)), ("number", 2.0)
+        )
+
+    def test_and_binds_tighter_than_or(self):
+        parsed = strip(tree("cpu_usage > 1 or cpu_usage > 2 and cpu_usage > 3"))
+        assert parsed[:2] == ("logic", "or")
+        assert parsed[3][:2] == ("logic", "and")
+
+    def test_not_applies_to_the_comparison(self):
+        parsed = strip(tree("not cpu_usage > 90 and uptime > 0"))
+        assert parsed[:2] == ("logic", "and")
+        assert parsed[2][0] == "not"
+        assert parsed[2][1][:2] == ("compare", ">")
+
+    def test_negation_binds_tighter_than_multiplication(self):
+        assert strip(tree("-cpu_usage * 2 < 0"))[2] == (
+            "arith", "*", ("negate", ("name", "cpu_usage")), ("number", 2.0)
+        )
+
+    def test_parentheses(self):
+        assert strip(tree("(1 + 2) * cpu_usage > 0"))[2] == (
+            "arith", "*", ("arith", "+", ("number", 1.0), ("number", 2.0)), ("name", "cpu_usage")
+        )
+
+    def test_chained_comparisons_are_rejected(self):
+        with pytest.raises(RuleSyntaxError, match="can't be chained"):
+            tree("1 < cpu_usage < 90")
+
+    def test_hold_duration(self):
+        assert CompiledRule("cpu_usage > 90 for 5m").hold == 300
+        assert CompiledRule("cpu_usage > 90").hold == 0
+
+    @pytest.mark.parametrize("source, message", [
+        ("cpu_usage >", "end of rule"),
+        ("cpu_usage > 90 for 5", "duration"),
+        ("cpu_usage > 90 for 5m 1", "Unexpected"),
+        ("cpu_usage > 9 $", "Unexpected character"),
+        ("cpu > 90", "Unknown name"),
+        ("median(cpu_usage, 5m) > 1", "Unknown function"),
+        ("avg(speed, 5m) > 1", "takes a metric name"),
+        ("avg(cpu_usage, 5) > 1", "duration"),
+        ("cpu_usage > 90x", "Unknown unit"),
+        ("(cpu_usage > 90", "Expected '\\)'"),
+    ])
+    def test_syntax_errors(self, source, message):
+        with pytest.raises(RuleSyntaxError, match=message):
+            CompiledRule(source)
+
+    def test_error_position(self):
+        with pytest.raises(RuleSyntaxError) as error:
+            CompiledRule("cpu_usage > cpu")
+        assert error.value.position == 12
+
+
+class TestUnits:
+    @pytest.mark.parametrize("literal, value", [
+        ("2k", 2e3), ("1.5M", 1.5e6), ("3G", 3e9), ("1T", 1e12), ("90%", 0.9), ("1e3", 1e3), (".5", 0.5),
+    ])
+    def test_value_units(self, literal, value):
+        assert strip(tree(f"cpu_usage > {literal}"))[3] == ("number", value)
+
+    @pytest.mark.parametrize("literal, seconds", [("30s", 30), ("5m", 300), ("2h", 7200), ("1d", 86400)])
+    def test_duration_units(self, literal, seconds):
+        assert CompiledRule(f"avg(cpu_usage, {literal}) > 1").windows == {("avg", "cpu_usage", seconds)}
+
+    def test_durations_are_not_values(self):
+        with pytest.raises(RuleSyntaxError, match="Unknown unit"):
+            CompiledRule("uptime > 5m")
+
+
+class TestTypes:
+    @pytest.mark.parametrize("source", [
+        "cpu_usage",
+        "cpu_usage + (uptime > 1) > 0",
+        "cpu_usage > 1 and uptime",
+        "not cpu_usage",
+        "abs(cpu_usage > 1) > 0",
+    ])
+    def test_type_errors(self, source):
+        with pytest.raises(RuleSyntaxError, match="Expected a"):
+            CompiledRule(source)
+
+    def test_value_rules_are_numbers(self):
+        assert CompiledRule("in_bps / speed", "value").kind == "value"
+        with pytest.raises(RuleSyntaxError, match="Expected a number"):
+            CompiledRule("in_bps > 1", "value")
+
+    def test_rule_needs_a_metric(self):
+        with pytest.raises(RuleSyntaxError, match="doesn't refer"):
+            CompiledRule("1 > 0")
+
+    def test_scope(self):
+        assert CompiledRule("cpu_usage > 90").scope == "device"
+        assert CompiledRule("cpu_usage > 90 and oper_status == 1").scope == "interface"
+        assert CompiledRule("rate(errors_in, 5m) > 1").scope == "interface"
+
+    def test_metrics_exclude_attributes(self):
+        rule = CompiledRule("in_bps > 0.9 * speed and avg(temperature, 10m) > 70")
+        assert rule.metrics == {"in_bps", "temperature"}
+        assert rule.names == {"in_bps", "speed"}
+        assert rule.max_window == 600
+
+
+class TestEvaluation:
+    def test_comparison_and_arithmetic(self):
+        frame = Frame(3, {"in_bps": [950, 500, 950], "speed": [1000, 1000, 2000]})
+        assert evaluate("in_bps > 90% * speed", frame) == [True, False, False]
+
+    def test_logic(self):
+        frame = Frame(3, {"cpu_usage": [95, 95, 10], "uptime": [1000, 10, 1000]})
+        assert evaluate("cpu_usage > 90 and uptime > 600", frame) == [True, False, False]
+        assert evaluate("cpu_usage > 90 or uptime > 600", frame) == [True, True, True]
+
+    def test_window_functions(self):
+        frame = Frame(2, windows={("rate", "errors_in", 300.0): [20, 5]})
+        assert evaluate("rate(errors_in, 5m) > 10", frame) == [True, False]
+
+    def test_missing_data_satisfies_no_comparison(self):
+        frame = Frame(2, {"cpu_usage": [NAN, NAN]})
+        assert evaluate("cpu_usage > 90", frame) == [False, False]
+        assert evaluate("cpu_usage <= 90", frame) == [False, False]
+        assert evaluate("cpu_usage != 90", frame) == [False, False]
+
+    def test_not_of_missing_data_is_false(self):
+        frame = Frame(3, {"cpu_usage": [95, 50, NAN]})
+        assert evaluate("not cpu_usage > 90", frame) == [False, True, False]
+        assert evaluate("not not cpu_usage > 90", frame) == [True, False, False]
+
+    def test_not_needs_every_operand(self):
+        frame = Frame(3, {"cpu_usage": [50, 50, NAN], "uptime": [NAN, 10, 10]})
+        assert evaluate("not (cpu_usage > 90 or uptime > 600)", frame) == [False, True, False]
+
+    def test_constants_are_folded(self):
+        frame = Frame(2, {"cpu_usage": [1, 3]})
+        assert evaluate("cpu_usage > 1 + 1", frame) == [False, True]
+        assert evaluate("cpu_usage > 0 and 2 > 1 + 2", frame) == [False, False]
+
+    def test_division_by_zero(self):
+        frame = Frame(2, {"in_bps": [10, 0], "speed": [0, 0]})
+        assert evaluate("in_bps / speed > 1", frame) == [True, False]
+
+    def test_subject_is_the_left_side_of_the_first_comparison(self):
+        frame = Frame(2, {"cpu_usage": [95, 50], "uptime": [1, 2]})
+        rule = CompiledRule("uptime > 0 and cpu_usage * 2 > 100")
+        assert rule.subject(frame).tolist() == [1, 2]
+        rule = CompiledRule("not cpu_usage * 2 > 100")
+        assert rule.subject(frame).tolist() == [190, 100]
+
+    def test_value_rule(self):
+        frame = Frame(2, {"in_bps": [100, 50], "speed": [1000, 1000]})
+        assert evaluate("in_bps / speed", frame, "value") == [0.1, 0.05]
+
+
+class TestLegacy:
+    def test_legacy_expression(self):
+        assert legacy_expression("cpu_usage", ">", 90.0) == "cpu_usage > 90.0"
+        assert rule_source(None, "cpu_usage", ">", 90.0) == "cpu_usage > 90.0"
+        assert rule_source("uptime < 60", "cpu_usage", ">", 90.0) == "uptime < 60"
+
+    @pytest.mark.parametrize("oid, operator, threshold", [
+        ("cpu_usage", "=>", 1.0), ("1.3.6.1.2.1.1.3.0", ">", 1.0), ("cpu_usage", ">", None),
+    ])
+    def test_legacy_errors(self, oid, operator, threshold):
+        with pytest.raises(RuleSyntaxError):
+            legacy_expression(oid, operator, threshold)
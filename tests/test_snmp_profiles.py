@@ -0,0 +1,31 @@
+import pytest
+
+from app.utils.oid import parse_oid
+from app.utils.snmp_profiles import (
+    IF_HC_IN_OCTETS, IF_HC_OUT_OCTETS, IF_IN_OCTETS, IF_OUT_OCTETS, compile_plan
+)
+
+
+def octet_columns(plan):
+    columns = dict(plan.interface_columns)
+    return columns["bytes_in"], columns["bytes_out"]
+
+
+@pytest.mark.parametrize("vendor", ["cisco", "huawei"])
+def test_v2c_plan_walks_64_bit_octet_counters(vendor):
+    plan = compile_plan(vendor, "2c")
+    assert plan.bulk
+    assert plan.hc_octets
+    assert octet_columns(plan) == (parse_oid(IF_HC_IN_OCTETS), parse_oid(IF_HC_OUT_OCTETS))
+
+
+@pytest.mark.parametrize("vendor", ["cisco", "huawei", "other"])
+def test_v1_plan_walks_32_bit_octet_counters(vendor):
+    plan = compile_plan(vendor, "1")
+    assert not plan.bulk
+    assert not plan.hc_octets
+    assert octet_columns(plan) == (parse_oid(IF_IN_OCTETS), parse_oid(IF_OUT_OCTETS))
+    walked = {oid for group, _ in plan.walks for oid in group}
+    assert parse_oid(IF_HC_IN_OCTETS) not in walked
+    # Device metrics are unchanged
+    assert [name for name, _ in plan.fields] == [name for name, _ in compile_plan(vendor, "2c").fields]
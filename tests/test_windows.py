@@ -0,0 +1,171 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.tasks.windows import SeriesWindows, WindowStore, epoch_seconds, float_column
+from app.utils.rule_expr import CompiledRule
+
+NAN = math.nan
+WINDOW = ("cpu_usage", 60.0)
+
+
+def store(capacity=8, windows=(WINDOW,)):
+    return SeriesWindows(("cpu_usage",), windows, capacity)
+
+
+def append(windows, ids, timestamps, values):
+    windows.append(ids, np.asarray(timestamps, np.float64), {"cpu_usage": float_column(values)})
+
+
+def aggregate(windows, func, ids, now, seconds=60.0):
+    return windows.aggregate(func, "cpu_usage", seconds, windows.lookup(ids), now).tolist()
+
+
+def assert_same(actual, expected):
+    assert np.allclose(actual, expected, equal_nan=True), (actual, expected)
+
+
+class TestAppend:
+    def test_running_sums(self):
+        windows = store()
+        append(windows, [1, 2, 1], [0, 0, 10], [10, 40, 20])
+        assert aggregate(windows, "sum", [1, 2], 10) == [30, 40]
+        assert aggregate(windows, "count", [1, 2], 10) == [2, 1]
+        assert aggregate(windows, "avg", [1, 2], 10) == [15, 40]
+
+    def test_stale_and_duplicate_samples_are_ignored(self):
+        windows = store()
+        append(windows, [1], [10], [10])
+        append(windows, [1, 1], [10, 5], [99, 99])
+        assert aggregate(windows, "sum", [1], 10) == [10]
+        assert windows.count.tolist()[:1] == [1]
+
+    def test_missing_values_are_not_counted(self):
+        windows = store()
+        append(windows, [1, 1, 1], [0, 10, 20], [10, None, 30])
+        assert aggregate(windows, "count", [1], 20) == [2]
+        assert aggregate(windows, "avg", [1], 20) == [20]
+        assert windows.spans[WINDOW].tolist()[:1] == [3]
+
+    def test_unknown_series(self):
+        windows = store()
+        append(windows, [1], [0], [10])
+        assert_same(aggregate(windows, "sum", [7, 1], 0), [NAN, 10])
+        assert windows.lookup([7]).tolist() == [-1]
+
+    def test_growth_keeps_existing_rows(self):
+        windows = store()
+        append(windows, [1], [0], [5])
+        ids = list(range(2, 3000))
+        append(windows, ids, [0] * len(ids), [1] * len(ids))
+        assert windows.size == 2999
+        assert aggregate(windows, "sum", [1, 2999], 0) == [5, 1]
+
+
+class TestRing:
+    def test_full_ring_evicts_the_oldest_sample(self):
+        windows = store(capacity=3, windows=(("cpu_usage", 3600.0),))
+        append(windows, [1] * 5, [0, 10, 20, 30, 40], [1, 2, 3, 4, 5])
+        assert aggregate(windows, "sum", [1], 40, 3600.0) == [12]
+        assert aggregate(windows, "count", [1], 40, 3600.0) == [3]
+        assert windows.spans[("cpu_usage", 3600.0)].tolist()[:1] == [3]
+
+    def test_eviction_skips_samples_already_expired(self):
+        windows = store(capacity=3)
+        append(windows, [1] * 3, [0, 10, 100], [1, 2, 3])
+        windows.advance(100)  # drops 0 and 10
+        append(windows, [1, 1], [110, 120], [4, 5])  # overwrite 0 and 10
+        assert aggregate(windows, "sum", [1], 120) == [12]
+        assert aggregate(windows, "count", [1], 120) == [3]
+
+    def test_eviction_of_missing_values(self):
+        windows = store(capacity=2, windows=(("cpu_usage", 3600.0),))
+        append(windows, [1] * 3, [0, 10, 20], [None, 2, 3])
+        assert aggregate(windows, "sum", [1], 20, 3600.0) == [5]
+        assert aggregate(windows, "count", [1], 20, 3600.0) == [2]
+
+
+class TestAdvance:
+    def test_expired_samples_leave_the_window(self):
+        windows = store()
+        append(windows, [1, 1, 1, 2], [0, 30, 60, 0], [1, 2, 4, 8])
+        windows.advance(100)
+        assert_same(aggregate(windows, "sum", [1, 2], 100), [4, 0])
+        assert aggregate(windows, "count", [1, 2], 100) == [1, 0]
+        assert_same(aggregate(windows, "avg", [1, 2], 100), [4, NAN])
+
+    def test_samples_are_dropped_once(self):
+        windows = store()
+        append(windows, [1, 1], [0, 50], [1, 2])
+        windows.advance(100)
+        windows.advance(100)
+        assert aggregate(windows, "sum", [1], 100) == [2]
+        assert windows.spans[WINDOW].tolist()[:1] == [1]
+
+    def test_windows_of_one_metric_expire_separately(self):
+        windows = store(windows=(("cpu_usage", 60.0), ("cpu_usage", 600.0)))
+        append(windows, [1, 1], [0, 100], [1, 2])
+        windows.advance(120)
+        assert aggregate(windows, "sum", [1], 120, 60.0) == [2]
+        assert aggregate(windows, "sum", [1], 120, 600.0) == [3]
+
+    def test_emptied_window_restarts_from_zero(self):
+        windows = store()
+        append(windows, [1, 1], [0, 1], [0.1, 0.2])
+        windows.advance(1000)
+        assert windows.sums[WINDOW].tolist()[:1] == [0.0]
+
+
+class TestAggregates:
+    def test_min_max_inside_the_window(self):
+        windows = store()
+        append(windows, [1, 1, 1, 1], [0, 50, 60, 70], [100, 3, None, 7])
+        windows.advance(100)
+        assert aggregate(windows, "min", [1], 100) == [3]
+        assert aggregate(windows, "max", [1], 100) == [7]
+        assert_same(aggregate(windows, "max", [1], 1000), [NAN])
+
+    def test_delta_and_rate(self):
+        windows = store()
+        append(windows, [1, 1, 1], [0, 10, 30], [100, 150, 400])
+        assert aggregate(windows, "delta", [1], 30) == [300]
+        assert aggregate(windows, "rate", [1], 30) == [10]
+
+    def test_delta_needs_two_samples_and_no_reset(self):
+        windows = store()
+        append(windows, [1, 2, 2], [0, 0, 10], [100, 400, 100])
+        assert_same(aggregate(windows, "delta", [1, 2], 10), [NAN, NAN])
+
+    def test_latest(self):
+        windows = store()
+        append(windows, [1, 1, 2], [0, 10, 0], [1, 2, 3])
+        rows = windows.lookup([1, 2, 9])
+        assert_same(windows.latest("cpu_usage", rows, 5), [2, NAN, NAN])
+        assert_same(windows.latest_timestamp(rows), [10, 0, NAN])
+
+
+class TestWindowStore:
+    def test_requirements(self, monkeypatch):
+        monkeypatch.setattr(settings, "COLLECTOR_INTERVAL", 60)
+        monkeypatch.setattr(settings, "ALERT_WINDOW_SAMPLES", 1000)
+        rules = [CompiledRule("avg(cpu_usage, 10m) > 90"), CompiledRule("in_bps > 0.9 * speed")]
+        spec = WindowStore().requirements(rules, stale_after=120)
+        assert spec["device"] == {
+            "metrics": ("cpu_usage",), "windows": (("cpu_usage", 600.0),), "capacity": 22, "lookback": 600.0,
+        }
+        assert spec["interface"] == {"metrics": ("in_bps",), "windows": (), "capacity": 1, "lookback": 120}
+
+    def test_ingest(self):
+        windows_store = WindowStore()
+        windows_store.scopes["device"] = store()
+        windows_store.ingest("device", {"id": [1], "timestamp": [5.0], "cpu_usage": [42]})
+        windows_store.ingest("interface", {"id": [1], "timestamp": [5.0], "in_bps": [1]})
+        assert aggregate(windows_store.scopes["device"], "sum", [1], 5) == [42]
+
+
+@pytest.mark.parametrize("timestamp", ["2024-01-01T00:00:00", "2024-01-01T00:00:00+00:00"])
+def test_epoch_seconds(timestamp):
+    assert epoch_seconds([datetime.fromisoformat(timestamp)]).tolist() == [1704067200.0]